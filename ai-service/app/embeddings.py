@@ -1,13 +1,16 @@
 # app/services/embeddings.py
+import hashlib
 import json
 import os
+from typing import Any, Dict, List
 from fastapi import APIRouter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain.schema import Document
+from app.services.retrieval_engine import get_engine
 
 SECTIONS_PATH = "legal-data/articles_cleaned/sections.json"
 CHROMA_DIR = "legal-data/chroma_db"
+MANIFEST_PATH = os.path.join(CHROMA_DIR, "manifest.json")
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "64"))
 
 router = APIRouter()
 
@@ -15,26 +18,103 @@ def load_sections(file_path: str):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def section_id(key: str, section: Dict[str, Any]) -> str:
+    """Content-addressed id: changes whenever the section key or text changes."""
+    raw = f"{key}\x1f{section['text']}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def section_keys(sections: List[Dict[str, Any]]) -> List[str]:
+    """Stable key per section (its title, numbered when a title repeats)."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for section in sections:
+        title = section.get("title", "")
+        seen[title] = seen.get(title, 0) + 1
+        keys.append(title if seen[title] == 1 else f"{title}#{seen[title]}")
+    return keys
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: Dict[str, str], path: str = MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def build_index_incremental(sections: List[Dict[str, Any]], vectordb: Any, manifest: Dict[str, str],
+                            batch_size: int = INDEX_BATCH_SIZE) -> Dict[str, Any]:
+    """Bring vectordb in line with sections, embedding only new or changed ones.
+
+    `manifest` maps section key -> content id of what is currently stored and is
+    updated in place. Returns counts of added/updated/removed/unchanged sections.
+    """
+    wanted = dict(zip(section_keys(sections), sections))
+    to_embed = []
+    stale_ids = []
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+    for key, section in wanted.items():
+        new_id = section_id(key, section)
+        old_id = manifest.get(key)
+        if old_id == new_id:
+            counts["unchanged"] += 1
+            continue
+        if old_id is None:
+            counts["added"] += 1
+        else:
+            counts["updated"] += 1
+            stale_ids.append(old_id)
+        to_embed.append((key, new_id, section))
+
+    for key in [key for key in manifest if key not in wanted]:
+        counts["removed"] += 1
+        stale_ids.append(manifest.pop(key))
+
+    if stale_ids:
+        vectordb.delete(ids=stale_ids)
+    for key, _, _ in to_embed:
+        manifest.pop(key, None)
+
+    for start in range(0, len(to_embed), batch_size):
+        batch = to_embed[start:start + batch_size]
+        vectordb.add_texts(
+            texts=[section["text"] for _, _, section in batch],
+            metadatas=[{"title": section.get("title", "")} for _, _, section in batch],
+            ids=[new_id for _, new_id, _ in batch],
+        )
+        for key, new_id, _ in batch:
+            manifest[key] = new_id
+
+    return counts
+
 def create_chroma_embeddings(sections):
-    documents = [
-        Document(page_content=section["text"], metadata={"title": section["title"]})
-        for section in sections
-    ]
+    embeddings = get_engine().embeddings
+    vectordb = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
+    manifest = load_manifest()
 
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    # stores built before the manifest existed hold random ids; start them over
+    if not manifest and vectordb.get(limit=1)["ids"]:
+        vectordb.delete_collection()
+        vectordb = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
 
-    vectordb = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        persist_directory=CHROMA_DIR
-    )
-    return vectordb
+    try:
+        counts = build_index_incremental(sections, vectordb, manifest)
+    finally:
+        save_manifest(manifest)
+    # the NumPy backend rebuilds from sections.json when it no longer matches
+    get_engine().invalidate_index()
+    return vectordb, counts
 
 @router.get("/create-chroma")
 def create_chroma_db():
     sections = load_sections(SECTIONS_PATH)
-    vectordb = create_chroma_embeddings(sections)
-    return {"message": "Chroma DB created", "sections_count": len(sections)}
+    vectordb, counts = create_chroma_embeddings(sections)
+    return {"message": "Chroma DB updated", "sections_count": len(sections), **counts}
 
 if __name__ == "__main__":
     result = create_chroma_db()
@@ -1,16 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+import functools
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.routers import placeholder
-from app import splitter, embeddings, retriever, parser
+from app import splitter, embeddings, retriever, parser, metrics
 from app.services.contract_review import parse_contract, splitter_contract
 from app.services.contract_review import retriever_contract
 from app.services.contract_review import Generation
-from app.services.contract_review.indexing import index_contract
+from app.services.contract_review.analysis import ANALYZE_MAX_DOCUMENTS, AnalyzerBusy, analyzer
 
 from app.services.contract_review import indexing
+from app.services import retrieval_engine
 from pydantic import BaseModel
 
-app = FastAPI(title="AI Service", version="0.1.0")
+# Load the embedding model, index and LLM client in the background at startup (0 = on first use)
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "1") == "1"
+warm_up_error = None
+
+
+def warm_up() -> None:
+    """Build the heavy resources so /ready turns green before the first request needs them."""
+    global warm_up_error
+    try:
+        retrieval_engine.warm_up()
+        Generation.get_llm()
+    except Exception as e:
+        warm_up_error = repr(e)
+        print(f"Warm-up failed: {e!r}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # /health answers right away; /ready reports when warm-up is done
+    if WARM_UP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
+
+app = FastAPI(title="AI Service", version="0.1.0", lifespan=lifespan)
 
 origins = [
     "http://localhost:8080",
@@ -28,6 +60,19 @@ app.add_middleware(
 def health_check():
     return {"status": "ok", "service": "ai-service", "version": "0.1.0"}
 
+@app.get("/ready")
+def readiness_check():
+    checks = {
+        "retrieval": retrieval_engine.get_engine().ready,
+        "llm": Generation.llm is not None,
+    }
+    ready = all(checks.values())
+    body = {"status": "ready" if ready else "starting", **checks}
+    if warm_up_error:
+        body["error"] = warm_up_error
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+app.include_router(metrics.router)
 app.include_router(placeholder.router, prefix="/api/v1", tags=["placeholder"])
 app.include_router(parser.router, prefix="/api/v1", tags=["parser"])
 app.include_router(splitter.router, prefix="/api/v1", tags=["splitter"])
@@ -43,9 +88,63 @@ app.include_router(retriever_contract.router, prefix="/api/v1/contracts", tags=[
 class DocumentInput(BaseModel):
     file_name: str
     extracted_text: str
-    header: str
+    header: Optional[str] = None
+
+
+class AnalyzeRequest(BaseModel):
+    documents: List[DocumentInput]
+
+
+def _document_result(document: DocumentInput, coalesced: bool, outcome: Any) -> Dict[str, Any]:
+    entry = {"file_name": document.file_name, "coalesced": coalesced}
+    if isinstance(outcome, BaseException):
+        entry["error"] = repr(outcome)
+    else:
+        entry["result"] = outcome
+    return entry
+
+
+async def _stream_batch(documents: List[DocumentInput], jobs, lines: asyncio.Queue):
+    """NDJSON lines: the events of every document as they happen, then its result."""
+    remaining = len(documents)
+    while remaining:
+        index, event_type, payload = await lines.get()
+        if event_type == "result":
+            remaining -= 1
+            line = {"document": index, "event": "result",
+                    **_document_result(documents[index], jobs[index][1], payload)}
+        else:
+            line = {"document": index, "event": event_type, "data": payload}
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+
 
 @app.post("/analyze")
-async def analyze(input: DocumentInput):
-    index_contract(input.extracted_text)
-    return Generation.generate_issues()
\ No newline at end of file
+async def analyze(request: AnalyzeRequest, stream: bool = False):
+    """Review a batch of contracts; ?stream=true answers in NDJSON as verdicts come in."""
+    documents = request.documents
+    if not documents:
+        return {"results": []}
+    if len(documents) > ANALYZE_MAX_DOCUMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {ANALYZE_MAX_DOCUMENTS} documents per request")
+
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+
+    def forward(index: int, event_type: str, payload: Any) -> None:
+        loop.call_soon_threadsafe(lines.put_nowait, (index, event_type, payload))
+
+    listeners = [functools.partial(forward, i) for i in range(len(documents))] if stream else None
+    try:
+        jobs = analyzer.submit_batch([d.extracted_text for d in documents], listeners)
+    except AnalyzerBusy as e:
+        return JSONResponse({"detail": f"Analyzer busy: {e}"}, status_code=503, headers={"Retry-After": "5"})
+
+    if stream:
+        for i, (job, _) in enumerate(jobs):
+            job.future.add_done_callback(
+                lambda future, i=i: forward(i, "result", future.exception() or future.result()))
+        return StreamingResponse(_stream_batch(documents, jobs, lines), media_type="application/x-ndjson")
+
+    outcomes = await asyncio.gather(*(asyncio.wrap_future(job.future) for job, _ in jobs), return_exceptions=True)
+    return {"results": [_document_result(document, coalesced, outcome)
+                        for document, (_, coalesced), outcome in zip(documents, jobs, outcomes)]}
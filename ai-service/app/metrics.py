@@ -0,0 +1,89 @@
+"""
+Pipeline instrumentation exposed in Prometheus format.
+
+Stage timings, LLM call outcomes and prompt/response sizes are recorded with
+prometheus_client (a lock and a few additions per observation, cheap enough to
+leave on). The FastAPI app serves them on /metrics; the worker can expose
+them on METRICS_PORT with start_exporter().
+
+Metrics recorded in other processes (WORKER_EXECUTOR=process) only reach the
+exporter in prometheus_client's multiprocess mode: set PROMETHEUS_MULTIPROC_DIR
+to an empty directory before the process starts.
+"""
+
+import os
+from typing import Optional
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+    start_http_server,
+)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+STAGE_SECONDS = Histogram(
+    "cdi_stage_duration_seconds", "Time spent in each pipeline stage",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+LLM_CALLS = Counter(
+    "cdi_llm_calls_total", "LLM invocations by outcome (success, retry, rate_limited, circuit_open, failure)", ["outcome"],
+)
+LLM_HEDGES = Counter("cdi_llm_hedges_total", "Hedged LLM requests sent, and how many beat the original", ["outcome"])
+LLM_PROMPT_CHARS = Histogram("cdi_llm_prompt_chars", "Prompt size in characters", buckets=SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = Histogram("cdi_llm_response_chars", "Response size in characters", buckets=SIZE_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram(
+    "cdi_queue_wait_seconds", "Time a contract waited between enqueue (or delivery) and processing",
+    buckets=LATENCY_BUCKETS,
+)
+CONTRACTS = Counter("cdi_contracts_total", "Contracts processed by outcome", ["outcome"])
+RESULT_DEDUP_LOOKUPS = Counter("cdi_result_dedup_total", "Contract dedup lookups by outcome (hit, miss)", ["outcome"])
+RESULT_BYTES_SAVED = Counter("cdi_result_bytes_saved_total", "Bytes saved by compressing stored results")
+ANALYZE_JOBS = Counter(
+    "cdi_analyze_jobs_total", "Contracts submitted to /analyze by outcome (started, coalesced, rejected)", ["outcome"],
+)
+TRIAGE_ROUTES = Counter(
+    "cdi_triage_total", "Clauses routed by the local triage model (compliant, uncertain, problematic)", ["route"],
+)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage: `with stage("split"): ...`."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+def export_registry(multiproc_dir: str = PROMETHEUS_MULTIPROC_DIR) -> CollectorRegistry:
+    """This process' registry, or in multiprocess mode one collecting every process' files."""
+    if not multiproc_dir:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+    return registry
+
+
+def exporter_warning(executor_kind: str, port: int = METRICS_PORT,
+                     multiproc_dir: str = PROMETHEUS_MULTIPROC_DIR) -> Optional[str]:
+    """Why the worker exporter would miss metrics with this executor, if it would."""
+    if port and executor_kind == "process" and not multiproc_dir:
+        return ("WORKER_EXECUTOR=process records metrics in child processes; set PROMETHEUS_MULTIPROC_DIR "
+                "to export them, METRICS_PORT only serves the parent's")
+    return None
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(export_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+def start_exporter(port: int = METRICS_PORT) -> bool:
+    """Serve /metrics from a background thread (worker processes). No-op when port is 0."""
+    if not port:
+        return False
+    start_http_server(port, registry=export_registry())
+    return True
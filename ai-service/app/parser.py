@@ -4,8 +4,8 @@ Step 1: Extract and clean Moroccan Labor Code PDF into plain text
 
 import os
 import re
-import pdfplumber
 from fastapi import APIRouter
+from app.services import pdf_extraction
 
 RAW_PATH = "legal-data/articles_raw/code_du_travail.pdf"
 OUTPUT_PATH = "legal-data/articles_cleaned/labor_code_clean.txt"
@@ -14,9 +14,7 @@ router = APIRouter()
 
 def extract_text(pdf_path: str) -> str:
     """Extract text from PDF."""
-    with pdfplumber.open(pdf_path) as pdf:
-        text = "\n".join([p.extract_text() or "" for p in pdf.pages])
-    return text
+    return pdf_extraction.extract_text(pdf_path)
 
 def clean_text(text: str) -> str:
     """Remove page numbers, hyphenation, keep section structure."""
@@ -0,0 +1,174 @@
+"""
+Opt-in CPU and memory profiling of worker jobs.
+
+A profiled job runs under cProfile with tracemalloc tracing and leaves two
+files in PROFILE_DIR, named after the contract id:
+- <id>-<time>.prof: cProfile stats (python -m pstats, snakeviz)
+- <id>-<time>.txt: wall time, RSS before and after, traced memory peak, the
+  PROFILE_TOP functions by cumulative time and allocation sites by growth
+
+A job is profiled when its message asks for it ("profile": true, at the top
+level or in a header object), and one job in PROFILE_EVERY otherwise
+(1 = every job, 0 = only on request). Other jobs cost a counter increment.
+
+cProfile sees the thread running the job only: LLM calls made from a thread
+pool show up as waiting. tracemalloc traces the whole process, so jobs running
+next to a profiled one count in its allocations.
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+PROFILE_EVERY = int(os.getenv("PROFILE_EVERY", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "30"))
+# Stack depth kept per allocation; more frames find the caller, at a higher tracing cost
+PROFILE_TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", "1"))
+
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _flag(value: Any) -> bool:
+    return value is True or str(value).strip().lower() in ("1", "true", "yes")
+
+
+def requested(message: Dict[str, Any]) -> bool:
+    """Whether a queue message asks to be profiled."""
+    header = message.get("header")
+    return _flag(message.get("profile")) or (isinstance(header, dict) and _flag(header.get("profile")))
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB (Linux), else None."""
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS"))
+    except (OSError, StopIteration, ValueError):
+        return None
+
+
+def file_tag(job_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", str(job_id))[:100] or "job"
+
+
+class JobProfiler:
+    """Profiles the jobs that ask for it, plus one in `every`."""
+
+    def __init__(self, directory: str = PROFILE_DIR, every: int = PROFILE_EVERY, top: int = PROFILE_TOP,
+                 frames: int = PROFILE_TRACE_FRAMES):
+        self.directory = directory
+        self.every = every
+        self.top = top
+        self.frames = frames
+        self._jobs = itertools.count(1)
+        self._lock = threading.Lock()
+        self._tracing = 0  # profiled jobs running; tracemalloc stops with the last one
+        self._owns_tracing = False
+
+    def should_profile(self, message: Dict[str, Any]) -> bool:
+        if requested(message):
+            return True
+        return self.every > 0 and next(self._jobs) % self.every == 0
+
+    def maybe(self, message: Dict[str, Any], job_id: str) -> ContextManager[Any]:
+        """profile(job_id) when the message is to be profiled, else a no-op context."""
+        return self.profile(job_id) if self.should_profile(message) else nullcontext()
+
+    def _start_tracing(self) -> None:
+        with self._lock:
+            if self._tracing == 0:
+                # tracing started elsewhere (PYTHONTRACEMALLOC) is left running
+                self._owns_tracing = not tracemalloc.is_tracing()
+                if self._owns_tracing:
+                    tracemalloc.start(self.frames)
+            self._tracing += 1
+
+    def _stop_tracing(self) -> None:
+        with self._lock:
+            self._tracing -= 1
+            if self._tracing == 0 and self._owns_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def profile(self, job_id: str) -> Iterator[None]:
+        self._start_tracing()
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+            traced_before = tracemalloc.get_traced_memory()[0]
+            rss_before = rss_mb()
+            profiler: Optional[cProfile.Profile] = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ runs one cProfile per process: overlapping jobs get memory stats only
+                profiler = None
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                elapsed = time.perf_counter() - start
+                after = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+                traced_after, peak = tracemalloc.get_traced_memory()
+                self.write(job_id, profiler, before, after, {
+                    "wall_s": elapsed,
+                    "rss_before_mb": rss_before,
+                    "rss_after_mb": rss_mb(),
+                    "traced_growth_mb": (traced_after - traced_before) / 2**20,
+                    "traced_peak_mb": peak / 2**20,
+                })
+        finally:
+            self._stop_tracing()
+
+    def write(self, job_id: str, profiler: Optional[cProfile.Profile], before: tracemalloc.Snapshot,
+              after: tracemalloc.Snapshot, summary: Dict[str, Optional[float]]) -> Optional[str]:
+        """Write the .prof and .txt files of a job; returns their common path prefix (None on failure)."""
+        stamp = time.strftime("%Y%m%dT%H%M%S") + f"{time.time() % 1:.3f}"[1:]
+        base = os.path.join(self.directory, f"{file_tag(job_id)}-{stamp}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(base + ".prof")
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(self.report(job_id, profiler, before, after, summary))
+        except OSError as e:
+            # profiling must never fail the job it observes
+            print(f"Failed to write profile of {job_id}: {e!r}")
+            return None
+        print(f"Profile of {job_id} written to {base}.* ({summary['wall_s']:.2f} s)")
+        return base
+
+    def report(self, job_id: str, profiler: Optional[cProfile.Profile], before: tracemalloc.Snapshot,
+               after: tracemalloc.Snapshot, summary: Dict[str, Optional[float]]) -> str:
+        out = io.StringIO()
+        out.write(f"job {job_id}\n")
+        for name, value in summary.items():
+            out.write(f"{name}: {'n/a' if value is None else f'{value:.3f}'}\n")
+
+        out.write(f"\n== top {self.top} functions by cumulative time ==\n")
+        if profiler is not None:
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+        else:
+            out.write("not available: another job held the CPU profiler\n\n")
+
+        out.write(f"== top {self.top} allocation sites by growth ==\n")
+        for diff in after.compare_to(before, "lineno")[:self.top]:
+            out.write(f"{diff}\n")
+        return out.getvalue()
+
+
+job_profiler = JobProfiler()
@@ -1,19 +1,44 @@
-import os, json, time, re
-from typing import Any, Dict, List, Optional
+import os, time, re, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv, find_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
 
+from app.metrics import LLM_CALLS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS, stage
+from .context_packing import PackedContext, clause_context, context_mode, pack_context
+from .response_parser import extract_json, parse_verdict
+from .rate_limit import CircuitBreaker, Hedger, acquire, backoff_delay, create_rate_limiter, is_rate_limited, retry_after
+from .verdict_cache import VerdictCache, create_backend, normalize_clause_text, prompt_version
+
 load_dotenv(find_dotenv())
 MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GEMNAI_API_KEY")
 SLEEP_BETWEEN_CALLS = float(os.getenv("SLEEP_BETWEEN_CALLS", "0.25"))
 RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "2"))
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "1"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))
+BATCH_CHAR_BUDGET = int(os.getenv("BATCH_CHAR_BUDGET", "6000"))
+# Output cap per verdict (a 120 + 150 character verdict is ~100 tokens); batches get one per clause
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "256"))
+# Generation stops at the end of a ```json block instead of going on with an explanation
+STOP_SEQUENCES = ["\n```\n"]
 
-if not API_KEY:
-    raise RuntimeError("GEMINI API key not found. Set GEMINI_API_KEY in your .env")
+llm: Any = None
+_llm_lock = threading.Lock()
 
-llm = ChatGoogleGenerativeAI(model=MODEL_NAME, google_api_key=API_KEY)
+def get_llm() -> Any:
+    """The Gemini client, created on first use (importing langchain_google_genai takes seconds)."""
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                if not API_KEY:
+                    raise RuntimeError("GEMINI API key not found. Set GEMINI_API_KEY in your .env")
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                # retries, backoff and quota are handled by call_llm, not by the client
+                llm = ChatGoogleGenerativeAI(model=MODEL_NAME, google_api_key=API_KEY, max_retries=1,
+                                             max_output_tokens=LLM_MAX_OUTPUT_TOKENS)
+    return llm
 
 PERSONAL_PATTERNS = [
     r"\bNom\s*:", r"\bCIN\b", r"\bN[o°]?\s?:\s?[A-Z0-9-]+", r"\bAdresse\s*:",
@@ -55,32 +80,31 @@ def is_trivial_clause_text(text: str) -> bool:
     return False
 
 def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-    first = text.find("{")
-    last = text.rfind("}")
-    if first == -1 or last == -1 or last <= first:
-        return None
-    candidate = text[first:last+1]
-    try:
-        return json.loads(candidate)
-    except Exception:
-        for m in re.finditer(r"\{(?:.|\n)*?\}", text):
-            try:
-                return json.loads(m.group(0))
-            except Exception:
-                continue
-    return None
+    """First JSON object in an LLM answer (see response_parser.extract_json)."""
+    return extract_json(text, dict)
+
+def extract_json_array_from_text(text: str) -> Optional[List[Any]]:
+    """Like extract_json_from_text, for batched answers: returns the first JSON array found."""
+    return extract_json(text, list)
+
+def context_block(context: Optional[PackedContext]) -> str:
+    """The labor-code excerpts of a prompt (see context_packing), or "" without context."""
+    if not context:
+        return ""
+    return f"\nEXTRAITS DU CODE DU TRAVAIL (appuyez-vous dessus):\n{context.block()}\n"
+
+def references_line(context: Optional[PackedContext], clause_index: int) -> str:
+    labels = context.refs.get(clause_index) if context else None
+    return f"\nRéférences : {', '.join(labels)}" if labels else ""
 
-def build_prompt_minimal_french(clause_text: str, clause_index: int) -> str:
+def build_prompt_minimal_french(clause_text: str, clause_index: int,
+                                context: Optional[PackedContext] = None) -> str:
     return f"""
 Vous êtes un classificateur légal strict (français). Vous comparerez la clause à la loi du travail marocaine en interne.
 RENVOYEZ SEULEMENT UN OBJET JSON ET RIEN D'AUTRE.
-
+{context_block(context)}
 CLAUSE (index {clause_index}):
-\"\"\"{clause_text}\"\"\"
+\"\"\"{clause_text}\"\"\"{references_line(context, clause_index)}
 
 Tâche:
 - Si la clause est conforme (aucun problème), renvoyez EXACTEMENT : {{"compliant": true}}
@@ -91,27 +115,176 @@ Tâche:
 Ne fournissez aucune explication, aucun texte hors du JSON, et n'incluez pas la section légale.
 """
 
-def call_llm(prompt: str) -> Optional[str]:
+def build_prompt_batch_french(items: List[Tuple[int, str]], context: Optional[PackedContext] = None) -> str:
+    clauses_block = "\n\n".join(
+        f"CLAUSE (index {clause_index}):\n\"\"\"{clause_text}\"\"\"{references_line(context, clause_index)}"
+        for clause_index, clause_text in items
+    )
+    return f"""
+Vous êtes un classificateur légal strict (français). Vous comparerez chaque clause à la loi du travail marocaine en interne.
+RENVOYEZ SEULEMENT UN TABLEAU JSON ET RIEN D'AUTRE.
+{context_block(context)}
+{clauses_block}
+
+Tâche: pour CHAQUE clause ci-dessus, ajoutez au tableau exactement un objet avec la clé "index":
+- Si la clause est conforme (aucun problème) : {{"index": <index>, "compliant": true}}
+- Si la clause pose un problème :
+  {{"index": <index>, "issue": "description courte du problème en français (<=120 caractères)",
+    "suggestion": "courte suggestion de correction en français (<=150 caractères) ou \"\" si non fournie"}}
+
+Ne fournissez aucune explication, aucun texte hors du JSON, et n'incluez pas la section légale.
+"""
+
+SAMPLE_CONTEXT = PackedContext([("L1", "{section_title}", "{excerpt}")], {0: ["L1"]})
+PROMPT_VERSION = prompt_version(
+    lambda text, idx: build_prompt_minimal_french(text, idx, SAMPLE_CONTEXT)
+    + build_prompt_batch_french([(idx, text)], SAMPLE_CONTEXT)
+)
+
+_cache_backend = create_backend()
+verdict_cache = VerdictCache(_cache_backend, MODEL_NAME, PROMPT_VERSION) if _cache_backend else None
+
+rate_limiter = create_rate_limiter()
+circuit_breaker = CircuitBreaker()
+hedger = Hedger()
+
+def call_llm(prompt: str, client: Any = None, max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS) -> Optional[str]:
+    """Invoke the LLM under the shared rate limit, circuit breaker and hedging (see rate_limit).
+
+    Returns the response text, or None once the retries are exhausted or while the circuit is open.
+    """
+    client = client or get_llm()
     last_err = None
+    LLM_PROMPT_CHARS.observe(len(prompt))
+    messages = [HumanMessage(content=prompt)]
+    options = {"stop": STOP_SEQUENCES, "generation_config": {"max_output_tokens": max_output_tokens}}
     for attempt in range(RETRY_ATTEMPTS + 1):
+        if not circuit_breaker.allow():
+            LLM_CALLS.labels("circuit_open").inc()
+            print("LLM circuit open, not calling the provider")
+            return None
+        acquire(rate_limiter)
         try:
-            resp = llm.invoke([HumanMessage(content=prompt)])
+            with stage("llm_call"):
+                resp = hedger.call(lambda: client.invoke(messages, **options),
+                                   lambda: acquire(rate_limiter, block=False))
             text = getattr(resp, "content", None) or str(resp)
+            circuit_breaker.record_success()
+            LLM_CALLS.labels("success").inc()
+            LLM_RESPONSE_CHARS.observe(len(text))
             return text
         except Exception as e:
             last_err = e
-            time.sleep(0.5 * (attempt + 1))
+            delay = retry_after(e)
+            if is_rate_limited(e):
+                # the provider is up, just over quota: everyone sharing the bucket waits
+                # (acquire() sleeps it off) and the breaker is left alone
+                circuit_breaker.release()
+                LLM_CALLS.labels("rate_limited").inc()
+                rate_limiter.pause(delay if delay is not None else backoff_delay(attempt))
+            else:
+                circuit_breaker.record_failure()
+                if attempt < RETRY_ATTEMPTS:
+                    time.sleep(delay if delay is not None else backoff_delay(attempt))
+            if attempt < RETRY_ATTEMPTS:
+                LLM_CALLS.labels("retry").inc()
+    LLM_CALLS.labels("failure").inc()
     print(f"LLM invocation failed after retries: {last_err}")
     return None
 
-def generate_issues_memory(clauses: List[Dict[str, Any]], retrieval_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Generate issues for contract clauses. Returns list in memory."""
-    problematic: List[Dict[str, Any]] = []
+def judge_clause(clause_text: str, clause_index: int, client: Any = None,
+                 context: Optional[Dict[int, List[Dict[str, Any]]]] = None) -> Optional[Dict[str, Any]]:
+    """Ask the LLM about one clause.
+
+    Returns {"compliant": True} or {"issue": ..., "suggestion": ...}, or None when
+    the call failed or the answer could not be used. context maps clause
+    indexes to their retrieved labor-code sections (see context_packing).
+    """
+    packed = pack_context([(clause_index, clause_text)], context) if context else None
+    prompt = build_prompt_minimal_french(clause_text, clause_index, packed)
+    raw = call_llm(prompt, client)
+    if raw is None:
+        return None
+    time.sleep(SLEEP_BETWEEN_CALLS)
+    with stage("json_parse"):
+        parsed = extract_json_from_text(raw)
+    return parse_verdict(parsed)
+
+def judge_batch(items: List[Tuple[int, str]], client: Any = None,
+                context: Optional[Dict[int, List[Dict[str, Any]]]] = None) -> Dict[int, Optional[Dict[str, Any]]]:
+    """Ask the LLM about several clauses in one prompt.
 
+    Clauses whose entry is missing or malformed in the answer are re-asked
+    individually with judge_clause. Sections shared by clauses of the batch
+    are written once in the prompt.
+    """
+    if len(items) == 1:
+        clause_index, clause_text = items[0]
+        return {clause_index: judge_clause(clause_text, clause_index, client, context)}
+
+    verdicts: Dict[int, Optional[Dict[str, Any]]] = {}
+    packed = pack_context(items, context) if context else None
+    raw = call_llm(build_prompt_batch_french(items, packed), client,
+                   max_output_tokens=LLM_MAX_OUTPUT_TOKENS * len(items))
+    with stage("json_parse"):
+        entries = extract_json_array_from_text(raw) if raw is not None else None
+    wanted = {clause_index for clause_index, _ in items}
+    for entry in entries or []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            clause_index = int(entry.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if clause_index not in wanted or clause_index in verdicts:
+            continue
+        verdict = parse_verdict(entry)
+        if verdict is not None:
+            verdicts[clause_index] = verdict
+
+    if raw is not None:
+        time.sleep(SLEEP_BETWEEN_CALLS)
+    for clause_index, clause_text in items:
+        if clause_index not in verdicts:
+            verdicts[clause_index] = judge_clause(clause_text, clause_index, client, context)
+    return verdicts
+
+def make_batches(items: List[Tuple[int, str]], batch_size: int,
+                 char_budget: int = BATCH_CHAR_BUDGET) -> List[List[Tuple[int, str]]]:
+    """Group clauses into batches of at most batch_size clauses and ~char_budget characters."""
+    batches: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    current_chars = 0
+    for item in items:
+        size = len(item[1])
+        if current and (len(current) >= batch_size or current_chars + size > char_budget):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(item)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+def issue_entry(clause_index: int, clause_text: str, verdict: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Turn a verdict into the problematic-clause entry returned to the frontend."""
+    if verdict is None or verdict.get("compliant") is True:
+        return None
+    return {
+        "clause_index": clause_index,
+        "clause_title": "Clause",
+        "clause_text": clause_text,
+        "issue": verdict["issue"],
+        "suggestion": verdict.get("suggestion") or ""
+    }
+
+def select_clauses(clauses: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """Return (index, text) for the clauses worth sending to the LLM."""
+    selected = []
     for idx, entry in enumerate(clauses):
         section_title = entry.get("section_title", "")
-        section_text = entry.get("section_text", "") or entry.get("section_text", "")
-        
+        section_text = entry.get("section_text", "")
+
         if section_title != "Clause":
             continue
 
@@ -120,30 +293,95 @@ def generate_issues_memory(clauses: List[Dict[str, Any]], retrieval_data: List[D
             continue
         if is_trivial_clause_text(clause_text):
             continue
+        selected.append((idx, clause_text))
+    return selected
 
-        prompt = build_prompt_minimal_french(clause_text, idx)
-        raw = call_llm(prompt)
-        if raw is None:
-            continue
-        
-        parsed = extract_json_from_text(raw)
-        if parsed is None:
+def evaluate_clauses(selected: List[Tuple[int, str]], max_concurrency: Optional[int] = None,
+                     client: Any = None, cache: Optional[VerdictCache] = None,
+                     batch_size: Optional[int] = None,
+                     on_verdict: Optional[Callable[[int, str, Optional[Dict[str, Any]]], None]] = None,
+                     context: Optional[Dict[int, List[Dict[str, Any]]]] = None
+                     ) -> Dict[int, Optional[Dict[str, Any]]]:
+    """Verdict for each (clause_index, clause_text); None where the LLM gave nothing usable.
+
+    With max_concurrency > 1 (default: MAX_CONCURRENT_CALLS) LLM calls run
+    on a thread pool. Verdicts are looked up in `cache` (default: the
+    VERDICT_CACHE_BACKEND cache) first. With batch_size > 1 (default:
+    BATCH_SIZE) several clauses share one prompt. on_verdict(clause_index,
+    clause_text, verdict) is called as soon as each verdict is known.
+    context ({clause_index: retrieved sections}) grounds the prompts in the
+    labor code, packed within the CONTEXT_* token budgets; verdicts given with
+    and without it are cached apart.
+    """
+    cache = cache if cache is not None else verdict_cache
+    variant = context_mode(context)
+    workers = max_concurrency if max_concurrency is not None else MAX_CONCURRENT_CALLS
+    size = batch_size if batch_size is not None else BATCH_SIZE
+
+    verdicts: Dict[int, Optional[Dict[str, Any]]] = {}
+    pending: List[Tuple[int, str]] = []
+    same_text: Dict[str, List[int]] = {}
+    for clause_index, clause_text in selected:
+        cached = cache.get(clause_text, variant) if cache is not None else None
+        if cached is not None:
+            verdicts[clause_index] = cached
             continue
-        if isinstance(parsed, dict) and parsed.get("compliant") is True:
+        # identical clauses in one contract only cost one call
+        normalized = normalize_clause_text(clause_text)
+        if normalized in same_text:
+            same_text[normalized].append(clause_index)
             continue
+        same_text[normalized] = [clause_index]
+        pending.append((clause_index, clause_text))
 
-        issue = parsed.get("issue") if isinstance(parsed, dict) else None
-        suggestion = parsed.get("suggestion") if isinstance(parsed, dict) else None
-        
-        if issue:
-            problematic.append({
-                "clause_index": idx,
-                "clause_title": "Clause",
-                "clause_text": clause_text,
-                "issue": issue,
-                "suggestion": suggestion or ""
-            })
-        
-        time.sleep(SLEEP_BETWEEN_CALLS)
+    texts = dict(selected)
+
+    def record(batch_verdicts: Dict[int, Optional[Dict[str, Any]]]) -> None:
+        for clause_index, verdict in batch_verdicts.items():
+            same = same_text[normalize_clause_text(texts[clause_index])]
+            for same_index in same:
+                verdicts[same_index] = verdict
+            if verdict is not None and cache is not None:
+                cache.set(texts[clause_index], verdict, variant)
+            if on_verdict is not None:
+                for same_index in same:
+                    on_verdict(same_index, texts[same_index], verdict)
+
+    if on_verdict is not None:
+        for clause_index, verdict in list(verdicts.items()):
+            on_verdict(clause_index, texts[clause_index], verdict)
+
+    batches = make_batches(pending, size) if size > 1 else [[item] for item in pending]
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            record(judge_batch(batch, client, context))
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            futures = [pool.submit(judge_batch, batch, client, context) for batch in batches]
+            for future in as_completed(futures):
+                record(future.result())
+    return verdicts
+
+def issues_from_verdicts(selected: List[Tuple[int, str]],
+                         verdicts: Dict[int, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    problematic = [issue_entry(idx, text, verdicts.get(idx)) for idx, text in selected]
+    return [entry for entry in problematic if entry is not None]
+
+def generate_issues_memory(clauses: List[Dict[str, Any]], retrieval_data: List[Dict[str, Any]],
+                           max_concurrency: Optional[int] = None, client: Any = None,
+                           cache: Optional[VerdictCache] = None,
+                           batch_size: Optional[int] = None,
+                           on_verdict: Optional[Callable[[int, str, Optional[Dict[str, Any]]], None]] = None
+                           ) -> List[Dict[str, Any]]:
+    """Generate issues for contract clauses. Returns list in memory, in clause_index order.
 
-    return problematic
\ No newline at end of file
+    retrieval_data is the retrieve_sections_bulk or retrieve_sections_memory
+    output for the clauses (see context_packing.clause_context); their sections
+    are packed into the prompts. See evaluate_clauses for the concurrency,
+    cache, batching and on_verdict options.
+    """
+    selected = select_clauses(clauses)
+    verdicts = evaluate_clauses(selected, max_concurrency=max_concurrency, client=client,
+                                cache=cache, batch_size=batch_size, on_verdict=on_verdict,
+                                context=clause_context(retrieval_data, selected))
+    return issues_from_verdicts(selected, verdicts)
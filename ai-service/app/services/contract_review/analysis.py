@@ -0,0 +1,132 @@
+"""
+Contract reviews requested over HTTP (/analyze).
+
+Reviews run process_contract_workflow on a bounded thread pool
+(ANALYZE_WORKERS) so the event loop keeps serving while the LLM works. At
+most ANALYZE_MAX_PENDING distinct contracts are queued or running; past that
+new batches are refused instead of piling up. Submissions of a contract
+already in flight (same normalized text) join that review instead of
+starting another one, and get its progress events replayed.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+from app.metrics import ANALYZE_JOBS
+from .generation_workflow import process_contract_workflow
+from .result_store import normalize_contract_text
+
+load_dotenv(find_dotenv())
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "4"))
+ANALYZE_MAX_PENDING = int(os.getenv("ANALYZE_MAX_PENDING", "32"))
+ANALYZE_MAX_DOCUMENTS = int(os.getenv("ANALYZE_MAX_DOCUMENTS", "20"))
+
+Listener = Callable[[str, Dict[str, Any]], None]
+
+
+class AnalyzerBusy(Exception):
+    """Raised when a batch would exceed ANALYZE_MAX_PENDING contracts in flight."""
+
+
+class AnalysisJob:
+    """One review in flight, shared by every identical submission."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future: Future = Future()
+        self._events: List[Tuple[str, Dict[str, Any]]] = []
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+
+    def emit(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Workflow on_event: record the event and pass it to the listeners."""
+        with self._lock:
+            self._events.append((event_type, data))
+            for listener in self._listeners:
+                self._notify(listener, event_type, data)
+
+    def subscribe(self, listener: Listener) -> None:
+        """Receive the events emitted so far, then the next ones as they come."""
+        with self._lock:
+            for event_type, data in self._events:
+                self._notify(listener, event_type, data)
+            self._listeners.append(listener)
+
+    @staticmethod
+    def _notify(listener: Listener, event_type: str, data: Dict[str, Any]) -> None:
+        # a gone HTTP client must not fail the review the other submitters wait for
+        try:
+            listener(event_type, data)
+        except Exception as e:
+            print(f"Analysis listener failed: {e!r}")
+
+
+class Analyzer:
+    """Runs reviews on a bounded pool and coalesces identical in-flight contracts."""
+
+    def __init__(self, workflow: Callable[..., Dict[str, Any]] = process_contract_workflow,
+                 workers: int = ANALYZE_WORKERS, max_pending: int = ANALYZE_MAX_PENDING):
+        self.workflow = workflow
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(normalize_contract_text(text).encode("utf-8")).hexdigest()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analyze")
+        return self._executor
+
+    def submit_batch(self, texts: List[str],
+                     listeners: Optional[List[Optional[Listener]]] = None) -> List[Tuple[AnalysisJob, bool]]:
+        """(job, coalesced) per text. The whole batch is refused with AnalyzerBusy when it does not fit."""
+        keys = [self.key(text) for text in texts]
+        listeners = listeners or [None] * len(texts)
+        jobs, started = [], []
+        with self._lock:
+            new_keys = {key for key in keys if key not in self._jobs}
+            if new_keys and len(self._jobs) + len(new_keys) > self.max_pending:
+                ANALYZE_JOBS.labels("rejected").inc(len(texts))
+                raise AnalyzerBusy(f"{len(self._jobs)} contracts in flight")
+            for key, text, listener in zip(keys, texts, listeners):
+                job = self._jobs.get(key)
+                coalesced = job is not None
+                if job is None:
+                    job = self._jobs[key] = AnalysisJob(key)
+                    started.append((job, text))
+                if listener is not None:
+                    job.subscribe(listener)
+                ANALYZE_JOBS.labels("coalesced" if coalesced else "started").inc()
+                jobs.append((job, coalesced))
+        for job, text in started:
+            self._pool().submit(self._run, job, text)
+        return jobs
+
+    def _run(self, job: AnalysisJob, text: str) -> None:
+        try:
+            result, error = self.workflow(text, on_event=job.emit), None
+        except Exception as e:
+            print(f"Analysis failed: {e!r}")
+            result, error = None, e
+        # later submissions of this contract start a new review from here on
+        with self._lock:
+            self._jobs.pop(job.key, None)
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+
+analyzer = Analyzer()
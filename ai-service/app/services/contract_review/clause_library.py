@@ -0,0 +1,222 @@
+"""
+Library of already-judged clauses with near-duplicate lookup.
+
+Contracts built from the same template differ mostly in names, dates,
+amounts and identifiers, which defeats the exact-text verdict cache. Clauses
+are masked (dates, the PERSONAL_PATTERNS entities, honorific + name,
+identifiers, bare numbers) and cut into word shingles. MinHash signatures split into LSH bands
+give candidate matches in roughly constant time, and a candidate is accepted
+when the Jaccard similarity of its shingles reaches CLAUSE_LIBRARY_THRESHOLD.
+The new clause then inherits the library verdict without an LLM call.
+
+Numbers followed by a duration or rate unit ("12 mois", "44 heures", "25 %")
+are kept, and a match must carry exactly the same ones: they are usually what
+decides whether a clause is legal, and a single changed token would otherwise
+stay well within the similarity threshold.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+import numpy as np
+
+from .Generation import PERSONAL_RE, parse_verdict
+from .verdict_cache import normalize_clause_text
+
+load_dotenv(find_dotenv())
+CLAUSE_LIBRARY = os.getenv("CLAUSE_LIBRARY", "0") == "1"
+CLAUSE_LIBRARY_SEED = os.getenv("CLAUSE_LIBRARY_SEED", "legal-data/clause_library.json")
+CLAUSE_LIBRARY_THRESHOLD = float(os.getenv("CLAUSE_LIBRARY_THRESHOLD", "0.8"))
+CLAUSE_LIBRARY_MAX_ENTRIES = int(os.getenv("CLAUSE_LIBRARY_MAX_ENTRIES", "20000"))
+
+SHINGLE_SIZE = 2
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: a pair at Jaccard 0.7 is a candidate ~99.9% of the time
+_PRIME = (1 << 61) - 1
+
+MONTHS = r"(?:janvier|f[ée]vrier|mars|avril|mai|juin|juillet|ao[ûu]t|septembre|octobre|novembre|d[ée]cembre)"
+DATE_RE = re.compile(
+    rf"\b\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}\b|\b\d{{1,2}}(?:er)?\s+{MONTHS}\s+\d{{4}}\b",
+    flags=re.IGNORECASE,
+)
+NAME_RE = re.compile(r"\b(?:M\.|Mme|Mlle|Monsieur|Madame|Mademoiselle)\s+[A-ZÀ-Ý][\w'-]*(?:\s+[A-ZÀ-Ý][\w'-]*)*")
+ID_RE = re.compile(r"\b[A-Z]{1,4}-?\d{4,}\b", flags=re.IGNORECASE)
+NUMBER_RE = re.compile(
+    r"\d+(?:[ .,]\d{3})*(?:[.,]\d+)?"
+    r"(?P<unit>\s*(?:(?:mois|jours?|heures?|semaines?|ans|années?|h)\b|%))?",
+    flags=re.IGNORECASE,
+)
+
+
+def mask_clause_text(text: str) -> str:
+    """Clause text with the parts that vary between contracts replaced by placeholders."""
+    text = DATE_RE.sub(" <date> ", text or "")
+    text = NAME_RE.sub(" <nom> ", text)
+    text = ID_RE.sub(" <id> ", text)
+    text = PERSONAL_RE.sub(" <perso> ", text)
+    text = NUMBER_RE.sub(lambda m: m.group(0) if m.group("unit") else " <num> ", text)
+    return normalize_clause_text(text)
+
+
+def quantities(masked: str) -> Tuple[str, ...]:
+    """The durations and rates kept by mask_clause_text, which a match must repeat exactly."""
+    return tuple(sorted(normalize_clause_text(m.group(0)) for m in NUMBER_RE.finditer(masked)
+                        if m.group("unit")))
+
+
+def shingles(masked: str, size: int = SHINGLE_SIZE) -> FrozenSet[int]:
+    """Hashed word n-grams of masked text."""
+    words = re.findall(r"<\w+>|\w+|%", masked)
+    grams = [" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))]
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+        for gram in grams
+    )
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ClauseLibrary:
+    """Judged clauses indexed for near-duplicate lookup (MinHash LSH), thread-safe."""
+
+    def __init__(self, threshold: float = CLAUSE_LIBRARY_THRESHOLD,
+                 max_entries: int = CLAUSE_LIBRARY_MAX_ENTRIES, num_perm: int = NUM_PERM,
+                 bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        # a, b < 2**29 and shingle hashes < 2**32 keep a*x + b inside uint64
+        self._a = rng.randint(1, 1 << 29, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 29, size=num_perm).astype(np.uint64)
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[str, ...], FrozenSet[int], Tuple[Any, ...], Dict[str, Any]]]" = OrderedDict()
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, bytes], set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def _signature(self, grams: FrozenSet[int]) -> np.ndarray:
+        x = np.fromiter(grams, dtype=np.uint64, count=len(grams))
+        return ((np.outer(x, self._a) + self._b) % np.uint64(_PRIME)).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def add(self, clause_text: str, verdict: Dict[str, Any]) -> None:
+        masked = mask_clause_text(clause_text)
+        if not masked:
+            return
+        grams = shingles(masked)
+        band_keys = tuple(self._band_keys(self._signature(grams)))
+        with self._lock:
+            if masked in self._exact:
+                self._remove(self._exact[masked])
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (masked, quantities(masked), grams, band_keys, verdict)
+            self._exact[masked] = entry_id
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        masked, _, _, band_keys, _ = self._entries.pop(entry_id)
+        for key in band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+        if self._exact.get(masked) == entry_id:
+            del self._exact[masked]
+
+    def lookup(self, clause_text: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(verdict, similarity) of the closest judged clause at or above the threshold."""
+        masked = mask_clause_text(clause_text)
+        if not masked:
+            return None
+        facts = quantities(masked)
+        grams = shingles(masked)
+        band_keys = self._band_keys(self._signature(grams))
+        best: Optional[Tuple[Dict[str, Any], float]] = None
+        with self._lock:
+            self.lookups += 1
+            exact = self._exact.get(masked)
+            if exact is not None:
+                best = (self._entries[exact][4], 1.0)
+            else:
+                candidates = set()
+                for key in band_keys:
+                    candidates |= self._buckets.get(key, set())
+                for entry_id in candidates:
+                    _, entry_facts, entry_grams, _, verdict = self._entries[entry_id]
+                    if entry_facts != facts:
+                        continue
+                    similarity = jaccard(grams, entry_grams)
+                    if similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = (verdict, similarity)
+            if best is not None:
+                self.hits += 1
+        return best
+
+    def match_all(self, selected: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+        """Inherited verdicts for the (clause_index, clause_text) pairs that have a near duplicate."""
+        matched = {}
+        for clause_index, clause_text in selected:
+            found = self.lookup(clause_text)
+            if found is not None:
+                matched[clause_index] = found[0]
+        return matched
+
+    def load_seed(self, path: str) -> int:
+        """Add curated clauses from a JSON list of {"text", "compliant"} or {"text", "issue", "suggestion"}."""
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        loaded = 0
+        for record in records:
+            verdict = parse_verdict(record)
+            if verdict is not None and record.get("text"):
+                self.add(record["text"], verdict)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_library(enabled: bool = CLAUSE_LIBRARY, seed_path: str = CLAUSE_LIBRARY_SEED) -> Optional[ClauseLibrary]:
+    """The library configured by CLAUSE_LIBRARY, seeded from CLAUSE_LIBRARY_SEED when the file exists."""
+    if not enabled:
+        return None
+    library = ClauseLibrary()
+    if seed_path and os.path.exists(seed_path):
+        print(f"Clause library: {library.load_seed(seed_path)} seed clauses loaded from {seed_path}")
+    return library
+
+
+clause_library = create_library()
@@ -0,0 +1,153 @@
+"""
+Labor-code context for the clause prompts, packed into a token budget.
+
+Each clause brings its CONTEXT_TOP_K retrieved sections. A section is cut
+down to its sentences sharing the most words with the clauses citing it,
+within that clause's share of CONTEXT_TOKENS_PER_CLAUSE, and kept in their
+original order. A section cited by several clauses of one prompt is written
+once, as [L1], [L2] ..., and the clauses refer to it by label. The whole
+block never exceeds CONTEXT_MAX_TOKENS; sections that do not fit are left out.
+
+Tokens are estimated from characters (about 4 per token for French text),
+which is what the budget is about: prompt size, hence latency and cost.
+"""
+
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+from .response_parser import clip
+
+load_dotenv(find_dotenv())
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "2"))
+CONTEXT_TOKENS_PER_CLAUSE = int(os.getenv("CONTEXT_TOKENS_PER_CLAUSE", "250"))
+# Cap on the legal context of one prompt; 0 sends no context at all
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1000"))
+CHARS_PER_TOKEN = 4
+MIN_EXCERPT_TOKENS = 12  # below this an excerpt says nothing useful
+
+SENTENCE_END_RE = re.compile(r"(?<=[.;!?])\s+")
+WORD_RE = re.compile(r"\w{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def words(text: str) -> Set[str]:
+    return set(WORD_RE.findall(text.lower()))
+
+
+def relevant_sentences(text: str, query_words: Set[str], max_tokens: int) -> str:
+    """The sentences of text sharing the most words with query_words, in text order, within max_tokens."""
+    sentences = [s for s in SENTENCE_END_RE.split(" ".join(text.split())) if s]
+    if not sentences or max_tokens <= 0:
+        return ""
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(words(sentences[i]) & query_words), i))
+    kept: List[int] = []
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        kept.append(i)
+        used += cost
+    if not kept:
+        # even the best sentence is too long: keep its beginning
+        return clip(sentences[ranked[0]], max_tokens * CHARS_PER_TOKEN)
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def context_mode(context: Optional[Dict[int, List[Dict[str, Any]]]]) -> str:
+    """Verdict cache variant, so verdicts given with and without legal context never share entries.
+
+    Prompts without context use the default (empty) variant, the cache keys
+    verdicts had before context was added.
+    """
+    if not context or CONTEXT_MAX_TOKENS <= 0:
+        return ""
+    return f"context:{CONTEXT_TOP_K}:{CONTEXT_TOKENS_PER_CLAUSE}:{CONTEXT_MAX_TOKENS}"
+
+
+def clause_context(matches: Iterable[Dict[str, Any]],
+                   clauses: Iterable[Tuple[int, str]] = ()) -> Dict[int, List[Dict[str, Any]]]:
+    """{clause_index: sections} from retrieval results.
+
+    Takes retrieve_sections_bulk output ({"index", "sections"} per clause) or
+    retrieve_sections_memory output (bare {"title", "text"} sections of the
+    whole contract); a bare section goes to the clause of `clauses` sharing
+    the most words with it.
+    """
+    context: Dict[int, List[Dict[str, Any]]] = {}
+    clause_words = [(clause_index, words(clause_text)) for clause_index, clause_text in clauses]
+    for match in matches:
+        if "index" in match:
+            if match.get("sections"):
+                context[match["index"]] = match["sections"]
+        elif clause_words and (match.get("text") or "").strip():
+            section_words = words(match["text"])
+            best = max(clause_words, key=lambda clause: len(clause[1] & section_words))[0]
+            context.setdefault(best, []).append(match)
+    return context
+
+
+class PackedContext:
+    """The legal excerpts of one prompt and the labels each clause refers to."""
+
+    def __init__(self, excerpts: List[Tuple[str, str, str]], refs: Dict[int, List[str]]):
+        self.excerpts = excerpts  # (label, title, excerpt)
+        self.refs = refs
+
+    def __bool__(self) -> bool:
+        return bool(self.excerpts)
+
+    def block(self) -> str:
+        return "\n".join(f"[{label}] {title} : {excerpt}" for label, title, excerpt in self.excerpts)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.block())
+
+
+def pack_context(items: Iterable[Tuple[int, str]], matches: Optional[Dict[int, List[Dict[str, Any]]]],
+                 tokens_per_clause: int = CONTEXT_TOKENS_PER_CLAUSE,
+                 max_tokens: int = CONTEXT_MAX_TOKENS) -> PackedContext:
+    """Pack the retrieved sections ({clause_index: [{"title", "text"}, ...]}) of the clauses of one prompt."""
+    items = list(items)
+    if not matches or max_tokens <= 0:
+        return PackedContext([], {})
+
+    # every distinct section once, in first-cited order, with the clauses citing it
+    sections: Dict[str, Dict[str, Any]] = {}
+    for clause_index, clause_text in items:
+        cited = [s for s in matches.get(clause_index) or [] if (s.get("text") or "").strip()]
+        if not cited:
+            continue
+        share = tokens_per_clause // len(cited)
+        clause_words = words(clause_text)
+        for section in cited:
+            entry = sections.setdefault(section["text"], {
+                "title": section.get("title") or "", "text": section["text"],
+                "clauses": [], "words": set(), "budget": 0,
+            })
+            if clause_index not in entry["clauses"]:
+                entry["clauses"].append(clause_index)
+            entry["words"] |= clause_words
+            entry["budget"] = max(entry["budget"], share)
+
+    excerpts: List[Tuple[str, str, str]] = []
+    refs: Dict[int, List[str]] = {}
+    used = 0
+    for entry in sections.values():
+        label = f"L{len(excerpts) + 1}"
+        prefix = f"[{label}] {entry['title']} : "
+        budget = min(entry["budget"], max_tokens - used) - estimate_tokens(prefix) - 1
+        excerpt = relevant_sentences(entry["text"], entry["words"], budget) \
+            if budget >= MIN_EXCERPT_TOKENS else ""
+        if not excerpt:
+            continue
+        excerpts.append((label, entry["title"], excerpt))
+        used += estimate_tokens(prefix + excerpt) + 1
+        for clause_index in entry["clauses"]:
+            refs.setdefault(clause_index, []).append(label)
+    return PackedContext(excerpts, refs)
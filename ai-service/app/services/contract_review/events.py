@@ -0,0 +1,78 @@
+"""
+Incremental progress events for a contract review.
+
+Every event is appended to the Redis Stream `contract_events:<id>` (so a relay
+that reconnects can resume after the last sequence number it saw) and
+published on the `contract_events` pub/sub channel. Events carry a per-contract
+sequence number taken from Redis, so workers processing fan-out parts of the
+same contract share one sequence. Numbering, appending and publishing an event
+is a single script call: one round trip per event.
+
+Event types: accepted, split, verdict, completed. The final result message on
+`contract_results` is unchanged.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+EVENTS_CHANNEL = "contract_events"
+EVENTS_STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", "1000"))
+EVENTS_TTL = int(os.getenv("EVENTS_TTL", "3600"))
+
+# KEYS: stream, sequence counter. ARGV: payload before and after the sequence
+# number, stream max length, TTL, channel. Returns the sequence number.
+EMIT_LUA = """
+local seq = redis.call('INCR', KEYS[2])
+local payload = ARGV[1] .. seq .. ARGV[2]
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'event', payload)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('PUBLISH', ARGV[5], payload)
+return seq
+"""
+
+
+def stream_key(contract_id: str) -> str:
+    return f"contract_events:{contract_id}"
+
+
+class ContractEventPublisher:
+    """Emits events for one contract; callable as on_event(event_type, data)."""
+
+    def __init__(self, store: Any, contract_id: str, channel: str = EVENTS_CHANNEL):
+        self.store = store
+        self.contract_id = contract_id
+        self.channel = channel
+        self._emit = store.register_script(EMIT_LUA)
+
+    def emit(self, event_type: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
+        key = stream_key(self.contract_id)
+        body = {"type": event_type, "ts": time.time(), **(data or {})}
+        # the script splices the sequence number in: {"id": ..., "seq": <seq>, "type": ..., ...}
+        head = '{"id": ' + json.dumps(self.contract_id, ensure_ascii=False) + ', "seq": '
+        tail = ", " + json.dumps(body, ensure_ascii=False)[1:]
+        seq = int(self._emit(keys=[key, key + ":seq"],
+                             args=[head, tail, EVENTS_STREAM_MAXLEN, EVENTS_TTL, self.channel]))
+        return {"id": self.contract_id, "seq": seq, **body}
+
+    def __call__(self, event_type: str, data: Dict[str, Any] = None) -> None:
+        try:
+            self.emit(event_type, data)
+        except Exception as e:
+            # progress events are best effort; never fail a review over them
+            print(f"Failed to publish {event_type} event for {self.contract_id}: {e!r}")
+
+
+def read_events(store: Any, contract_id: str, after_seq: int = 0) -> list:
+    """Events of a contract with seq > after_seq, oldest first (for resuming relays)."""
+    events = []
+    for _, fields in store.xrange(stream_key(contract_id)):
+        raw = fields.get(b"event", fields.get("event"))
+        event = json.loads(raw)
+        if event["seq"] > after_seq:
+            events.append(event)
+    return sorted(events, key=lambda event: event["seq"])
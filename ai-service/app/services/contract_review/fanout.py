@@ -0,0 +1,181 @@
+"""
+Map-reduce review of large contracts.
+
+The worker that splits a large contract settles what it can without the LLM
+(revision reuse, clause library, triage; see process_contract_workflow's
+dispatch) and publishes the clauses left as sub-jobs of FANOUT_BATCH_SIZE
+clauses. Any worker can evaluate a sub-job; each one stores its part in Redis,
+and whichever worker stores the last part assembles the same result a
+contract reviewed in one piece gets. Parts that fail are recorded as such, and
+contracts still incomplete after FANOUT_TIMEOUT seconds are assembled from the
+parts that did arrive (status "partial").
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+from .Generation import evaluate_clauses, issues_from_verdicts, select_clauses
+from .context_packing import CONTEXT_MAX_TOKENS, CONTEXT_TOP_K, clause_context
+from .retriever_contract import retrieve_sections_bulk
+
+load_dotenv(find_dotenv())
+# Contracts with at least this many clauses to evaluate are fanned out; 0 disables fan-out.
+FANOUT_MIN_CLAUSES = int(os.getenv("FANOUT_MIN_CLAUSES", "0"))
+FANOUT_BATCH_SIZE = int(os.getenv("FANOUT_BATCH_SIZE", "8"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "900"))
+SUBJOB_QUEUE = os.getenv("SUBJOB_QUEUE", "contract-subjob-queue")
+PENDING_KEY = "fanout:pending"
+
+
+def _meta_key(contract_id: str) -> str:
+    return f"fanout:{contract_id}:meta"
+
+
+def _parts_key(contract_id: str) -> str:
+    return f"fanout:{contract_id}:parts"
+
+
+def _done_key(contract_id: str) -> str:
+    return f"fanout:{contract_id}:done"
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def should_fan_out(sections: List[Dict[str, Any]], min_clauses: int = FANOUT_MIN_CLAUSES) -> bool:
+    return min_clauses > 0 and len(select_clauses(sections)) >= min_clauses
+
+
+def plan_subjobs(contract_id: str, clauses: List[Tuple[int, str]],
+                 batch_size: int = FANOUT_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Sub-job messages covering the (clause_index, clause_text) pairs left for the LLM."""
+    chunks = [clauses[i:i + batch_size] for i in range(0, len(clauses), batch_size)]
+    return [
+        {"contractId": contract_id, "part": part, "parts": len(chunks),
+         "clauses": [[clause_index, clause_text] for clause_index, clause_text in chunk]}
+        for part, chunk in enumerate(chunks)
+    ]
+
+
+def start_fanout(contract_id: str, clauses: List[Tuple[int, str]], store: Any,
+                 publish: Callable[[Dict[str, Any]], None], batch_size: int = FANOUT_BATCH_SIZE,
+                 timeout: float = FANOUT_TIMEOUT, review: Optional[Dict[str, Any]] = None) -> int:
+    """Register the contract and publish its sub-jobs. Returns the number of parts.
+
+    `review` is the dispatch state of process_contract_workflow; without it
+    `clauses` are the whole review.
+    """
+    subjobs = plan_subjobs(contract_id, clauses, batch_size)
+    if not subjobs:
+        return 0
+    if review is None:
+        review = {"selected": [[idx, text] for idx, text in clauses], "settled": {}, "summary": {},
+                  "lineage": None, "sections": []}
+    deadline = time.time() + timeout
+    ttl = int(timeout * 2)
+    store.hset(_meta_key(contract_id), mapping={"parts": len(subjobs), "deadline": deadline,
+                                               "review": json.dumps(review, ensure_ascii=False)})
+    store.expire(_meta_key(contract_id), ttl)
+    store.zadd(PENDING_KEY, {contract_id: deadline})
+    for subjob in subjobs:
+        publish(subjob)
+    return len(subjobs)
+
+
+def run_subjob(message: Dict[str, Any], store: Any,
+               on_complete: Callable[[str, Dict[str, Any], Dict[str, Any]], None],
+               client: Any = None,
+               on_verdict: Optional[Callable[[int, str, Optional[Dict[str, Any]]], None]] = None
+               ) -> Optional[Dict[str, Any]]:
+    """Evaluate one sub-job and store its part; assembles the result when it is the last one."""
+    contract_id = message["contractId"]
+    if store.exists(_done_key(contract_id)):
+        return None  # contract already assembled (timed out); drop the late part
+
+    pairs = [(int(clause_index), clause_text) for clause_index, clause_text in message["clauses"]]
+    try:
+        # same labor-code grounding as contracts reviewed in one piece
+        context = None
+        if CONTEXT_MAX_TOKENS > 0:
+            context = clause_context(retrieve_sections_bulk(
+                [{"index": idx, "text": text} for idx, text in pairs], k=CONTEXT_TOP_K))
+        verdicts = evaluate_clauses(pairs, client=client, on_verdict=on_verdict, context=context)
+        part = {"verdicts": {str(idx): verdict for idx, verdict in verdicts.items() if verdict is not None},
+                "unevaluated": sum(1 for clause_index, _ in pairs if verdicts.get(clause_index) is None)}
+    except Exception as e:
+        print(f"Sub-job {message['part']} of contract {contract_id} failed: {e!r}")
+        part = {"error": repr(e)[:500], "clauses": [clause_index for clause_index, _ in pairs]}
+
+    store.hset(_parts_key(contract_id), str(message["part"]), json.dumps(part))
+    store.expire(_parts_key(contract_id), int(FANOUT_TIMEOUT * 2))
+    if store.hlen(_parts_key(contract_id)) >= int(message["parts"]):
+        return finalize(contract_id, store, on_complete)
+    return None
+
+
+def finalize(contract_id: str, store: Any,
+             on_complete: Callable[[str, Dict[str, Any], Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+    """Assemble whatever parts arrived. Only the first caller per contract does it.
+
+    on_complete(contract_id, result, review) gets the dispatch state with
+    "verdicts" (every verdict, by clause index) and "evaluated" (the clauses
+    the LLM judged) added, to record them like the one-piece workflow does.
+    """
+    if not store.set(_done_key(contract_id), 1, nx=True, ex=int(FANOUT_TIMEOUT * 2)):
+        return None
+
+    meta = {_text(k): _text(v) for k, v in store.hgetall(_meta_key(contract_id)).items()}
+    parts = {_text(k): json.loads(v) for k, v in store.hgetall(_parts_key(contract_id)).items()}
+    total = int(meta.get("parts", len(parts)))
+    review = json.loads(meta.get("review") or '{"selected": [], "settled": {}, "summary": {}}')
+    selected = [(int(idx), text) for idx, text in review["selected"]]
+
+    verdicts: Dict[int, Optional[Dict[str, Any]]] = {}
+    failed = 0
+    unevaluated = 0
+    for part in range(total):
+        entry = parts.get(str(part))
+        if entry is None or "error" in entry:
+            failed += 1
+            continue
+        verdicts.update({int(idx): verdict for idx, verdict in entry["verdicts"].items()})
+        unevaluated += entry.get("unevaluated", 0)
+    settled = {int(idx): verdict for source in review["settled"].values() for idx, verdict in source.items()}
+    evaluated = [(idx, text) for idx, text in selected if idx not in settled]
+    verdicts.update(settled)
+    output = issues_from_verdicts(selected, verdicts)
+
+    result: Dict[str, Any] = {
+        "status": "ok" if not failed and not unevaluated else "partial",
+        "problematic_count": len(output),
+        "output": output,
+    }
+    if failed:
+        result["failed_parts"] = failed
+        result["total_parts"] = total
+    if unevaluated:
+        result["unevaluated"] = unevaluated
+    result.update(review["summary"])
+
+    store.zrem(PENDING_KEY, contract_id)
+    store.delete(_meta_key(contract_id), _parts_key(contract_id))
+    on_complete(contract_id, result, {**review, "verdicts": verdicts, "evaluated": evaluated})
+    return result
+
+
+def expire_overdue(store: Any, on_complete: Callable[[str, Dict[str, Any], Dict[str, Any]], None],
+                   now: Optional[float] = None) -> List[str]:
+    """Assemble contracts whose deadline passed. Returns their ids."""
+    now = time.time() if now is None else now
+    expired = []
+    for contract_id in store.zrangebyscore(PENDING_KEY, 0, now):
+        contract_id = _text(contract_id)
+        if finalize(contract_id, store, on_complete) is not None:
+            expired.append(contract_id)
+        else:
+            store.zrem(PENDING_KEY, contract_id)
+    return expired
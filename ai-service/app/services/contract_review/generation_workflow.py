@@ -1,37 +1,160 @@
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from .splitter_contract import split_contract_memory
-from .retriever_contract import retrieve_sections_memory
-from .Generation import generate_issues_memory
+from .retriever_contract import retrieve_sections_bulk
+from .context_packing import CONTEXT_MAX_TOKENS, CONTEXT_TOP_K, clause_context
+from .Generation import evaluate_clauses, issue_entry, issues_from_verdicts, select_clauses
+from .revisions import RevisionStore, reuse_verdicts
+from .clause_library import ClauseLibrary, clause_library
+from .triage import TriageModel, triage_model
+from app.metrics import stage
 
-def process_contract_workflow(contract_text: str) -> Dict[str, Any]:
+def verdict_event(clause_index: int, clause_text: str, verdict: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Payload of a "verdict" progress event."""
+    if verdict is None:
+        return {"clause_index": clause_index, "compliant": None}
+    if verdict.get("compliant") is True:
+        return {"clause_index": clause_index, "compliant": True}
+    return {"compliant": False, **issue_entry(clause_index, clause_text, verdict)}
+
+def _settle(pending: List[Tuple[int, str]], settled: Dict[int, Dict[str, Any]],
+            on_verdict: Optional[Callable[[int, str, Optional[Dict[str, Any]]], None]]) -> List[Tuple[int, str]]:
+    """Emit the verdicts settled without the LLM and return the clauses still pending."""
+    if on_verdict is not None:
+        for clause_index, clause_text in pending:
+            if clause_index in settled:
+                on_verdict(clause_index, clause_text, settled[clause_index])
+    return [(idx, text) for idx, text in pending if idx not in settled]
+
+def record_verdicts(sections: List[Dict[str, Any]], evaluated: List[Tuple[int, str]],
+                    verdicts: Dict[int, Optional[Dict[str, Any]]],
+                    revisions: Optional[RevisionStore] = None, lineage: Optional[str] = None,
+                    library: Optional[ClauseLibrary] = None, sources: Optional[Dict[int, str]] = None) -> None:
+    """Add the LLM verdicts of `evaluated` to the clause library and save the revision,
+    `sources` telling which verdicts the LLM did not give (see revisions.SOURCES)."""
+    if library is not None:
+        for clause_index, clause_text in evaluated:
+            if verdicts.get(clause_index) is not None:
+                library.add(clause_text, verdicts[clause_index])
+    if revisions is not None and lineage:
+        revisions.save(lineage, sections, verdicts, sources)
+
+def review_summary(settled: Dict[str, Dict[int, Dict[str, Any]]], reevaluated: int, tracked: bool,
+                   library: Optional[ClauseLibrary], triage: Optional[TriageModel]) -> Dict[str, Any]:
+    """Result keys counting the clauses settled without the LLM."""
+    summary: Dict[str, Any] = {}
+    if tracked:
+        summary["revision"] = {"reused": len(settled["reused"]), "reevaluated": reevaluated}
+    if library is not None:
+        summary["short_circuited"] = len(settled["library"])
+    if triage is not None:
+        summary["triaged"] = len(settled["triage"])
+    return summary
+
+def review_result(selected: List[Tuple[int, str]], verdicts: Dict[int, Optional[Dict[str, Any]]],
+                  summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Result in the same format as the old project; clauses the LLM gave nothing
+    usable for make it "partial" (not served to re-uploads)."""
+    problematic = issues_from_verdicts(selected, verdicts)
+    unevaluated = sum(1 for clause_index, _ in selected if verdicts.get(clause_index) is None)
+    result = {
+        "status": "ok" if not unevaluated else "partial",
+        "problematic_count": len(problematic),
+        "output": problematic
+    }
+    if unevaluated:
+        result["unevaluated"] = unevaluated
+    result.update(summary)
+    return result
+
+def process_contract_workflow(contract_text: str,
+                              on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                              revisions: Optional[RevisionStore] = None,
+                              lineage: Optional[str] = None,
+                              library: Optional[ClauseLibrary] = None,
+                              triage: Optional[TriageModel] = None,
+                              dispatch: Optional[Callable[[List[Tuple[int, str]], Dict[str, Any]], bool]] = None
+                              ) -> Optional[Dict[str, Any]]:
     """
     Main workflow orchestrator. Processes contract through pipeline:
     text -> splitter -> retriever -> generation -> result
     
     Returns same structure as old project for frontend compatibility.
+    on_event(event_type, data), when given, receives "split", "verdict"
+    (one per evaluated clause, as soon as it is known) and "completed" events.
+    With a revision store and lineage, clauses unchanged since the previous
+    revision reuse its verdicts and the result gains a "revision" summary.
+    With a clause library (default: the CLAUSE_LIBRARY one), near duplicates
+    of already-judged clauses inherit their verdict without an LLM call, the
+    new verdicts are added to it, and "short_circuited" counts the inherited ones.
+    With a triage model (default: the TRIAGE one), clauses it finds confidently
+    compliant skip the LLM and "triaged" counts them.
+    Clauses left without a verdict (LLM failures, open circuit) make the status
+    "partial", with their number in "unevaluated".
+    dispatch(pending, review), when given, may take over the clauses left for
+    the LLM (fan-out): when it returns True the workflow stops there and returns
+    None. `review` is the JSON-ready state needed to assemble the result later
+    (see fanout.finalize).
     """
+    library = library if library is not None else clause_library
+    triage = triage if triage is not None else triage_model
+    tracked = revisions is not None and bool(lineage)
     # Step 1: Split contract into sections
-    sections = split_contract_memory(contract_text)
-    
-    # Step 2: Prepare clauses for retrieval
-    clauses = []
-    for i, item in enumerate(sections):
-        text = item.get("section_text") or ""
-        clauses.append({
-            "index": i,
-            "title": item.get("section_title", ""),
-            "text": text
-        })
-    
-    # Step 3: Retrieve matching legal sections
-    retrieval_data = retrieve_sections_memory(clauses)
-    
-    # Step 4: Generate issues
-    problematic = generate_issues_memory(sections, retrieval_data)
+    with stage("split"):
+        sections = split_contract_memory(contract_text)
+    with stage("prefilter"):
+        selected = select_clauses(sections)
+    if on_event is not None:
+        on_event("split", {"sections_count": len(sections), "clauses_count": len(selected)})
     
+    # Step 2: Settle what can be without the LLM: verdicts of clauses unchanged since
+    # the last revision, clause library matches, confidently compliant clauses
+    on_verdict = None
+    if on_event is not None:
+        on_verdict = lambda idx, text, verdict: on_event("verdict", verdict_event(idx, text, verdict))
+    previous = revisions.load(lineage) if tracked else None
+    settled: Dict[str, Dict[int, Dict[str, Any]]] = {"reused": {}, "library": {}, "triage": {}}
+    settled["reused"], sources = reuse_verdicts(previous, sections, selected)
+    to_evaluate = _settle(selected, settled["reused"], on_verdict)
+    if library is not None:
+        with stage("clause_library"):
+            settled["library"] = library.match_all(to_evaluate)
+        to_evaluate = _settle(to_evaluate, settled["library"], on_verdict)
+    if triage is not None:
+        with stage("triage"):
+            settled["triage"] = triage.route(to_evaluate)
+        to_evaluate = _settle(to_evaluate, settled["triage"], on_verdict)
+    summary = review_summary(settled, len(to_evaluate), tracked, library, triage)
+    for source in ("library", "triage"):
+        sources.update(dict.fromkeys(settled[source], source))
+
+    if dispatch is not None and to_evaluate:
+        review = {
+            "selected": [[idx, text] for idx, text in selected],
+            "settled": {source: {str(idx): verdict for idx, verdict in verdicts.items()}
+                        for source, verdicts in settled.items()},
+            "summary": summary,
+            "sources": {str(idx): source for idx, source in sources.items()},
+            "lineage": lineage if tracked else None,
+            "sections": [s.get("section_text") or "" for s in sections] if tracked else [],
+        }
+        if dispatch(to_evaluate, review):
+            return None
+
+    # Step 3: Retrieve the labor-code sections of the clauses left for the LLM
+    context = None
+    if to_evaluate and CONTEXT_MAX_TOKENS > 0:
+        with stage("retrieve"):
+            context = clause_context(retrieve_sections_bulk(
+                [{"index": idx, "text": text} for idx, text in to_evaluate], k=CONTEXT_TOP_K))
+
+    # Step 4: Generate issues, grounded in the packed sections
+    verdicts = evaluate_clauses(to_evaluate, on_verdict=on_verdict, context=context)
+    for source_verdicts in settled.values():
+        verdicts.update(source_verdicts)
+    record_verdicts(sections, to_evaluate, verdicts, revisions, lineage, library, sources)
+
     # Step 5: Return result in same format as old project
-    return {
-        "status": "ok",
-        "problematic_count": len(problematic),
-        "output": problematic
-    }
\ No newline at end of file
+    result = review_result(selected, verdicts, summary)
+    if on_event is not None:
+        on_event("completed", {"status": result["status"], "problematic_count": result["problematic_count"]})
+    return result
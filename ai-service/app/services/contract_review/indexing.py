@@ -11,9 +11,6 @@ from .splitter_contract import split_contract_local, CONTRACT_CHUNKS_PATH
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-os.makedirs(CONTRACT_TMP_PATH, exist_ok=True)
-os.makedirs(CONTRACT_CHUNKS_PATH, exist_ok=True)
-
 def index_contract(txt):
     try:
         timestamp = int(time.time())
@@ -1,31 +1,38 @@
 import os
 import re
-import pdfplumber
 from pathlib import Path
+from typing import Any, Dict, Iterator, List
 from fastapi import APIRouter, UploadFile, File, HTTPException
 import logging
 
+from app.services.pdf_extraction import iter_pages
+from .splitter_contract import split_contract_lines
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 CONTRACT_TMP_PATH = "legal-data/contracts_tmp/"
-os.makedirs(CONTRACT_TMP_PATH, exist_ok=True)
+
+
+def clean_contract_page(page_text: str) -> str:
+    """Strip lines, drop warning signs and empty lines."""
+    lines = (re.sub(r"⚠\ufe0f?", "", line.strip()) for line in page_text.split("\n"))
+    return "\n".join(line for line in lines if line.strip())
+
+
+def iter_contract_pages(file_path: str) -> Iterator[str]:
+    """Cleaned text of each page as soon as it is extracted."""
+    return iter_pages(file_path, clean=clean_contract_page)
+
+
+def split_contract_pdf(file_path: str) -> List[Dict[str, Any]]:
+    """Split a contract PDF into sections while its pages are still being extracted."""
+    return split_contract_lines(line for page in iter_contract_pages(file_path) for line in page.splitlines())
 
 
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from PDF, preserve paragraph/newline structure."""
-    text_lines = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                lines = [line.strip() for line in page_text.split("\n")]
-                text_lines.extend(lines)
-                text_lines.append("")  # add empty line between pages
-
-    clean_lines = [re.sub(r"⚠", "", line) for line in text_lines]
-    text = "\n".join([line for line in clean_lines if line.strip()])
-    return text
+    return "\n".join(page for page in iter_contract_pages(file_path) if page)
 
 
 def parse_contract_pdf_to_txt(file_path: str):
@@ -33,6 +40,7 @@ def parse_contract_pdf_to_txt(file_path: str):
     text = extract_text_from_pdf(file_path)
     txt_filename = Path(file_path).stem + ".txt"
     txt_path = os.path.join(CONTRACT_TMP_PATH, txt_filename)
+    os.makedirs(CONTRACT_TMP_PATH, exist_ok=True)
 
     with open(txt_path, "w", encoding="utf-8") as f:
         f.write(text)
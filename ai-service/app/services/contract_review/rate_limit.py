@@ -0,0 +1,328 @@
+"""
+Quota, backoff, circuit breaking and hedging around Gemini calls.
+
+- Token bucket: LLM_RATE_LIMIT_RPM requests per minute with bursts of
+  LLM_RATE_LIMIT_BURST. With LLM_RATE_LIMITER=redis the bucket lives in Redis
+  (one atomic Lua script per call) and is shared by every worker process; if
+  Redis is unreachable each process falls back to a local bucket.
+- A 429 pauses the bucket for the provider's retry-after (or the backoff
+  delay), so every worker holds off instead of retrying into the quota.
+- Other failures back off exponentially with full jitter, and after
+  LLM_CIRCUIT_FAILURES consecutive ones the circuit opens: calls fail fast for
+  LLM_CIRCUIT_RESET seconds, then a single trial call decides whether it closes.
+- With LLM_HEDGE_PERCENTILE set, a call still running after that percentile
+  of recent latencies is duplicated (if the bucket has a token to spare) and
+  the first answer wins. Hedgeable calls run on LLM_HEDGE_WORKERS threads;
+  when those are busy, calls run unhedged on the caller's thread.
+"""
+
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+from dotenv import load_dotenv, find_dotenv
+
+from app.metrics import LLM_HEDGES
+
+load_dotenv(find_dotenv())
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_BURST = float(os.getenv("LLM_RATE_LIMIT_BURST", "5"))
+LLM_RATE_LIMITER = os.getenv("LLM_RATE_LIMITER", "local")
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET = float(os.getenv("LLM_CIRCUIT_RESET", "30"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "32"))
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+RETRY_AFTER_RE = re.compile(
+    r"retry[ _-]?(?:after|delay|in)[^0-9]{0,20}(\d+(?:\.\d+)?)\s*(ms)?", flags=re.IGNORECASE,
+)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True for quota errors (HTTP 429 / RESOURCE_EXHAUSTED), whatever client raised them."""
+    for attr in ("code", "status_code", "status"):
+        if getattr(error, attr, None) == 429:
+            return True
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait, if the error says so."""
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)) and value >= 0:
+        return float(value)
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+    match = RETRY_AFTER_RE.search(str(error))
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000 if match.group(2) else seconds
+    return None
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Process-local token bucket. rate_per_minute <= 0 means unlimited (pauses still apply)."""
+
+    def __init__(self, rate_per_minute: float = LLM_RATE_LIMIT_RPM, burst: float = LLM_RATE_LIMIT_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, block: bool = True) -> Optional[float]:
+        """Take a token. Returns how long to wait before using it, or None if
+        block is False and no token is available right now."""
+        with self._lock:
+            now = self.clock()
+            pause = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return None if pause and not block else pause
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if not block and (self._tokens < 1 or pause):
+                return None
+            self._tokens -= 1
+            return max(pause, -self._tokens / self.rate if self._tokens < 0 else 0.0)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+
+# Reserve a token, letting the balance go negative (the caller then waits its
+# turn) unless ARGV[3] asks for an immediate token only. Returns the wait in
+# seconds as a string, or "-1" when no immediate token is available.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local immediate = ARGV[3] == '1'
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'paused_until')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+local pause = math.max(0, (tonumber(state[3]) or 0) - now)
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if immediate and (tokens < 1 or pause > 0) then
+  redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+  return '-1'
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 3600)
+local wait = 0
+if tokens < 0 then wait = -tokens / rate end
+return tostring(math.max(wait, pause))
+"""
+
+# Push the shared pause deadline forward (never back), on the Redis clock.
+PAUSE_LUA = """
+local t = redis.call('TIME')
+local until_ts = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0
+if until_ts > current then redis.call('HSET', KEYS[1], 'paused_until', until_ts) end
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 3600)
+return 1
+"""
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every process through Redis, with a local fallback."""
+
+    def __init__(self, client: Any = None, rate_per_minute: float = LLM_RATE_LIMIT_RPM,
+                 burst: float = LLM_RATE_LIMIT_BURST, key: str = "llm:bucket"):
+        if client is None:
+            import redis
+            client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+        self.key = key
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.fallback = TokenBucket(rate_per_minute, burst)
+        self._reserve = client.register_script(TOKEN_BUCKET_LUA)
+        self._pause = client.register_script(PAUSE_LUA)
+        self._warned = False
+
+    def _failed(self, error: Exception) -> None:
+        if not self._warned:
+            print(f"Shared LLM rate limiter unavailable, using a local bucket: {error!r}")
+            self._warned = True
+
+    def reserve(self, block: bool = True) -> Optional[float]:
+        if self.rate <= 0:
+            return self.fallback.reserve(block)
+        try:
+            wait_s = float(self._reserve(keys=[self.key], args=[self.rate, self.burst, 0 if block else 1]))
+        except Exception as e:
+            self._failed(e)
+            return self.fallback.reserve(block)
+        return None if wait_s < 0 else wait_s
+
+    def pause(self, seconds: float) -> None:
+        self.fallback.pause(seconds)
+        try:
+            self._pause(keys=[self.key], args=[seconds])
+        except Exception as e:
+            self._failed(e)
+
+
+def acquire(bucket: Any, block: bool = True) -> bool:
+    """Wait for a token. With block=False, take one only if available immediately."""
+    wait_s = bucket.reserve(block)
+    if wait_s is None:
+        return False
+    if wait_s > 0:
+        time.sleep(wait_s)
+    return True
+
+
+def create_rate_limiter(name: str = LLM_RATE_LIMITER) -> Any:
+    """The bucket named by LLM_RATE_LIMITER (local|redis)."""
+    name = (name or "local").lower()
+    if name == "local":
+        return TokenBucket()
+    if name == "redis":
+        return RedisTokenBucket()
+    raise ValueError(f"Unknown LLM rate limiter: {name}")
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive errors -> half-open after `reset` seconds."""
+
+    def __init__(self, failures: int = LLM_CIRCUIT_FAILURES, reset: float = LLM_CIRCUIT_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.reset = reset
+        self.clock = clock
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self._opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. In half-open state only one trial call is let through."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.clock() - self._opened_at < self.reset or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def release(self) -> None:
+        """End a call that said nothing about the provider's health (429): the state and
+        failure count stay as they were, and a half-open breaker may send another trial."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or (self.failures > 0 and self._consecutive >= self.failures):
+                self._opened_at = self.clock()
+            self._trial = False
+
+
+class Hedger:
+    """Duplicates calls that outlive the given percentile of recent latencies."""
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 window: int = 200, max_workers: int = LLM_HEDGE_WORKERS):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # pool threads free to take a call: nothing waits in the pool queue, where
+        # queueing time would count towards the hedge delay and cap concurrency
+        self._slots = threading.BoundedSemaphore(max(1, max_workers))
+
+    def delay(self) -> Optional[float]:
+        """Seconds after which a call gets hedged; None until enough latencies are known."""
+        with self._lock:
+            if self.percentile <= 0 or len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        rank = max(0, min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _timed(self, fn: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        result = fn()
+        self.record(time.perf_counter() - start)
+        return result
+
+    def _pooled(self, fn: Callable[[], Any]) -> Any:
+        try:
+            return self._timed(fn)
+        finally:
+            self._slots.release()
+
+    def call(self, fn: Callable[[], Any], may_hedge: Callable[[], bool]) -> Any:
+        """fn(), hedged with a second fn() if it runs too long and may_hedge() grants a token."""
+        delay = self.delay()
+        if delay is None or not self._slots.acquire(blocking=False):
+            return self._timed(fn)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+        primary = self._pool.submit(self._pooled, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._slots.acquire(blocking=False):
+            return primary.result()
+        if not may_hedge():
+            self._slots.release()
+            return primary.result()
+
+        LLM_HEDGES.labels("sent").inc()
+        hedge = self._pool.submit(self._pooled, fn)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        LLM_HEDGES.labels("won").inc()
+                    return future.result()
+                error = future.exception()
+        raise error
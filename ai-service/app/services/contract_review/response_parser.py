@@ -0,0 +1,109 @@
+"""
+Parsing of the LLM answers.
+
+extract_json() walks the response once, jumping between the characters that
+matter ({ } [ ] " and backslash), and tracks bracket nesting and string
+state, so braces inside strings ("Art. {5}") or in the prose around the JSON
+do not confuse it. Each outermost balanced span is handed to json.loads once,
+and the first one of the wanted type is returned. Those spans do not overlap,
+so the work stays linear in the response length whatever the model wrote.
+
+parse_verdict() checks a parsed answer against the verdict schema and keeps
+issue and suggestion within the lengths the prompts ask for.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ISSUE_MAX_CHARS = 120
+SUGGESTION_MAX_CHARS = 150
+
+TOKEN_RE = re.compile(r'[{}\[\]"\\]')
+CLOSERS = {"{": "}", "[": "]"}
+
+
+def iter_json_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """(start, end) of the outermost balanced {...} or [...] spans of text, in order.
+
+    Brackets that are never closed ("{{{ {...}") or closed by the wrong
+    bracket do not hide the balanced spans inside them.
+    """
+    open_brackets: List[Tuple[str, int]] = []  # (expected closer, start), innermost last
+    nested: List[Tuple[int, int]] = []  # balanced spans inside brackets still open
+    in_string = False
+    escaped_at = -1
+    for match in TOKEN_RE.finditer(text):
+        pos = match.start()
+        char = text[pos]
+        if in_string:
+            if pos == escaped_at:
+                continue
+            if char == "\\":
+                escaped_at = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char in CLOSERS:
+            open_brackets.append((CLOSERS[char], pos))
+        elif not open_brackets:
+            continue  # quotes and closers in the prose around the JSON
+        elif char == '"':
+            in_string = True
+        elif char == open_brackets[-1][0]:
+            start = open_brackets.pop()[1]
+            while nested and nested[-1][0] > start:
+                nested.pop()
+            if open_brackets:
+                nested.append((start, pos + 1))
+            else:
+                yield start, pos + 1
+        elif char != "\\":
+            # mismatched bracket: what is still open is not JSON, keep what closed inside it
+            yield from nested
+            nested.clear()
+            open_brackets.clear()
+    yield from nested
+
+
+def extract_json(text: Optional[str], kind: Optional[type] = None) -> Any:
+    """First JSON value (of type `kind` when given) found in text, or None."""
+    if not text:
+        return None
+    for start, end in iter_json_spans(text):
+        try:
+            value = json.loads(text[start:end])
+        except (ValueError, RecursionError):
+            continue
+        if kind is None or isinstance(value, kind):
+            return value
+    return None
+
+
+def clip(text: str, limit: int) -> str:
+    """text cut to at most `limit` characters, at a word boundary when one is close."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 1]
+    space = cut.rfind(" ")
+    if space >= limit * 2 // 3:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:.-") + "…"
+
+
+def parse_verdict(parsed: Any) -> Optional[Dict[str, Any]]:
+    """Normalize one parsed answer to {"compliant": True} or {"issue", "suggestion"}.
+
+    Anything else (wrong types, no issue on a non-compliant answer) is None.
+    """
+    if not isinstance(parsed, dict):
+        return None
+    if parsed.get("compliant") is True:
+        return {"compliant": True}
+    issue = parsed.get("issue")
+    if not isinstance(issue, str) or not issue.strip():
+        return None
+    suggestion = parsed.get("suggestion")
+    if not isinstance(suggestion, str):
+        suggestion = ""
+    return {"issue": clip(issue, ISSUE_MAX_CHARS), "suggestion": clip(suggestion, SUGGESTION_MAX_CHARS)}
@@ -0,0 +1,123 @@
+"""
+Result storage for reviewed contracts.
+
+- The result a backend reads stays plain JSON at the contract id, now with a
+  TTL (RESULT_TTL) instead of living forever.
+- A zlib-compressed copy is kept under a hash of the normalized contract text
+  (plus model and prompt version) for RESULT_DEDUP_TTL, so the same contract
+  uploaded again under a new id is answered without re-running the pipeline.
+- Storing and notifying the backend go out in one pipelined round trip.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv, find_dotenv
+
+from app.metrics import RESULT_BYTES_SAVED, RESULT_DEDUP_LOOKUPS
+from .Generation import MODEL_NAME, PROMPT_VERSION
+
+load_dotenv(find_dotenv())
+RESULT_TTL = int(os.getenv("RESULT_TTL", str(7 * 24 * 3600)))
+RESULT_DEDUP = os.getenv("RESULT_DEDUP", "1") == "1"
+RESULT_DEDUP_TTL = int(os.getenv("RESULT_DEDUP_TTL", str(30 * 24 * 3600)))
+RESULTS_CHANNEL = "contract_results"
+
+
+def normalize_contract_text(text: str) -> str:
+    """Contract text without the whitespace differences the splitter ignores anyway."""
+    lines = (re.sub(r"[^\S\n]+", " ", line).strip() for line in (text or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class ResultStore:
+    """Publishes results and answers repeated contracts from their content hash."""
+
+    def __init__(self, client: Any, ttl: int = RESULT_TTL, dedup: bool = RESULT_DEDUP,
+                 dedup_ttl: int = RESULT_DEDUP_TTL, version: str = f"{MODEL_NAME}:{PROMPT_VERSION}",
+                 prefix: str = "result:"):
+        self.client = client
+        self.ttl = ttl
+        self.dedup = dedup
+        self.dedup_ttl = dedup_ttl
+        self.version = version
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+        self._lock = threading.Lock()
+
+    def content_key(self, text: str) -> str:
+        raw = self.version + "\x1f" + normalize_contract_text(text)
+        return self.prefix + "content:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _pending_key(self, contract_id: str) -> str:
+        return self.prefix + "pending:" + contract_id
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """Result of an already reviewed contract with the same content, if any."""
+        if not self.dedup or not text:
+            return None
+        try:
+            payload = self.client.get(self.content_key(text))
+        except Exception as e:
+            print(f"Result dedup lookup failed: {e}")
+            payload = None
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        RESULT_DEDUP_LOOKUPS.labels("miss" if payload is None else "hit").inc()
+        return json.loads(zlib.decompress(payload)) if payload is not None else None
+
+    def expect(self, contract_id: str, text: str, ttl: int = 3600) -> None:
+        """Remember the content of a contract whose result is assembled later (fan-out)."""
+        if self.dedup and text:
+            self.client.set(self._pending_key(contract_id), self.content_key(text), ex=ttl)
+
+    def publish(self, contract_id: str, result: Dict[str, Any], text: Optional[str] = None,
+                cache: bool = True) -> None:
+        """Store the result at the contract id, keep a compressed copy for dedup, notify the backend.
+
+        The content comes from `text`, or from an earlier expect(); cache=False
+        skips the dedup copy (results served from it, partial results).
+        """
+        result_json = json.dumps(result)
+        content_key = None
+        if self.dedup and cache:
+            if text:
+                content_key = self.content_key(text)
+            else:
+                pending = self.client.get(self._pending_key(contract_id))
+                content_key = pending.decode("utf-8") if isinstance(pending, bytes) else pending
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(contract_id, result_json, ex=self.ttl or None)
+        if content_key:
+            raw = result_json.encode("utf-8")
+            payload = zlib.compress(raw, 6)
+            pipe.set(content_key, payload, ex=self.dedup_ttl or None)
+            pipe.delete(self._pending_key(contract_id))
+            with self._lock:
+                self.bytes_raw += len(raw)
+                self.bytes_stored += len(payload)
+            RESULT_BYTES_SAVED.inc(max(0, len(raw) - len(payload)))
+        pipe.publish(RESULTS_CHANNEL, json.dumps({"id": contract_id, "result": result_json}))
+        pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "bytes_raw": self.bytes_raw,
+            "bytes_stored": self.bytes_stored,
+            "bytes_saved": self.bytes_raw - self.bytes_stored,
+        }
@@ -1,36 +1,56 @@
-import os
 from typing import List, Dict, Any
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
+from fastapi import APIRouter, Query
+from pydantic import BaseModel
+from app.services.retrieval_engine import get_engine
 
-CHROMA_DIR = "legal-data/chroma_db"
 TOP_K = 1
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+router = APIRouter()
+
+def retrieve_sections_bulk(clauses: List[Dict[str, Any]], k: int = TOP_K) -> List[Dict[str, Any]]:
+    """Top-k legal sections for every non-empty clause.
+
+    All clause texts are encoded in one batch and scored in one index query.
+    Returns [{"index": clause index, "sections": [{"title", "text", "score"}, ...]}].
+    """
+    queries = []
+    for clause in clauses:
+        q_text = (clause.get("text") or "").strip()
+        if q_text:
+            queries.append((clause.get("index"), q_text))
+    if not queries:
+        return []
+
+    matches = get_engine().search_many([q_text for _, q_text in queries], k=k)
+    return [
+        {"index": clause_index, "sections": sections}
+        for (clause_index, _), sections in zip(queries, matches)
+    ]
 
 def retrieve_sections_memory(clauses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Retrieve matching legal sections for contract clauses. Returns list in memory."""
-    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
-    vectorstore = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
-    
+    """Retrieve matching legal sections for contract clauses. Returns list in memory.
+
+    Keeps the best section of each clause, without duplicates.
+    """
     matched_sections_set = set()
     matched_sections_list = []
-    
-    for clause in clauses:
-        q_text = clause.get("text", "").strip()
-        if not q_text:
-            continue
-        
-        docs = vectorstore.similarity_search(q_text, k=TOP_K)
-        if not docs:
+
+    for match in retrieve_sections_bulk(clauses, k=TOP_K):
+        if not match["sections"]:
             continue
-        
-        doc_text = docs[0].page_content if hasattr(docs[0], "page_content") else str(docs[0])
-        
-        if doc_text not in matched_sections_set:
-            matched_sections_set.add(doc_text)
-            matched_sections_list.append({
-                "title": docs[0].metadata.get("title", "") if hasattr(docs[0], "metadata") else "",
-                "text": doc_text
-            })
-    
-    return matched_sections_list
\ No newline at end of file
+        best = match["sections"][0]
+        if best["text"] not in matched_sections_set:
+            matched_sections_set.add(best["text"])
+            matched_sections_list.append({"title": best["title"], "text": best["text"]})
+
+    return matched_sections_list
+
+
+class ClauseInput(BaseModel):
+    index: int
+    text: str
+
+
+@router.post("/retrieve", summary="Top-k labor code sections for each clause")
+def retrieve_for_clauses(clauses: List[ClauseInput], k: int = Query(TOP_K, ge=1)):
+    return retrieve_sections_bulk([clause.model_dump() for clause in clauses], k=k)
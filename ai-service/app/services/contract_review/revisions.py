@@ -0,0 +1,105 @@
+"""
+Revision-aware re-review.
+
+For each document lineage (the same contract uploaded again after small edits)
+we keep the split sections and the verdict of every evaluated clause. A new
+revision is diffed against the stored one: clauses that are unchanged keep
+their verdict, remapped to their new clause index, and only inserted or
+modified clauses go to the LLM.
+
+A lineage is named by the uploader: the backend forwards the optional
+lineageId form field of POST /api/v1/contracts/review as the queue message's
+lineageId. File names are shared by unrelated contracts, so uploads without a
+lineageId are always reviewed in full. A revision judged by another model or prompt
+version is not reused. Each stored verdict is tagged with its source (see
+SOURCES), so triage trains on LLM verdicts only.
+"""
+
+import difflib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+from .Generation import MODEL_NAME, PROMPT_VERSION
+from .verdict_cache import normalize_clause_text
+
+load_dotenv(find_dotenv())
+REVISION_TRACKING = os.getenv("REVISION_TRACKING", "1") == "1"
+REVISION_TTL = int(os.getenv("REVISION_TTL", str(7 * 24 * 3600)))
+# Who gave a verdict: the LLM, the clause library, the triage model, or a
+# revision stored before sources were recorded
+SOURCES = ("llm", "library", "triage", "reused")
+
+
+def lineage_id(message: Dict[str, Any]) -> Optional[str]:
+    """Lineage of a queue message: the lineageId the backend got with the upload, if any."""
+    return message.get("lineageId") or None
+
+
+def match_sections(old_texts: List[str], new_texts: List[str]) -> Dict[int, int]:
+    """Map new section index -> old section index for sections left unchanged."""
+    old_keys = [normalize_clause_text(text) for text in old_texts]
+    new_keys = [normalize_clause_text(text) for text in new_texts]
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    mapping: Dict[int, int] = {}
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(new_end - new_start):
+                mapping[new_start + offset] = old_start + offset
+    return mapping
+
+
+def reuse_verdicts(previous: Optional[Dict[str, Any]], sections: List[Dict[str, Any]],
+                   selected: List[Tuple[int, str]]) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, str]]:
+    """Verdicts from the previous revision for the selected clauses that did not change,
+    and the source each of them was first given by."""
+    if not previous:
+        return {}, {}
+    mapping = match_sections(previous["sections"], [s.get("section_text") or "" for s in sections])
+    old_verdicts = previous.get("verdicts", {})
+    old_sources = previous.get("sources", {})
+    reused, sources = {}, {}
+    for clause_index, _ in selected:
+        old_index = mapping.get(clause_index)
+        verdict = old_verdicts.get(str(old_index)) if old_index is not None else None
+        if verdict is not None:
+            reused[clause_index] = verdict
+            sources[clause_index] = old_sources.get(str(old_index), "reused")
+    return reused, sources
+
+
+class RevisionStore:
+    """Last reviewed revision of each lineage, kept in Redis."""
+
+    def __init__(self, client: Any, ttl: int = REVISION_TTL, prefix: str = "revision:",
+                 model_name: str = MODEL_NAME, version: str = PROMPT_VERSION):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.model_name = model_name
+        self.version = version
+
+    def load(self, lineage: str) -> Optional[Dict[str, Any]]:
+        """Last revision of the lineage; None if absent or judged by another model/prompt."""
+        raw = self.client.get(self.prefix + lineage)
+        if not raw:
+            return None
+        record = json.loads(raw)
+        if record.get("model") != self.model_name or record.get("prompt_version") != self.version:
+            return None
+        return record
+
+    def save(self, lineage: str, sections: List[Dict[str, Any]],
+             verdicts: Dict[int, Optional[Dict[str, Any]]], sources: Optional[Dict[int, str]] = None) -> None:
+        """Store a revision; `sources` tags verdicts not given by the LLM (see SOURCES)."""
+        sources = sources or {}
+        kept = {idx: verdict for idx, verdict in verdicts.items() if verdict is not None}
+        record = {
+            "model": self.model_name,
+            "prompt_version": self.version,
+            "sections": [s.get("section_text") or "" for s in sections],
+            "verdicts": {str(idx): verdict for idx, verdict in kept.items()},
+            "sources": {str(idx): sources.get(idx, "llm") for idx in kept},
+        }
+        self.client.set(self.prefix + lineage, json.dumps(record, ensure_ascii=False), ex=self.ttl)
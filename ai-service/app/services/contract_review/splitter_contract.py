@@ -1,24 +1,42 @@
-from typing import List, Dict, Any
+import json
+import os
+from typing import Iterable, List, Dict, Any
+
+from app.services.segmenter import INTRODUCTION, OWN_LINE, TITLES, header_kind, segment_contract
+
+CONTRACT_CHUNKS_PATH = "legal-data/contract_chunks/"
 
 def split_contract_memory(txt: str) -> List[Dict[str, Any]]:
     """Split contract text into chunks based on paragraphs. Returns list in memory."""
-    lines = [line.strip() for line in txt.splitlines() if line.strip()]
-    sections = []
-    
+    return segment_contract(txt).to_list()
+
+def split_contract_lines(raw_lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """split_contract_memory over lines as they arrive, e.g. from pdf_extraction.iter_pages.
+
+    Sections start on the lines segmenter.header_kind accepts, as in segment_contract.
+    """
+    lines = (line.strip() for line in raw_lines if line.strip())
+    titles: List[str] = []
+    parts: List[List[str]] = []
+
     for line in lines:
-        if ":" in line or line.isupper():
-            title = line if len(line.split()) <= 10 else "Clause"
-            sections.append({
-                "section_title": title,
-                "section_text": line
-            })
+        kind = header_kind(line)
+        if kind is not None:
+            titles.append(line if kind == OWN_LINE else TITLES[kind])
+            parts.append([line])
+        elif parts:
+            parts[-1].append(line)
         else:
-            if sections:
-                sections[-1]["section_text"] += " " + line
-            else:
-                sections.append({
-                    "section_title": "Introduction",
-                    "section_text": line
-                })
-    
-    return sections
\ No newline at end of file
+            titles.append(TITLES[INTRODUCTION])
+            parts.append([line])
+
+    return [{"section_title": title, "section_text": " ".join(text)} for title, text in zip(titles, parts)]
+
+
+def split_contract_local(txt: str, json_path: str) -> List[Dict[str, Any]]:
+    """Split contract text and save the sections as JSON at json_path."""
+    sections = split_contract_memory(txt)
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(sections, f, ensure_ascii=False, indent=2)
+    return sections
@@ -0,0 +1,247 @@
+"""
+Local triage of clauses before the LLM.
+
+A logistic regression over the all-MiniLM-L6-v2 clause embeddings (the ones
+retrieval already computes) estimates the probability that a clause is
+problematic, trained offline from stored verdicts. Clauses scored below
+TRIAGE_COMPLIANT_BELOW are taken as compliant without an LLM call; the rest
+(uncertain, or likely problematic and in need of an issue and a suggestion)
+still go to Gemini.
+
+    python -m app.services.contract_review.triage train --data verdicts.jsonl --output legal-data/triage_model.npz
+    python -m app.services.contract_review.triage train --redis --output legal-data/triage_model.npz
+    python -m app.services.contract_review.triage evaluate --data verdicts.jsonl --model legal-data/triage_model.npz
+
+Training data are {"text", "compliant": true} / {"text", "issue", "suggestion"}
+records (JSON list or JSON lines, the clause library seed format) or the
+revisions stored in Redis. Both commands print, for a range of thresholds,
+the share of LLM calls avoided against the agreement with the LLM verdicts.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+import numpy as np
+
+from app.metrics import TRIAGE_ROUTES
+from app.services.retrieval_engine import EMBEDDING_MODEL, get_engine
+from .Generation import parse_verdict
+
+load_dotenv(find_dotenv())
+TRIAGE = os.getenv("TRIAGE", "0") == "1"
+TRIAGE_MODEL_PATH = os.getenv("TRIAGE_MODEL_PATH", "legal-data/triage_model.npz")
+TRIAGE_COMPLIANT_BELOW = float(os.getenv("TRIAGE_COMPLIANT_BELOW", "0.05"))
+TRIAGE_PROBLEMATIC_ABOVE = float(os.getenv("TRIAGE_PROBLEMATIC_ABOVE", "0.8"))
+
+COMPLIANT = "compliant"
+UNCERTAIN = "uncertain"
+PROBLEMATIC = "problematic"
+SWEEP_THRESHOLDS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3)
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1e-2, iterations: int = 25) -> Tuple[np.ndarray, float]:
+    """L2-regularized logistic regression fitted by Newton's method. Returns (weights, bias)."""
+    n, dim = X.shape
+    Xb = np.hstack([X, np.ones((n, 1))])
+    w = np.zeros(dim + 1)
+    penalty = np.full(dim + 1, l2 * n)
+    penalty[-1] = 0.0  # no penalty on the bias
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(Xb @ w)))
+        gradient = Xb.T @ (p - y) + penalty * w
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + np.diag(penalty)
+        step = np.linalg.solve(hessian + 1e-9 * np.eye(dim + 1), gradient)
+        w -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return w[:-1], float(w[-1])
+
+
+class TriageModel:
+    """P(problematic) for clause embeddings, with the routing thresholds."""
+
+    def __init__(self, weights: np.ndarray, bias: float, embedding_model: str = EMBEDDING_MODEL,
+                 compliant_below: float = TRIAGE_COMPLIANT_BELOW,
+                 problematic_above: float = TRIAGE_PROBLEMATIC_ABOVE):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.embedding_model = embedding_model
+        self.compliant_below = compliant_below
+        self.problematic_above = problematic_above
+
+    @classmethod
+    def train(cls, vectors: Any, labels: Any, l2: float = 1e-2, **thresholds: float) -> "TriageModel":
+        weights, bias = fit_logistic(np.asarray(vectors, dtype=np.float64), np.asarray(labels, dtype=np.float64), l2)
+        return cls(weights, bias, **thresholds)
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights, bias=self.bias, embedding_model=self.embedding_model)
+
+    @classmethod
+    def load(cls, path: str, **thresholds: float) -> "TriageModel":
+        data = np.load(path)
+        return cls(data["weights"], float(data["bias"]), str(data["embedding_model"]), **thresholds)
+
+    def predict_proba(self, vectors: Any) -> np.ndarray:
+        X = np.asarray(vectors, dtype=np.float64).reshape(-1, self.weights.shape[0])
+        return 1.0 / (1.0 + np.exp(-(X @ self.weights + self.bias)))
+
+    def classify(self, probability: float) -> str:
+        if probability < self.compliant_below:
+            return COMPLIANT
+        if probability >= self.problematic_above:
+            return PROBLEMATIC
+        return UNCERTAIN
+
+    def route(self, selected: List[Tuple[int, str]],
+              embed: Optional[Callable[[List[str]], List[List[float]]]] = None) -> Dict[int, Dict[str, Any]]:
+        """{"compliant": True} for the (clause_index, clause_text) pairs confidently compliant."""
+        if not selected:
+            return {}
+        embed = embed or get_engine().embed_texts
+        probabilities = self.predict_proba(embed([text for _, text in selected]))
+        compliant = {}
+        for (clause_index, _), probability in zip(selected, probabilities):
+            route = self.classify(float(probability))
+            TRIAGE_ROUTES.labels(route).inc()
+            if route == COMPLIANT:
+                compliant[clause_index] = {"compliant": True}
+        return compliant
+
+
+def load_triage(enabled: bool = TRIAGE, path: str = TRIAGE_MODEL_PATH) -> Optional[TriageModel]:
+    """The model configured by TRIAGE / TRIAGE_MODEL_PATH, or None."""
+    if not enabled:
+        return None
+    if not os.path.exists(path):
+        print(f"Triage enabled but no model at {path}; every clause goes to the LLM")
+        return None
+    model = TriageModel.load(path)
+    if model.embedding_model != EMBEDDING_MODEL:
+        print(f"Triage model was trained on {model.embedding_model}, not {EMBEDDING_MODEL}; ignoring it")
+        return None
+    return model
+
+
+triage_model = load_triage()
+
+
+def evaluate(probabilities: Iterable[float], labels: Iterable[int],
+             thresholds: Iterable[float] = SWEEP_THRESHOLDS) -> List[Dict[str, Any]]:
+    """LLM calls avoided against agreement with the LLM verdicts, per compliant threshold.
+
+    agreement: share of the clauses taken as compliant that the LLM also found compliant.
+    missed_issues: problematic clauses (per the LLM) that would skip it.
+    """
+    probabilities = np.asarray(list(probabilities), dtype=np.float64)
+    labels = np.asarray(list(labels), dtype=np.int64)
+    total = len(labels)
+    rows = []
+    for threshold in thresholds:
+        skipped = probabilities < threshold
+        avoided = int(skipped.sum())
+        rows.append({
+            "threshold": threshold,
+            "avoided": avoided,
+            "avoided_rate": avoided / total if total else 0.0,
+            "agreement": float((labels[skipped] == 0).mean()) if avoided else 1.0,
+            "missed_issues": int(labels[skipped].sum()),
+        })
+    return rows
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Labelled clauses from a JSON list or a JSON-lines file."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def records_from_revisions(client: Any, prefix: str = "revision:") -> List[Dict[str, Any]]:
+    """Labelled clauses from the revisions stored by RevisionStore, LLM verdicts only.
+
+    Verdicts given by the triage model or the clause library would train the
+    model on its own guesses; revisions saved without sources are skipped.
+    """
+    records = []
+    for key in client.scan_iter(match=prefix + "*"):
+        raw = client.get(key)
+        if not raw:
+            continue
+        revision = json.loads(raw)
+        sources = revision.get("sources", {})
+        for index, verdict in revision.get("verdicts", {}).items():
+            if sources.get(index) == "llm":
+                records.append({"text": revision["sections"][int(index)], **verdict})
+    return records
+
+
+def labelled(records: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+    """Unique clause texts with label 1 for problematic, 0 for compliant."""
+    texts: Dict[str, int] = {}
+    for record in records:
+        verdict = parse_verdict(record)
+        if verdict is not None and record.get("text"):
+            texts[record["text"]] = 0 if verdict.get("compliant") is True else 1
+    return list(texts), np.array(list(texts.values()), dtype=np.int64)
+
+
+def print_report(rows: List[Dict[str, Any]], total: int, problematic: int) -> None:
+    print(f"{total} clauses, {problematic} problematic per the LLM")
+    print(f"{'threshold':>10}{'avoided':>10}{'avoided %':>11}{'agreement':>11}{'missed':>8}")
+    for row in rows:
+        print(f"{row['threshold']:>10.2f}{row['avoided']:>10}{row['avoided_rate'] * 100:>10.1f}%"
+              f"{row['agreement'] * 100:>10.1f}%{row['missed_issues']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--data", action="append", default=[], help="labelled clauses (JSON or JSON lines)")
+    parser.add_argument("--redis", action="store_true", help="also read the revisions stored in Redis")
+    parser.add_argument("--model", default=TRIAGE_MODEL_PATH, help="model to evaluate")
+    parser.add_argument("--output", default=TRIAGE_MODEL_PATH, help="where train saves the model")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of the data train keeps for evaluation")
+    parser.add_argument("--l2", type=float, default=1e-2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    records = [record for path in args.data for record in load_records(path)]
+    if args.redis:
+        import redis
+        from .verdict_cache import REDIS_HOST, REDIS_PORT
+        records += records_from_revisions(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0))
+    texts, labels = labelled(records)
+    if not texts:
+        print("No labelled clauses found")
+        return 1
+    vectors = np.asarray(get_engine().embed_texts(texts), dtype=np.float64)
+
+    if args.command == "train":
+        order = np.random.RandomState(args.seed).permutation(len(texts))
+        cut = int(len(texts) * (1 - args.holdout)) if len(texts) > 1 else len(texts)
+        train_rows, test_rows = order[:cut], order[cut:]
+        model = TriageModel.train(vectors[train_rows], labels[train_rows], l2=args.l2)
+        model.save(args.output)
+        print(f"Saved {args.output} (trained on {len(train_rows)} clauses)")
+        if not len(test_rows):
+            return 0
+        vectors, labels = vectors[test_rows], labels[test_rows]
+    else:
+        model = TriageModel.load(args.model)
+
+    print_report(evaluate(model.predict_proba(vectors), labels), len(labels), int(labels.sum()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
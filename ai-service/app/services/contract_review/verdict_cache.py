@@ -0,0 +1,217 @@
+"""
+Verdict cache for contract clauses.
+
+Most contracts come from a handful of HR templates, so the same clause text is
+judged over and over. Verdicts are cached under a hash of the normalized clause
+text, the model name and the prompt version, so switching model or editing the
+prompt template never serves stale answers.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+VERDICT_CACHE_BACKEND = os.getenv("VERDICT_CACHE_BACKEND", "none")
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", str(30 * 24 * 3600)))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "50000"))
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "legal-data/verdict_cache.sqlite3")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+
+def normalize_clause_text(text: str) -> str:
+    """Lowercase and collapse whitespace so cosmetic differences share a key."""
+    return re.sub(r"\s+", " ", (text or "").strip()).lower()
+
+
+def prompt_version(builder: Callable[[str, int], str]) -> str:
+    """Fingerprint of a prompt template, taken from the text it renders."""
+    rendered = builder("{clause_text}", 0)
+    return hashlib.sha256(rendered.encode("utf-8")).hexdigest()[:12]
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = VERDICT_CACHE_MAX_ENTRIES, ttl: float = VERDICT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every process on the host."""
+
+    def __init__(self, path: str = VERDICT_CACHE_PATH, max_entries: int = VERDICT_CACHE_MAX_ENTRIES,
+                 ttl: float = VERDICT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # the table may run past max_entries by up to 1% between eviction passes
+        self.evict_every = max(1, max_entries // 100)
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_expires_at ON verdicts (expires_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_accessed_at ON verdicts (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE verdicts SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every:
+                return
+            count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if count <= self.max_entries:
+                return
+            count -= self._conn.execute("DELETE FROM verdicts WHERE expires_at < ?", (now,)).rowcount
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN ("
+                    "SELECT key FROM verdicts ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+
+class RedisBackend:
+    """Cache in the Redis instance the worker already talks to; Redis handles expiry.
+
+    Entries are not counted against VERDICT_CACHE_MAX_ENTRIES: bound their memory
+    with Redis' maxmemory and a volatile-lru (or allkeys-lru) eviction policy.
+    """
+
+    def __init__(self, client: Any = None, ttl: float = VERDICT_CACHE_TTL, prefix: str = "verdict:"):
+        if client is None:
+            import redis
+            client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str) -> None:
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+
+class VerdictCache:
+    """Maps clause text to a parsed LLM verdict, with hit/miss counters."""
+
+    def __init__(self, backend: Any, model_name: str, version: str):
+        self.backend = backend
+        self.model_name = model_name
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, clause_text: str, variant: str = "") -> str:
+        """Cache key; `variant` keeps verdicts given under different prompt inputs apart."""
+        raw = "\x1f".join([self.model_name, self.version, variant, normalize_clause_text(clause_text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, clause_text: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(self.key(clause_text, variant))
+        except Exception as e:
+            print(f"Verdict cache read failed: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, clause_text: str, verdict: Dict[str, Any], variant: str = "") -> None:
+        try:
+            self.backend.set(self.key(clause_text, variant), json.dumps(verdict, ensure_ascii=False))
+        except Exception as e:
+            print(f"Verdict cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def create_backend(name: str = VERDICT_CACHE_BACKEND) -> Optional[Any]:
+    """Build the backend named by VERDICT_CACHE_BACKEND (none|memory|sqlite|redis)."""
+    name = (name or "none").lower()
+    if name == "none":
+        return None
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown verdict cache backend: {name}")
@@ -0,0 +1,309 @@
+"""
+Shared local embedding server with dynamic micro-batching.
+
+Every API and worker process otherwise loads its own all-MiniLM-L6-v2 and
+encodes its own small requests one at a time. One server process holds the
+model, and encode requests from all clients are merged into micro-batches
+of up to EMBED_SERVER_MAX_BATCH texts, waiting at most
+EMBED_SERVER_MAX_WAIT_MS for the batch to fill:
+
+    python -m app.services.embedding_server --socket /tmp/cdi-embeddings.sock
+    python -m app.services.embedding_server --port 8765
+
+Clients set EMBEDDING_SERVER=unix:///tmp/cdi-embeddings.sock (or
+http://127.0.0.1:8765) and the retrieval engine uses EmbeddingClient in place
+of SentenceTransformerEmbeddings; the model is then never loaded in them.
+
+Requests are JSON {"texts": [...]}; vectors come back as raw float32 rows
+(X-Embedding-Shape: rows,dim), which is far smaller and faster to decode than
+JSON floats.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from dotenv import load_dotenv, find_dotenv
+
+import numpy as np
+
+load_dotenv(find_dotenv())
+EMBED_SERVER_MAX_BATCH = int(os.getenv("EMBED_SERVER_MAX_BATCH", "64"))
+EMBED_SERVER_MAX_WAIT_MS = float(os.getenv("EMBED_SERVER_MAX_WAIT_MS", "5"))
+EMBED_SERVER_TIMEOUT = float(os.getenv("EMBED_SERVER_TIMEOUT", "60"))
+
+Encoder = Callable[[List[str]], List[List[float]]]
+
+
+class MicroBatcher:
+    """Merges concurrent encode requests into batches run by one thread."""
+
+    def __init__(self, encode: Encoder, max_batch: int = EMBED_SERVER_MAX_BATCH,
+                 max_wait: float = EMBED_SERVER_MAX_WAIT_MS / 1000):
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+
+    def start(self) -> "MicroBatcher":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self.start()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = [first], len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[Tuple[List[str], Future]]) -> None:
+        unique = list(dict.fromkeys(text for texts, _ in batch for text in texts))
+        try:
+            rows: List[List[float]] = []
+            for start in range(0, len(unique), self.max_batch):
+                rows.extend(self._encode(unique[start:start + self.max_batch]))
+            vectors = np.asarray(rows, dtype=np.float32).reshape(len(unique), -1) if unique \
+                else np.zeros((0, 0), dtype=np.float32)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        position = {text: i for i, text in enumerate(unique)}
+        with self._lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += len(unique)
+        for texts, future in batch:
+            future.set_result(vectors[[position[text] for text in texts]] if texts
+                              else np.zeros((0, vectors.shape[1]), dtype=np.float32))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "texts_per_batch": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # one line per encode request would drown the worker logs
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            return self._send_json(404, {"error": "not found"})
+        self._send_json(200, {"status": "ok", "model": self.server.model_name, **self.server.batcher.stats()})
+
+    def do_POST(self) -> None:
+        if self.path != "/embed":
+            return self._send_json(404, {"error": "not found"})
+        try:
+            texts = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("texts must be a list of strings")
+        except (KeyError, ValueError) as e:
+            return self._send_json(400, {"error": str(e)})
+        try:
+            vectors = self.server.batcher.encode(texts)
+        except Exception as e:
+            print(f"Embedding failed: {e!r}")
+            return self._send_json(500, {"error": repr(e)})
+        self._send(200, np.ascontiguousarray(vectors, dtype="<f4").tobytes(), "application/octet-stream", {
+            "X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1]}",
+            "X-Embedding-Model": self.server.model_name,
+        })
+
+
+class _EmbeddingServerMixin:
+    daemon_threads = True
+    batcher: MicroBatcher
+    model_name: str
+
+
+class EmbeddingHTTPServer(_EmbeddingServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class EmbeddingUnixServer(_EmbeddingServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+def create_server(batcher: MicroBatcher, model_name: str, socket_path: Optional[str] = None,
+                  host: str = "127.0.0.1", port: int = 0) -> socketserver.BaseServer:
+    """A server answering /embed from `batcher`, on a Unix socket when socket_path is given."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server: socketserver.BaseServer = EmbeddingUnixServer(socket_path, EmbeddingHandler)
+    else:
+        server = EmbeddingHTTPServer((host, port), EmbeddingHandler)
+    server.batcher = batcher.start()
+    server.model_name = model_name
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class EmbeddingClient:
+    """embed_documents/embed_query served by the embedding server (SentenceTransformerEmbeddings stand-in)."""
+
+    def __init__(self, url: str, model_name: Optional[str] = None,
+                 timeout: float = EMBED_SERVER_TIMEOUT):
+        self.url = url
+        self.model_name = model_name
+        self.timeout = timeout
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            self._connect = lambda: _UnixHTTPConnection(parsed.path, timeout)
+        elif parsed.scheme == "http":
+            self._connect = lambda: http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+        else:
+            raise ValueError(f"EMBEDDING_SERVER must be unix:///path or http://host:port, not {url!r}")
+        self._local = threading.local()
+
+    def _request(self, body: bytes) -> http.client.HTTPResponse:
+        # keep-alive connection per thread; one reconnect when the server closed it.
+        # Timeouts are not retried: the server may still be encoding the first request.
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = self._connect()
+            try:
+                connection.request("POST", "/embed", body, {"Content-Type": "application/json"})
+                return connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self._local.connection = None
+                raise
+        raise AssertionError("unreachable")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self._request(json.dumps({"texts": list(texts)}).encode("utf-8"))
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"Embedding server answered {response.status}: {payload[:200]!r}")
+        served_by = response.getheader("X-Embedding-Model")
+        if self.model_name and served_by != self.model_name:
+            raise RuntimeError(f"Embedding server runs {served_by}, expected {self.model_name}")
+        rows, dim = (int(n) for n in response.getheader("X-Embedding-Shape").split(","))
+        return np.frombuffer(payload, dtype="<f4").reshape(rows, dim)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0].tolist()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", help="Unix socket path (default: HTTP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=EMBED_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBED_SERVER_MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    from app.services.retrieval_engine import EMBEDDING_MODEL
+
+    model = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    batcher = MicroBatcher(model.embed_documents, args.max_batch, args.max_wait_ms / 1000)
+    server = create_server(batcher, EMBEDDING_MODEL, args.socket, args.host, args.port)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f" [*] Embedding server ({EMBEDDING_MODEL}) on {where}, batches of {args.max_batch} "
+          f"within {args.max_wait_ms} ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
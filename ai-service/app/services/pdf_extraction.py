@@ -0,0 +1,91 @@
+"""
+PDF text extraction shared by the labor code parser and contract upload.
+
+Pages are read with PyMuPDF (a C library, tens of times faster than
+pdfplumber) and any page PyMuPDF fails on is retried with pdfplumber. Large
+documents are cut into page ranges extracted on a process pool
+(PDF_WORKERS), and iter_pages() yields page texts in order as soon as they
+are ready, so callers can start splitting before the whole file is read.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+BACKENDS = ("pymupdf", "pdfplumber")
+
+
+def page_count(path: str) -> int:
+    try:
+        import fitz
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception as e:
+        print(f"PyMuPDF could not open {path}, counting pages with pdfplumber: {e!r}")
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+
+
+def _pdfplumber_pages(path: str, start: int, stop: int) -> List[str]:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, min(stop, len(pdf.pages)))]
+
+
+def extract_page_range(path: str, start: int, stop: int, backend: str = PDF_BACKEND) -> List[str]:
+    """Raw text of pages [start, stop). With PyMuPDF, failing pages fall back to pdfplumber."""
+    if backend == "pdfplumber":
+        return _pdfplumber_pages(path, start, stop)
+    if backend != "pymupdf":
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    import fitz
+    texts: List[str] = []
+    with fitz.open(path) as doc:
+        for i in range(start, min(stop, doc.page_count)):
+            try:
+                texts.append(doc[i].get_text("text"))
+            except Exception as e:
+                print(f"PyMuPDF failed on page {i + 1} of {path}, using pdfplumber: {e!r}")
+                texts.extend(_pdfplumber_pages(path, i, i + 1))
+    return texts
+
+
+def _extract_task(task: Tuple[str, int, int, str]) -> List[str]:
+    return extract_page_range(*task)
+
+
+def iter_pages(path: str, backend: Optional[str] = None, workers: Optional[int] = None,
+               pages_per_task: Optional[int] = None,
+               clean: Optional[Callable[[str], str]] = None) -> Iterator[str]:
+    """Yield the text of every page, in order, passed through `clean` when given.
+
+    With workers > 1 (default: PDF_WORKERS) page ranges of pages_per_task
+    (default: PDF_PAGES_PER_TASK) are extracted on a process pool.
+    """
+    backend = backend or PDF_BACKEND
+    workers = workers if workers is not None else PDF_WORKERS
+    size = max(1, pages_per_task or PDF_PAGES_PER_TASK)
+    total = page_count(path)
+    tasks = [(path, start, start + size, backend) for start in range(0, total, size)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        for chunk in map(_extract_task, tasks):
+            for text in chunk:
+                yield clean(text) if clean else text
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        for chunk in pool.map(_extract_task, tasks):
+            for text in chunk:
+                yield clean(text) if clean else text
+
+
+def extract_text(path: str, backend: Optional[str] = None, workers: Optional[int] = None,
+                 clean: Optional[Callable[[str], str]] = None) -> str:
+    """Whole-document text, pages joined by newlines."""
+    return "\n".join(iter_pages(path, backend=backend, workers=workers, clean=clean))
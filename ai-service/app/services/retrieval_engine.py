@@ -0,0 +1,251 @@
+"""
+Process-wide retrieval engine over the labor code index.
+
+The embedding model takes seconds to load, so it is built once per process on
+first use (or by calling warm_up() at startup) and shared by app/retriever.py
+and the contract review pipeline. With EMBEDDING_SERVER set, processes use the
+shared embedding server instead and never load the model themselves.
+
+Two index backends are available (RETRIEVAL_BACKEND):
+- "chroma": the persisted Chroma store built by /create-chroma
+- "numpy": normalized section vectors in a .npy file, memory-mapped and scored
+  with a single matrix product. The labor code has a few hundred sections, so
+  this is faster than Chroma and needs no database. A manifest records the
+  sections.json digest and model it was built from; a stale index is rebuilt.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from langchain_community.vectorstores import Chroma
+
+load_dotenv(find_dotenv())
+CHROMA_DIR = "legal-data/chroma_db"
+SECTIONS_PATH = "legal-data/articles_cleaned/sections.json"
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", "legal-data/numpy_index")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# unix:///path or http://host:port of a shared embedding server (app/services/embedding_server.py)
+EMBEDDING_SERVER = os.getenv("EMBEDDING_SERVER", "")
+# Recently embedded clause texts kept in memory, so later stages (triage) reuse retrieval's vectors
+EMBED_MEMO_SIZE = int(os.getenv("EMBED_MEMO_SIZE", "2048"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyIndex:
+    """Brute-force cosine index: one row of normalized float32 per section."""
+
+    def __init__(self, vectors: np.ndarray, sections: List[Dict[str, Any]]):
+        self.vectors = vectors
+        self.sections = sections
+
+    @classmethod
+    def build(cls, sections: List[Dict[str, Any]], embeddings: Any,
+              batch_size: int = EMBED_BATCH_SIZE) -> "NumpyIndex":
+        texts = [section["text"] for section in sections]
+        rows: List[List[float]] = []
+        for start in range(0, len(texts), batch_size):
+            rows.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+        vectors = _normalize(np.asarray(rows, dtype=np.float32).reshape(len(texts), -1))
+        return cls(vectors, [{"title": s.get("title", ""), "text": s["text"]} for s in sections])
+
+    def save(self, index_dir: str, manifest: Optional[Dict[str, str]] = None) -> None:
+        """Write the index; files are replaced atomically, so mapped readers keep the old ones."""
+        os.makedirs(index_dir, exist_ok=True)
+        vectors_path = os.path.join(index_dir, "vectors.npy")
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, self.vectors)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        for name, value in (("sections.json", self.sections), ("manifest.json", manifest or {})):
+            path = os.path.join(index_dir, name)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, index_dir: str, mmap: bool = True) -> "NumpyIndex":
+        vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r" if mmap else None)
+        with open(os.path.join(index_dir, "sections.json"), "r", encoding="utf-8") as f:
+            sections = json.load(f)
+        return cls(vectors, sections)
+
+    def search(self, query_vectors: Any, k: int) -> List[List[Dict[str, Any]]]:
+        """Top-k sections for every query row, best first; no sections for k <= 0."""
+        if len(self.sections) == 0 or k <= 0:
+            return [[] for _ in range(len(query_vectors))]
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        scores = queries @ self.vectors.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                {**self.sections[i], "score": float(scores[row, i])} for i in ordered
+            ])
+        return results
+
+
+class RetrievalEngine:
+    """Lazily loads the embedding model and the section index, thread-safely."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, chroma_dir: str = CHROMA_DIR,
+                 backend: str = RETRIEVAL_BACKEND, numpy_index_dir: str = NUMPY_INDEX_DIR,
+                 sections_path: str = SECTIONS_PATH, embedding_server: str = EMBEDDING_SERVER):
+        self.model_name = model_name
+        self.embedding_server = embedding_server
+        self.chroma_dir = chroma_dir
+        self.backend = backend
+        self.numpy_index_dir = numpy_index_dir
+        self.sections_path = sections_path
+        self._embeddings: Optional[Any] = None
+        self._vectorstore: Optional[Any] = None
+        self._numpy_index: Optional[NumpyIndex] = None
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Any:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._load_embeddings()
+        return self._embeddings
+
+    def _load_embeddings(self) -> Any:
+        if self.embedding_server:
+            from app.services.embedding_server import EmbeddingClient
+            return EmbeddingClient(self.embedding_server, model_name=self.model_name)
+        return SentenceTransformerEmbeddings(model_name=self.model_name)
+
+    @property
+    def vectorstore(self) -> Any:
+        if self._vectorstore is None:
+            embeddings = self.embeddings
+            with self._lock:
+                if self._vectorstore is None:
+                    self._vectorstore = Chroma(persist_directory=self.chroma_dir, embedding_function=embeddings)
+        return self._vectorstore
+
+    def numpy_manifest(self) -> Dict[str, str]:
+        """What a NumPy index built now would come from: the sections.json digest and the model."""
+        with open(self.sections_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        return {"sections_sha256": digest, "model": self.model_name}
+
+    def _saved_manifest(self) -> Optional[Dict[str, str]]:
+        path = os.path.join(self.numpy_index_dir, "manifest.json")
+        if not os.path.exists(os.path.join(self.numpy_index_dir, "vectors.npy")) or not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def numpy_index(self) -> NumpyIndex:
+        """Memory-mapped index; (re)built from sections.json and saved when missing or stale."""
+        if self._numpy_index is None:
+            embeddings = self.embeddings
+            with self._lock:
+                if self._numpy_index is None:
+                    manifest = self.numpy_manifest()
+                    if self._saved_manifest() != manifest:
+                        with open(self.sections_path, "r", encoding="utf-8") as f:
+                            index = NumpyIndex.build(json.load(f), embeddings)
+                        index.save(self.numpy_index_dir, manifest)
+                    self._numpy_index = NumpyIndex.load(self.numpy_index_dir)
+        return self._numpy_index
+
+    def invalidate_index(self) -> None:
+        """Drop the loaded NumPy index; the next search checks it against sections.json again."""
+        with self._lock:
+            self._numpy_index = None
+
+    @property
+    def ready(self) -> bool:
+        if self._embeddings is None:
+            return False
+        if self.backend == "numpy":
+            return self._numpy_index is not None
+        return self._vectorstore is not None
+
+    def warm_up(self) -> None:
+        """Load the model and open the index now rather than on the first request."""
+        if self.backend == "numpy":
+            self.numpy_index
+        else:
+            self.vectorstore
+
+    def similarity_search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k sections for one query, from the RETRIEVAL_BACKEND index."""
+        return self.search_many([query], k=k)[0]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings of texts in one batched encode; recently embedded texts come from memory."""
+        with self._memo_lock:
+            found = {text: self._memo[text] for text in texts if text in self._memo}
+            for text in found:
+                self._memo.move_to_end(text)
+        missing = list(dict.fromkeys(text for text in texts if text not in found))
+        if missing:
+            vectors = self.embeddings.embed_documents(missing)
+            found.update(zip(missing, vectors))
+            with self._memo_lock:
+                for text, vector in zip(missing, vectors):
+                    self._memo[text] = vector
+                while len(self._memo) > EMBED_MEMO_SIZE:
+                    self._memo.popitem(last=False)
+        return [found[text] for text in texts]
+
+    def search_many(self, texts: List[str], k: int = 1) -> List[List[Dict[str, Any]]]:
+        """Top-k sections for each text, with one batched encode (and one index query with numpy)."""
+        if not texts:
+            return []
+        if k <= 0:
+            return [[] for _ in texts]
+        vectors = self.embed_texts(texts)
+        if self.backend == "numpy":
+            return self.numpy_index.search(vectors, k)
+
+        results = []
+        for vector in vectors:
+            # Chroma scores are distances: lower is closer
+            found = self.vectorstore.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+            results.append([
+                {"title": doc.metadata.get("title", ""), "text": doc.page_content, "score": -float(distance)}
+                for doc, distance in found
+            ])
+        return results
+
+
+_engine: Optional[RetrievalEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RetrievalEngine:
+    """The shared engine for this process."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RetrievalEngine()
+    return _engine
+
+
+def warm_up() -> RetrievalEngine:
+    engine = get_engine()
+    engine.warm_up()
+    return engine
@@ -0,0 +1,191 @@
+"""
+Offset-based segmentation of contracts and of the labor code.
+
+One pass over the lines of a contract, or over the numbered section titles
+of the labor code, records sections as start/end offsets into the original
+string (in arrays for contracts), and their text is only built when it is
+read. The dicts returned by split_contract_memory and split_by_sections are
+the same as before; long sections no longer cost a copy per appended line.
+"""
+
+import re
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional
+
+TITLE_WORDS = 10
+
+# section_title: the header line itself, "Clause" for a long header, "Introduction" for leading text
+OWN_LINE, CLAUSE, INTRODUCTION = 0, 1, 2
+TITLES = {CLAUSE: "Clause", INTRODUCTION: "Introduction"}
+
+SECTION_RE = re.compile(r"(?m)^(\d+\.\s+[A-ZÉÈÀÙÂÊÎÔÛÄËÏÖÜÇ'\- ]+)")
+# the former app.splitter.clean_body in one substitution: any run of symbols and whitespace becomes one space
+CLEAN_RE = re.compile(r"[^\w.,;:!?()\-']+")
+
+
+def header_kind(line: str) -> Optional[int]:
+    """OWN_LINE or CLAUSE if the stripped line starts a contract section, None if it continues one."""
+    if ":" in line or line.isupper():
+        return OWN_LINE if len(line.split()) <= TITLE_WORDS else CLAUSE
+    return None
+
+
+class ContractSection(Mapping):
+    """One contract section, read as {"section_title", "section_text"} without copying until asked."""
+
+    __slots__ = ("_segments", "_index")
+    KEYS = ("section_title", "section_text")
+
+    def __init__(self, segments: "ContractSegments", index: int):
+        self._segments = segments
+        self._index = index
+
+    @property
+    def start(self) -> int:
+        return self._segments.line_starts[self._segments.first_lines[self._index]]
+
+    @property
+    def end(self) -> int:
+        return self._segments.line_ends[self._segments.first_lines[self._index + 1] - 1]
+
+    @property
+    def title(self) -> str:
+        return self._segments.title(self._index)
+
+    @property
+    def text(self) -> str:
+        return self._segments.text(self._index)
+
+    def __getitem__(self, key: str) -> str:
+        if key == "section_title":
+            return self.title
+        if key == "section_text":
+            return self.text
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f"ContractSection({self._index}, start={self.start}, end={self.end})"
+
+
+class ContractSegments(Sequence):
+    """Sections of a contract as line offsets into `source`.
+
+    Section i is made of the stripped lines first_lines[i] .. first_lines[i + 1] - 1,
+    its text is those lines joined by single spaces.
+    """
+
+    __slots__ = ("source", "line_starts", "line_ends", "first_lines", "kinds")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = line_starts = array("q")
+        self.line_ends = array("q")
+        self.first_lines = array("q")
+        self.kinds = kinds = array("b")
+
+        add_start, add_end = line_starts.append, self.line_ends.append
+        add_first, add_kind = self.first_lines.append, kinds.append
+        position = 0
+        for raw in source.splitlines(True):
+            line = raw.strip()
+            if line:
+                # everything before the first non-space character is stripped whitespace
+                start = position + raw.find(line[0])
+                kind = header_kind(line)
+                if kind is not None:
+                    add_first(len(line_starts))
+                    add_kind(kind)
+                elif not kinds:
+                    add_first(0)
+                    add_kind(INTRODUCTION)
+                add_start(start)
+                add_end(start + len(line))
+            position += len(raw)
+        add_first(len(line_starts))
+
+    def title(self, index: int) -> str:
+        kind = self.kinds[index]
+        if kind != OWN_LINE:
+            return TITLES[kind]
+        line = self.first_lines[index]
+        return self.source[self.line_starts[line]:self.line_ends[line]]
+
+    def text(self, index: int) -> str:
+        source, starts, ends = self.source, self.line_starts, self.line_ends
+        first, stop = self.first_lines[index], self.first_lines[index + 1]
+        if stop - first == 1:
+            return source[starts[first]:ends[first]]
+        return " ".join([source[starts[i]:ends[i]] for i in range(first, stop)])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return ContractSection(self, index)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        source, starts, ends, first_lines = self.source, self.line_starts, self.line_ends, self.first_lines
+        sections = []
+        for index, kind in enumerate(self.kinds):
+            first, stop = first_lines[index], first_lines[index + 1]
+            if stop - first == 1:
+                text = source[starts[first]:ends[first]]
+            else:
+                text = " ".join([source[starts[i]:ends[i]] for i in range(first, stop)])
+            title = text[:ends[first] - starts[first]] if kind == OWN_LINE else TITLES[kind]
+            sections.append({"section_title": title, "section_text": text})
+        return sections
+
+
+def segment_contract(text: str) -> ContractSegments:
+    """Contract sections with the split_contract_memory rules, text built on demand."""
+    return ContractSegments(text or "")
+
+
+class LaborSection:
+    """A numbered labor code section: title and body offsets, body cleaned when read."""
+
+    __slots__ = ("source", "title_start", "title_end", "start", "end")
+
+    def __init__(self, source: str, title_start: int, title_end: int, start: int, end: int):
+        self.source = source
+        self.title_start = title_start
+        self.title_end = title_end
+        self.start = start
+        self.end = end
+
+    @property
+    def title(self) -> str:
+        return self.source[self.title_start:self.title_end].strip()
+
+    @property
+    def text(self) -> str:
+        return CLEAN_RE.sub(" ", self.source[self.start:self.end]).strip()
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"title": self.title, "text": self.text}
+
+
+def segment_labor_code(text: str) -> List[LaborSection]:
+    """Sections starting at each "N. TITLE" line, with the split_by_sections rules."""
+    sections: List[LaborSection] = []
+    previous = None
+    for match in SECTION_RE.finditer(text):
+        if previous is not None:
+            previous.end = match.start()
+        previous = LaborSection(text, match.start(1), match.end(1), match.start(), len(text))
+        sections.append(previous)
+    return sections
@@ -3,38 +3,19 @@ Step 2: Split Moroccan Labor Code text into major sections (clean version)
 """
 
 import os
-import re
 import json
 from fastapi import APIRouter
 
+from app.services.segmenter import segment_labor_code
+
 INPUT_PATH = "legal-data/articles_cleaned/labor_code_clean.txt"
 OUTPUT_PATH = "legal-data/articles_cleaned/sections.json"
 
 router = APIRouter()
 
-def clean_body(text: str) -> str:
-    """Remove newlines, emojis, and normalize spaces."""
-    # remove emojis and special symbols like ⚠
-    text = re.sub(r"[^\w\s.,;:!?()\-']", " ", text, flags=re.UNICODE)
-    # replace multiple spaces/newlines with single space
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
 def split_by_sections(text: str):
     """Split text by numbered major sections (1., 2., 3. ...)."""
-    pattern = r"(?m)^(\d+\.\s+[A-ZÉÈÀÙÂÊÎÔÛÄËÏÖÜÇ'\- ]+)"
-    matches = list(re.finditer(pattern, text))
-
-    sections = []
-    for i, match in enumerate(matches):
-        start = match.start()
-        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-        title = match.group(1).strip()
-        body = text[start:end].strip()
-        body = clean_body(body)
-        sections.append({"title": title, "text": body})
-
-    return sections
+    return [section.to_dict() for section in segment_labor_code(text)]
 
 @router.get("/split-sections")
 def split_sections():
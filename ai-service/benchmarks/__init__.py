@@ -0,0 +1 @@
+# Offline benchmarks: synthetic contracts, a fake LLM and timing helpers
@@ -0,0 +1,173 @@
+"""
+Embedding server benchmark: encode throughput under concurrent clients.
+
+    python -m benchmarks.embeddings
+    python -m benchmarks.embeddings --clients 16 --requests 50 --texts 2
+    python -m benchmarks.embeddings --real --memory
+
+Every client thread stands for one API or worker process sending small
+encode requests (a few clauses). Compared:
+- direct: each client encodes with its own model, one request at a time
+- server x1: through the embedding server with batching off (max batch 1)
+- server: through the embedding server with micro-batching
+
+Without --real the model is simulated by a CPU-bound encoder with a fixed
+cost per forward pass plus a cost per text (the shape of a small
+transformer on CPU). --memory (with --real) starts the server and reports
+the resident memory of a client process with and without it.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.embedding_server import EmbeddingClient, MicroBatcher, create_server
+
+from .fakes import FakeEmbeddings
+from .run import percentile
+
+
+class SimulatedModel(FakeEmbeddings):
+    """Hashing embeddings that keep the CPU busy like a forward pass would."""
+
+    def __init__(self, call_ms: float = 4.0, text_ms: float = 0.4, dim: int = 384):
+        super().__init__(dim=dim)
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        end = time.perf_counter() + (self.call_ms + self.text_ms * len(texts)) / 1000
+        while time.perf_counter() < end:
+            pass
+        return super().embed_documents(texts)
+
+
+def load_model(real: bool) -> Any:
+    if real:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        from app.services.retrieval_engine import EMBEDDING_MODEL
+        return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    return SimulatedModel()
+
+
+def run_clients(encode_for: Callable[[int], Callable[[List[str]], Any]], clients: int, requests: int,
+                texts: int) -> Dict[str, float]:
+    """Each client sends `requests` encode calls of `texts` distinct clauses."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(number: int) -> None:
+        encode = encode_for(number)
+        mine = []
+        for r in range(requests):
+            batch = [f"Clause {number}-{r}-{t} : le salarié perçoit une prime de {t} dirhams" for t in range(texts)]
+            t0 = time.perf_counter()
+            encode(batch)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests_per_sec": len(latencies) / total,
+        "texts_per_sec": len(latencies) * texts / total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def run_embedding_benchmarks(real: bool, clients: int, requests: int, texts: int,
+                             max_batch: int, max_wait_ms: float) -> Dict[str, Dict[str, float]]:
+    model = load_model(real)
+    results = {"direct": run_clients(lambda _: model.embed_documents, clients, requests, texts)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, batch in (("server x1", 1), ("server", max_batch)):
+            batcher = MicroBatcher(model.embed_documents, batch, max_wait_ms / 1000)
+            socket_path = os.path.join(tmp, "embeddings.sock")
+            server = create_server(batcher, "benchmark", socket_path=socket_path)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                client = EmbeddingClient(f"unix://{socket_path}")
+                results[name] = run_clients(lambda _: client.embed_documents, clients, requests, texts)
+                results[name]["texts_per_batch"] = batcher.stats()["texts_per_batch"]
+            finally:
+                server.shutdown()
+                server.server_close()
+                batcher.stop()
+    return results
+
+
+MEMORY_PROBE = """
+import json
+from app.services.retrieval_engine import get_engine
+get_engine().embeddings.embed_query("Le salarié est soumis à une période d'essai.")
+with open("/proc/self/status") as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+print(json.dumps({"rss_mb": rss / 1024}))
+"""
+
+
+def client_memory(embedding_server: str) -> float:
+    """Resident memory (MB) of a process that embedded one clause, with or without the server."""
+    env = dict(os.environ, EMBEDDING_SERVER=embedding_server)
+    out = subprocess.run([sys.executable, "-c", MEMORY_PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])["rss_mb"]
+
+
+def run_memory_benchmark() -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "embeddings.sock")
+        server = subprocess.Popen([sys.executable, "-m", "app.services.embedding_server", "--socket", socket_path])
+        try:
+            for _ in range(600):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.1)
+            return {"local_model_mb": client_memory(""), "server_client_mb": client_memory(f"unix://{socket_path}")}
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="use all-MiniLM-L6-v2 instead of the simulated model")
+    parser.add_argument("--memory", action="store_true", help="also measure client memory (needs --real)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=30, help="encode requests per client")
+    parser.add_argument("--texts", type=int, default=2, help="texts per request")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = run_embedding_benchmarks(args.real, args.clients, args.requests, args.texts,
+                                                       args.max_batch, args.max_wait_ms)
+    print(f"{args.clients} clients x {args.requests} requests x {args.texts} texts "
+          f"({'all-MiniLM-L6-v2' if args.real else 'simulated model'})")
+    print(f"{'mode':<12}{'req/s':>10}{'texts/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'batch':>8}")
+    for name, stats in results.items():
+        print(f"{name:<12}{stats['requests_per_sec']:>10.1f}{stats['texts_per_sec']:>10.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats.get('texts_per_batch', 0):>8.1f}")
+    if args.memory and args.real:
+        results["memory"] = run_memory_benchmark()
+        print(f"client RSS: {results['memory']['local_model_mb']:.0f} MB with its own model, "
+              f"{results['memory']['server_client_mb']:.0f} MB with the embedding server")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
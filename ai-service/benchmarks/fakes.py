@@ -0,0 +1,400 @@
+"""
+In-memory stand-ins for Gemini, the embedding model, Chroma, Redis and
+RabbitMQ, shared by the tests and the benchmarks.
+
+FakeLLM has the same invoke() surface as ChatGoogleGenerativeAI, so it can
+replace Generation.llm (or be passed as `client`). With ClauseVerdicts as its
+responder, verdicts depend only on the clause text, and latency/errors on a
+seeded RNG, so two runs with the same settings do the same work.
+"""
+import fnmatch
+import random
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+from app.services.contract_review.events import EMIT_LUA
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeRateLimitError(Exception):
+    """What the Gemini client raises on HTTP 429 (ResourceExhausted), with the suggested delay."""
+
+    code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 Resource has been exhausted (e.g. check quota).")
+        self.retry_after = retry_after
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+class FakeLLM:
+    """Mimics ChatGoogleGenerativeAI.invoke after `latency` (+/- `jitter`) seconds.
+
+    `responder(prompt)` returns the text the model should answer with.
+    error_rate: share of calls that raise FakeLLMError, to exercise the retry path
+    """
+
+    def __init__(self, responder=None, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.responder = responder or (lambda prompt: '{"compliant": true}')
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.options = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, messages, **options):
+        with self._lock:
+            self.calls += 1
+            self.options = options
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                raise FakeLLMError("503 Service Unavailable")
+            prompt = messages[-1].content
+            return FakeResponse(self.responder(prompt))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+CLAUSE_RE = re.compile(r'CLAUSE \(index (\d+)\):\s*"""(.*?)"""', re.DOTALL)
+
+
+class ClauseVerdicts:
+    """FakeLLM responder answering clause prompts (single or batched).
+
+    issue_rate: share of clauses judged problematic (chosen by hashing the text)
+    """
+
+    def __init__(self, issue_rate=0.2):
+        self.issue_rate = issue_rate
+
+    def _is_issue(self, clause_text):
+        return (zlib.crc32(clause_text.encode("utf-8")) % 1000) < self.issue_rate * 1000
+
+    def _verdict(self, clause_text):
+        if self._is_issue(clause_text):
+            return ('"issue": "Clause non conforme au code du travail", '
+                    '"suggestion": "Aligner la clause sur les dispositions légales"')
+        return '"compliant": true'
+
+    def __call__(self, prompt):
+        clauses = CLAUSE_RE.findall(prompt)
+        if "TABLEAU JSON" in prompt:
+            entries = [f'{{"index": {index}, {self._verdict(text)}}}' for index, text in clauses]
+            return "[" + ", ".join(entries) + "]"
+        text = clauses[0][1] if clauses else prompt
+        return "{" + self._verdict(text) + "}"
+
+
+def _emit_event(client, keys, args):
+    """events.EMIT_LUA"""
+    with client._lock:
+        seq = client.incr(keys[1])
+        payload = f"{args[0]}{seq}{args[1]}"
+        client.xadd(keys[0], {"event": payload}, maxlen=int(args[2]))
+        client.expire(keys[0], int(args[3]))
+        client.expire(keys[1], int(args[3]))
+        client.publish(args[4], payload)
+        return seq
+
+
+SCRIPTS = {EMIT_LUA: _emit_event}
+
+
+class FakeRedis:
+    """Subset of redis.Redis backed by dicts: strings, hashes, sorted sets, expiry, pub/sub log.
+
+    subscribe(channel, callback) has callback(message) called on every publish.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.expiry = {}
+        self.published = []
+        self.subscribers = defaultdict(list)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _bytes(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    def _alive(self, key):
+        expires_at = self.expiry.get(key)
+        if expires_at is not None and expires_at < time.time():
+            self.store.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.store
+
+    def get(self, key):
+        with self._lock:
+            return self.store.get(key) if self._alive(key) else None
+
+    def scan_iter(self, match="*"):
+        with self._lock:
+            keys = [key for key in list(self.store) if self._alive(key)]
+        return [key for key in keys if fnmatch.fnmatchcase(key, match)]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self.store[key] = self._bytes(value)
+            if ex is not None:
+                self.expiry[key] = time.time() + ex
+            else:
+                self.expiry.pop(key, None)
+        return True
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self.expiry[key] = time.time() + seconds
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                removed += int(self.store.pop(key, None) is not None)
+                self.expiry.pop(key, None)
+            return removed
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            if not self._alive(name):
+                self.store[name] = {}
+            table = self.store[name]
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = 0
+            for field, field_value in items.items():
+                field = self._bytes(field)
+                added += int(field not in table)
+                table[field] = self._bytes(field_value)
+            return added
+
+    def hlen(self, name):
+        with self._lock:
+            return len(self.store[name]) if self._alive(name) else 0
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self.store[name]) if self._alive(name) else {}
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            zset = self.store.setdefault(name, {})
+            for member, score in mapping.items():
+                zset[self._bytes(member)] = float(score)
+            return len(mapping)
+
+    def zrangebyscore(self, name, low, high):
+        with self._lock:
+            zset = self.store.get(name, {})
+            return [m for m, score in sorted(zset.items(), key=lambda item: item[1]) if low <= score <= high]
+
+    def zrem(self, name, *members):
+        with self._lock:
+            zset = self.store.get(name, {})
+            return sum(1 for m in members if zset.pop(self._bytes(m), None) is not None)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self.store[key]) + amount if self._alive(key) else amount
+            self.store[key] = self._bytes(value)
+            return value
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        with self._lock:
+            stream = self.store.setdefault(name, [])
+            entry_id = f"{int(time.time() * 1000)}-{len(stream)}".encode()
+            stream.append((entry_id, {self._bytes(k): self._bytes(v) for k, v in fields.items()}))
+            if maxlen is not None:
+                del stream[:-maxlen]
+            return entry_id
+
+    def xrange(self, name, min="-", max="+"):
+        with self._lock:
+            return list(self.store.get(name, []))
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self.subscribers[channel].append(callback)
+
+    def publish(self, channel, message):
+        with self._lock:
+            self.published.append((channel, message))
+            callbacks = list(self.subscribers.get(channel, []))
+        for callback in callbacks:
+            callback(message)
+        return 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        """Runs the Python stand-in of a Lua script the app registers (see SCRIPTS)."""
+        run = SCRIPTS[script]
+        return lambda keys=(), args=(): run(self, keys, args)
+
+
+class FakePipeline:
+    """Buffers commands and runs them on execute(), like a redis-py pipeline."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class FakeDocument:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class FakeEmbeddings:
+    """Stands in for SentenceTransformerEmbeddings: hashed bag of words, counts model loads."""
+
+    loads = 0
+    dim = 64
+
+    def __init__(self, model_name=None, dim=None, **kwargs):
+        type(self).loads += 1
+        self.model_name = model_name
+        if dim:
+            self.dim = dim
+        self.query_calls = 0
+        self.document_calls = 0
+
+    def _vector(self, text):
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        return vector
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return [self._vector(t) for t in texts]
+
+
+class FakeChroma:
+    """Stands in for the Chroma store; returns one section per query."""
+
+    opens = 0
+
+    def __init__(self, persist_directory=None, embedding_function=None, **kwargs):
+        type(self).opens += 1
+        self.embedding_function = embedding_function
+        self.queries = 0
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        self.queries += 1
+        return [(FakeDocument(f"Section {int(embedding[0]) % 3}", {"title": "Section"}), 0.5)][:k]
+
+
+class FakeVectorStore:
+    """Records what an index build adds to / deletes from the store."""
+
+    def __init__(self):
+        self.docs = {}
+        self.add_calls = 0
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        self.add_calls += 1
+        for text, metadata, doc_id in zip(texts, metadatas, ids):
+            self.docs[doc_id] = (text, metadata)
+        return ids
+
+    def delete(self, ids=None):
+        for doc_id in ids or []:
+            self.docs.pop(doc_id, None)
+
+
+class FakeMethod:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class FakeChannel:
+    """Records acks/nacks/publishes together with the thread that issued them."""
+
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+        self.published = []
+        self.threads = set()
+
+    def basic_ack(self, delivery_tag):
+        self.threads.add(threading.get_ident())
+        self.acks.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.threads.add(threading.get_ident())
+        self.nacks.append((delivery_tag, requeue))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.threads.add(threading.get_ident())
+        self.published.append((routing_key, body, properties))
+
+
+class FakeConnection:
+    """Queues add_callback_threadsafe callbacks until the test drains them."""
+
+    def __init__(self):
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback_threadsafe(self, callback):
+        with self._lock:
+            self.callbacks.append(callback)
+
+    def process_callbacks(self):
+        with self._lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+        return len(callbacks)
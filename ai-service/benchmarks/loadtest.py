@@ -0,0 +1,444 @@
+"""
+Replayable load test for the contract worker.
+
+    python -m benchmarks.loadtest record --synthetic 200 --rate 2 --output load.jsonl
+    python -m benchmarks.loadtest replay load.jsonl --workers 4 --prefetch 8 --latency 0.2
+    python -m benchmarks.loadtest replay load.jsonl --rate 10 --output report.json
+    python -m benchmarks.loadtest replay load.jsonl --concurrency 8
+    python -m benchmarks.loadtest replay load.jsonl --rabbitmq localhost --redis redis://localhost:6379/15
+
+Load files are JSONL, one {"ts": arrival time, "message": {"id", "fileName",
+"extractedText", "header"}} per line (bare messages are accepted too). The
+worker records its real traffic in that format with RECORD_MESSAGES=load.jsonl;
+`record --synthetic` writes synthetic contracts with Poisson arrivals.
+
+Replay publishes the messages on their recorded schedule (scaled by --speed),
+at a fixed --rate, or keeping --concurrency contracts outstanding, and runs
+worker.ContractConsumer with --workers threads and --prefetch unacked
+messages, with the fake Gemini and embeddings of benchmarks.fakes. RabbitMQ
+and Redis are in-memory stand-ins unless --rabbitmq/--redis point at local
+servers; then --queue (purged first) and the given Redis db are used, so keep
+them scratch.
+
+The report gives end-to-end latency (publish to result) percentiles,
+throughput, errors and queue depth over time.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import pika
+
+import worker
+from app.services import retrieval_engine
+from app.services.contract_review import Generation, fanout
+from app.services.contract_review.result_store import RESULTS_CHANNEL, ResultStore
+from app.services.contract_review.revisions import REVISION_TRACKING, RevisionStore
+
+from .fakes import ClauseVerdicts, FakeLLM, FakeMethod, FakeRedis
+from .run import build_engine, percentile
+from .synthetic import generate_contract
+
+Schedule = List[Tuple[float, Dict[str, Any]]]
+
+
+def load_messages(path: str) -> Schedule:
+    """(offset in seconds from the first arrival, message) for every line of a load file."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.append((entry.get("ts"), entry["message"]) if "message" in entry else (None, entry))
+    stamps = [ts for ts, _ in entries if ts is not None]
+    first = min(stamps) if stamps else 0.0
+    return sorted(((ts - first if ts is not None else 0.0, message) for ts, message in entries),
+                  key=lambda entry: entry[0])
+
+
+def record_synthetic(path: str, count: int, rate: float, clauses: int = 30, duplicates: float = 0.0,
+                     seed: int = 0) -> int:
+    """Write `count` synthetic contract messages arriving as a Poisson process of `rate` per second.
+
+    A `duplicates` share of them re-send an earlier contract's text (re-uploads).
+    """
+    rng = random.Random(seed)
+    ts = time.time()
+    texts: List[str] = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            ts += rng.expovariate(rate) if rate > 0 else 0.0
+            if texts and rng.random() < duplicates:
+                text = rng.choice(texts)
+            else:
+                text = generate_contract(clauses=clauses, seed=seed + i)
+                texts.append(text)
+            message = {"id": f"synthetic-{i}", "fileName": f"contrat-{i}.pdf", "extractedText": text, "header": ""}
+            f.write(json.dumps({"ts": round(ts, 3), "message": message}, ensure_ascii=False) + "\n")
+    return count
+
+
+class LoadCollector:
+    """Publish and completion times of the replayed contracts, and the queue depth samples."""
+
+    def __init__(self):
+        self.published: Dict[str, float] = {}
+        self.latencies: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.statuses: Counter = Counter()
+        self.samples: List[Dict[str, float]] = []
+        self._lock = threading.Lock()
+
+    def on_published(self, contract_id: str) -> None:
+        with self._lock:
+            self.published[contract_id] = time.perf_counter()
+
+    def _finish(self, contract_id: str) -> Optional[float]:
+        start = self.published.get(contract_id)
+        if start is None or contract_id in self.latencies or contract_id in self.errors:
+            return None
+        return time.perf_counter() - start
+
+    def on_result(self, payload: Any) -> None:
+        """RESULTS_CHANNEL message published by ResultStore."""
+        message = json.loads(payload)
+        with self._lock:
+            latency = self._finish(message["id"])
+            if latency is not None:
+                self.latencies[message["id"]] = latency
+                self.statuses[json.loads(message["result"]).get("status")] += 1
+
+    def on_error(self, contract_id: str, error: BaseException) -> None:
+        with self._lock:
+            if self._finish(contract_id) is not None:
+                self.errors[contract_id] = repr(error)[:200]
+
+    def watch(self, handler: Callable[[bytes], Any]) -> Callable[[bytes], Any]:
+        """handler, with its failures counted as errors of the contract."""
+        def watched(body: bytes) -> Any:
+            try:
+                return handler(body)
+            except Exception as e:
+                self.on_error(json.loads(body).get("id"), e)
+                raise
+        return watched
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return len(self.published) - len(self.latencies) - len(self.errors)
+
+    def sample(self, elapsed: float, queued: int) -> None:
+        self.samples.append({"t": round(elapsed, 3), "queued": queued, "outstanding": self.outstanding()})
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies.values())
+        queued = [sample["queued"] for sample in self.samples] or [0]
+        return {
+            "published": len(self.published),
+            "completed": len(latencies),
+            "errors": len(self.errors),
+            "timed_out": len(self.published) - len(latencies) - len(self.errors),
+            "statuses": dict(self.statuses),
+            "elapsed_s": elapsed,
+            "throughput_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": {name: percentile(latencies, q) * 1000
+                           for name, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))},
+            "queue_depth": {"max": max(queued), "mean": sum(queued) / len(queued)},
+            "timeline": self.samples,
+            "error_samples": list(self.errors.values())[:5],
+        }
+
+
+class InMemoryBroker:
+    """RabbitMQ stand-in driven from one thread, like pika's BlockingConnection.
+
+    It is both the connection (add_callback_threadsafe) and the channel
+    (basic_ack/basic_nack/basic_publish) given to worker.ContractConsumer, and
+    delivers at most `prefetch` unacked messages to each consumer.
+    """
+
+    def __init__(self, prefetch: int):
+        self.prefetch = max(1, prefetch)
+        self.queues: Dict[str, deque] = defaultdict(deque)
+        self.consumers: Dict[str, Callable] = {}
+        self.unacked: Dict[int, str] = {}
+        self.in_flight: Counter = Counter()
+        self._callbacks: "queue.Queue[Callable[[], None]]" = queue.Queue()
+        self._tags = itertools.count(1)
+
+    def add_callback_threadsafe(self, callback: Callable[[], None]) -> None:
+        self._callbacks.put(callback)
+
+    def basic_consume(self, queue: str, on_message_callback: Callable) -> None:
+        self.consumers[queue] = on_message_callback
+
+    def basic_publish(self, exchange: str, routing_key: str, body: Any, properties: Any = None) -> None:
+        self.queues[routing_key].append((body, properties))
+
+    def basic_ack(self, delivery_tag: int) -> None:
+        self.in_flight[self.unacked.pop(delivery_tag)] -= 1
+
+    def basic_nack(self, delivery_tag: int, requeue: bool = True) -> None:
+        self.in_flight[self.unacked.pop(delivery_tag)] -= 1
+
+    def depth(self, queue: str) -> int:
+        return len(self.queues[queue])
+
+    def process_data_events(self, time_limit: float = 0) -> None:
+        """Run the callbacks handed over by executor threads, then deliver what prefetch allows."""
+        try:
+            callback = self._callbacks.get(timeout=time_limit) if time_limit > 0 else self._callbacks.get_nowait()
+            while True:
+                callback()
+                callback = self._callbacks.get_nowait()
+        except queue.Empty:
+            pass
+        for queue_name, on_message in self.consumers.items():
+            ready = self.queues[queue_name]
+            while ready and self.in_flight[queue_name] < self.prefetch:
+                body, properties = ready.popleft()
+                tag = next(self._tags)
+                self.unacked[tag] = queue_name
+                self.in_flight[queue_name] += 1
+                on_message(self, FakeMethod(tag), properties, body)
+
+
+@contextmanager
+def patched(overrides: Dict[Tuple[Any, str], Any]) -> Iterator[None]:
+    saved = {target: getattr(*target) for target in overrides}
+    for (module, name), value in overrides.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+
+
+def drive(schedule: Schedule, collector: LoadCollector, publish: Callable[[bytes], None],
+          pump: Callable[[float], None], depth: Callable[[], int], speed: float = 1.0,
+          rate: Optional[float] = None, concurrency: Optional[int] = None,
+          sample_interval: float = 0.5, timeout: float = 600.0) -> float:
+    """Publish the schedule and pump the broker until every contract finished. Returns the elapsed time."""
+    start = time.perf_counter()
+    next_sample = 0.0
+    position = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        while position < len(schedule):
+            offset, message = schedule[position]
+            if concurrency:
+                due = collector.outstanding() < concurrency
+            elif rate:
+                due = position / rate <= elapsed
+            else:
+                due = offset / speed <= elapsed
+            if not due:
+                break
+            collector.on_published(message["id"])
+            publish(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+            position += 1
+        if elapsed >= next_sample:
+            collector.sample(elapsed, depth())
+            next_sample += sample_interval
+        if position == len(schedule) and collector.outstanding() == 0:
+            break
+        if elapsed > timeout:
+            print(f"Timed out with {collector.outstanding()} contracts outstanding")
+            break
+        pump(0.005)
+    elapsed = time.perf_counter() - start
+    collector.sample(elapsed, depth())
+    return elapsed
+
+
+def fake_services(args: argparse.Namespace, llm: FakeLLM) -> Dict[Tuple[Any, str], Any]:
+    """LLM, embeddings and verdict cache stand-ins (shared by both transports)."""
+    return {
+        (retrieval_engine, "_engine"): build_engine(False, args.sections),
+        (Generation, "llm"): llm,
+        (Generation, "SLEEP_BETWEEN_CALLS"): 0.0,
+        (Generation, "verdict_cache"): None,
+    }
+
+
+def worker_stores(store: Any) -> Dict[Tuple[Any, str], Any]:
+    return {
+        (worker, "r"): store,
+        (worker, "result_store"): ResultStore(store),
+        (worker, "revision_store"): RevisionStore(store) if REVISION_TRACKING else None,
+    }
+
+
+def replay_in_memory(schedule: Schedule, args: argparse.Namespace, collector: LoadCollector,
+                     services: Dict[Tuple[Any, str], Any]) -> float:
+    store = FakeRedis()
+    store.subscribe(RESULTS_CHANNEL, collector.on_result)
+    broker = InMemoryBroker(args.prefetch)
+
+    def publish_subjob(subjob: Dict[str, Any]) -> None:
+        body = json.dumps(subjob).encode("utf-8")
+        broker.add_callback_threadsafe(lambda: broker.basic_publish("", fanout.SUBJOB_QUEUE, body))
+
+    overrides = {**services, **worker_stores(store), (worker, "publish_subjob"): publish_subjob}
+    executor = worker.create_executor("thread", args.workers)
+    try:
+        with patched(overrides):
+            consumer = worker.ContractConsumer(broker, broker, executor, handler=collector.watch(worker.handle_contract),
+                                               dead_letter_queue=worker.DEAD_LETTER_QUEUE)
+            broker.basic_consume(worker.QUEUE_NAME, consumer.on_message)
+            subjobs = worker.ContractConsumer(broker, broker, executor, handler=worker.handle_subjob,
+                                              dead_letter_queue=worker.DEAD_LETTER_QUEUE)
+            broker.basic_consume(fanout.SUBJOB_QUEUE, subjobs.on_message)
+
+            def publish(body: bytes) -> None:
+                properties = pika.BasicProperties(delivery_mode=2, timestamp=int(time.time()))
+                broker.basic_publish("", worker.QUEUE_NAME, body, properties)
+
+            return drive(schedule, collector, publish, broker.process_data_events,
+                         lambda: broker.depth(worker.QUEUE_NAME), args.speed, args.rate, args.concurrency,
+                         args.sample_interval, args.timeout)
+    finally:
+        executor.shutdown(wait=True)
+
+
+def replay_rabbitmq(schedule: Schedule, args: argparse.Namespace, collector: LoadCollector,
+                    services: Dict[Tuple[Any, str], Any]) -> float:
+    import redis
+
+    store = redis.Redis.from_url(args.redis)
+    pubsub = store.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{RESULTS_CHANNEL: lambda message: collector.on_result(message["data"])})
+    listener = pubsub.run_in_thread(sleep_time=0.01, daemon=True)
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(args.rabbitmq))
+    channel = connection.channel()
+    dead_letter_queue = args.queue + ".dead"
+    for name in (args.queue, dead_letter_queue, fanout.SUBJOB_QUEUE):
+        channel.queue_declare(queue=name, durable=True)
+    channel.queue_purge(args.queue)
+    channel.basic_qos(prefetch_count=args.prefetch)
+
+    overrides = {**services, **worker_stores(store),
+                 (worker, "publish_subjob"): worker.SubjobPublisher(args.rabbitmq)}
+    executor = worker.create_executor("thread", args.workers)
+    try:
+        with patched(overrides):
+            consumer = worker.ContractConsumer(connection, channel, executor,
+                                               handler=collector.watch(worker.handle_contract),
+                                               dead_letter_queue=dead_letter_queue)
+            channel.basic_consume(queue=args.queue, on_message_callback=consumer.on_message)
+            subjobs = worker.ContractConsumer(connection, channel, executor, handler=worker.handle_subjob,
+                                              dead_letter_queue=dead_letter_queue)
+            channel.basic_consume(queue=fanout.SUBJOB_QUEUE, on_message_callback=subjobs.on_message)
+
+            def publish(body: bytes) -> None:
+                properties = pika.BasicProperties(delivery_mode=2, timestamp=int(time.time()))
+                channel.basic_publish(exchange="", routing_key=args.queue, body=body, properties=properties)
+
+            def depth() -> int:
+                return channel.queue_declare(queue=args.queue, durable=True, passive=True).method.message_count
+
+            return drive(schedule, collector, publish, lambda wait: connection.process_data_events(time_limit=wait),
+                         depth, args.speed, args.rate, args.concurrency, args.sample_interval, args.timeout)
+    finally:
+        executor.shutdown(wait=True)
+        connection.process_data_events(time_limit=0)
+        connection.close()
+        listener.stop()
+
+
+def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    schedule = load_messages(args.file)[:args.limit or None]
+    # replayed ids are made unique so that repeated recordings do not merge
+    schedule = [(offset, {**message, "id": f"replay-{i}-{message.get('id')}"})
+                for i, (offset, message) in enumerate(schedule)]
+    llm = FakeLLM(ClauseVerdicts(args.issue_rate), latency=args.latency, jitter=args.latency / 4,
+                  error_rate=args.error_rate, seed=args.seed)
+    collector = LoadCollector()
+    run = replay_rabbitmq if args.rabbitmq else replay_in_memory
+    elapsed = run(schedule, args, collector, fake_services(args, llm))
+    report = collector.report(elapsed)
+    report["llm_calls"] = llm.calls
+    report["params"] = vars(args).copy()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    params = report["params"]
+    if params["concurrency"]:
+        mode = f"{params['concurrency']} outstanding"
+    elif params["rate"]:
+        mode = f"{params['rate']}/s"
+    else:
+        mode = f"recorded schedule x{params['speed']}"
+    print(f"{report['published']} contracts ({mode}), {params['workers']} worker threads, "
+          f"prefetch {params['prefetch']}, LLM latency {params['latency'] * 1000:.0f} ms, "
+          f"{'RabbitMQ/Redis' if params['rabbitmq'] else 'in-memory broker'}")
+    print(f"completed {report['completed']}, errors {report['errors']}, timed out {report['timed_out']}, "
+          f"{report['throughput_per_sec']:.2f} contracts/s over {report['elapsed_s']:.1f} s")
+    print("latency ms  " + "  ".join(f"{name} {value:.0f}" for name, value in report["latency_ms"].items()))
+    print(f"queue depth max {report['queue_depth']['max']}, mean {report['queue_depth']['mean']:.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="write a synthetic load file")
+    record.add_argument("--synthetic", type=int, required=True, help="number of contracts")
+    record.add_argument("--rate", type=float, default=1.0, help="mean arrivals per second (0: all at once)")
+    record.add_argument("--clauses", type=int, default=30)
+    record.add_argument("--duplicates", type=float, default=0.0, help="share of re-uploaded contracts")
+    record.add_argument("--seed", type=int, default=0)
+    record.add_argument("--output", required=True)
+
+    play = commands.add_parser("replay", help="replay a load file against the worker")
+    play.add_argument("file")
+    pace = play.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1.0, help="recorded schedule, this many times faster")
+    pace.add_argument("--rate", type=float, help="publish at a fixed rate (messages per second)")
+    pace.add_argument("--concurrency", type=int, help="keep this many contracts outstanding")
+    play.add_argument("--limit", type=int, default=0, help="replay only the first N messages")
+    play.add_argument("--workers", type=int, default=worker.WORKER_CONCURRENCY, help="worker threads")
+    play.add_argument("--prefetch", type=int, default=worker.WORKER_PREFETCH)
+    play.add_argument("--latency", type=float, default=0.2, help="fake LLM latency (seconds)")
+    play.add_argument("--error-rate", type=float, default=0.0, help="share of LLM calls that fail")
+    play.add_argument("--issue-rate", type=float, default=0.2)
+    play.add_argument("--sections", type=int, default=200, help="labor code sections in the fake index")
+    play.add_argument("--rabbitmq", help="local RabbitMQ host (default: in-memory broker and Redis)")
+    play.add_argument("--redis", default="redis://localhost:6379/15", help="Redis URL used with --rabbitmq")
+    play.add_argument("--queue", default="contract-queue.loadtest", help="scratch queue used with --rabbitmq")
+    play.add_argument("--sample-interval", type=float, default=0.5, help="queue depth sampling (seconds)")
+    play.add_argument("--timeout", type=float, default=600.0)
+    play.add_argument("--seed", type=int, default=0)
+    play.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        count = record_synthetic(args.output, args.synthetic, args.rate, args.clauses, args.duplicates, args.seed)
+        print(f"Wrote {count} messages to {args.output}")
+        return {"messages": count}
+
+    report = replay(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
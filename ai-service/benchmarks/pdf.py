@@ -0,0 +1,49 @@
+"""
+PDF extraction benchmark.
+
+    python -m benchmarks.pdf
+    python -m benchmarks.pdf path/to/annex.pdf --repeat 10 --workers 4
+
+Times every backend (PyMuPDF, pdfplumber), serially and on a process pool
+when more than one worker is asked for, on the bundled labor code by default.
+"""
+
+import argparse
+import sys
+from typing import Any, Dict, List, Optional
+
+from app.parser import RAW_PATH
+from app.services import pdf_extraction
+
+from .run import measure
+
+
+def run_pdf_benchmarks(path: str, repeat: int, workers: int) -> Dict[str, Dict[str, Any]]:
+    pages = pdf_extraction.page_count(path)
+    results = {}
+    for backend in pdf_extraction.BACKENDS:
+        for count in sorted({1, workers}):
+            stats = measure(lambda _: pdf_extraction.extract_text(path, backend=backend, workers=count),
+                            range(repeat))
+            stats["pages_per_sec"] = pages / (stats["p50_ms"] / 1000) if stats["p50_ms"] else 0.0
+            results[f"{backend} x{count}"] = stats
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=RAW_PATH)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="also time a process pool of this size")
+    args = parser.parse_args(argv)
+
+    results = run_pdf_benchmarks(args.path, args.repeat, args.workers)
+    print(f"{args.path}: {pdf_extraction.page_count(args.path)} pages")
+    print(f"{'backend':<16}{'p50 ms':>10}{'p95 ms':>10}{'pages/s':>10}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['pages_per_sec']:>10.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
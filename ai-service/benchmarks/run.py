@@ -0,0 +1,201 @@
+"""
+Offline benchmark suite.
+
+    python -m benchmarks.run --contracts 50 --clauses 40 --latency 0.05 --output bench.json
+    python -m benchmarks.run --compare bench.json
+
+Runs every stage on synthetic contracts with a fake LLM (and, unless
+--real-embeddings is given, hashing embeddings over a NumPy index), then
+prints ops/sec and p50/p95/p99 latency per benchmark and saves them as JSON.
+--compare prints the change against a previous results file.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services import retrieval_engine
+from app.services.contract_review import Generation
+from app.services.contract_review.generation_workflow import process_contract_workflow
+from app.services.contract_review.retriever_contract import retrieve_sections_bulk
+from app.services.contract_review.splitter_contract import split_contract_memory
+
+from .fakes import ClauseVerdicts, FakeEmbeddings, FakeLLM
+from .synthetic import generate_corpus, generate_sections
+
+JSON_RESPONSES = [
+    '{"compliant": true}',
+    '```json\n{"issue": "Période d\'essai trop longue", "suggestion": "Limiter à 3 mois"}\n```',
+    'Voici mon analyse : {"issue": "Préavis insuffisant", "suggestion": ""} Merci.',
+    "Je ne peux pas répondre à cette question " * 20 + '{"compliant": true}',
+    '[{"index": 1, "compliant": true}, {"index": 2, "issue": "Heures excessives", "suggestion": "44h max"}]',
+]
+# Long or hostile answers: unbalanced braces, braces in prose and strings, deep nesting
+ADVERSARIAL_RESPONSES = [
+    "{" * 20000 + '{"compliant": true}',
+    "Voir {article 5} et {article 6} " * 2000 + '{"issue": "Clause {abusive}", "suggestion": ""}',
+    '{"issue": "' + "\\\"}" * 5000 + '"}',
+    "[" * 5000 + "]" * 4999 + ' {"compliant": true}',
+    "Analyse : " + "} ] " * 10000 + '```json\n{"compliant": true}\n```',
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def measure(fn: Callable[[Any], Any], items: Iterable[Any]) -> Dict[str, float]:
+    """Time fn(item) for every item."""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "count": count,
+        "total_s": total,
+        "ops_per_sec": count / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def build_engine(real_embeddings: bool, sections_count: int) -> retrieval_engine.RetrievalEngine:
+    if real_embeddings:
+        return retrieval_engine.get_engine()
+    engine = retrieval_engine.RetrievalEngine(backend="numpy")
+    engine._embeddings = FakeEmbeddings(dim=384)
+    engine._numpy_index = retrieval_engine.NumpyIndex.build(generate_sections(sections_count), engine._embeddings)
+    return engine
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    contracts = generate_corpus(args.contracts, clauses=args.clauses, seed=args.seed)
+    split = [split_contract_memory(text) for text in contracts]
+    clause_texts = [text for sections in split for _, text in Generation.select_clauses(sections)]
+
+    llm = FakeLLM(ClauseVerdicts(), latency=args.latency, jitter=args.latency / 4, error_rate=args.error_rate,
+                  seed=args.seed)
+    overrides = {
+        (retrieval_engine, "_engine"): build_engine(args.real_embeddings, args.sections),
+        (Generation, "llm"): llm,
+        (Generation, "SLEEP_BETWEEN_CALLS"): 0.0,
+        (Generation, "MAX_CONCURRENT_CALLS"): args.concurrency,
+        (Generation, "BATCH_SIZE"): args.batch_size,
+        (Generation, "verdict_cache"): None,
+    }
+    saved = {target: getattr(*target) for target in overrides}
+    for (module, name), value in overrides.items():
+        setattr(module, name, value)
+    try:
+        benchmarks = run_benchmarks(contracts, split, clause_texts)
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+    benchmarks["process_contract_workflow"]["llm_calls"] = llm.calls
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "params": vars(args).copy(),
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def run_benchmarks(contracts: List[str], split: List[List[Dict[str, Any]]],
+                   clause_texts: List[str]) -> Dict[str, Dict[str, float]]:
+    return {
+        "split_contract_memory": measure(split_contract_memory, contracts),
+        "is_personal_info_only": measure(Generation.is_personal_info_only, clause_texts),
+        "is_trivial_clause_text": measure(Generation.is_trivial_clause_text, clause_texts),
+        "extract_json_from_text": measure(Generation.extract_json_from_text, JSON_RESPONSES * 200),
+        "extract_json_adversarial": measure(Generation.extract_json_from_text, ADVERSARIAL_RESPONSES * 4),
+        "retrieve_sections_bulk": measure(
+            lambda sections: retrieve_sections_bulk(
+                [{"index": i, "text": s["section_text"]} for i, s in enumerate(sections)], k=3),
+            split,
+        ),
+        "process_contract_workflow": measure(process_contract_workflow, contracts),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+    header = f"{'benchmark':<28}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if previous:
+        header += f"{'ops/s Δ':>10}{'p95 Δ':>10}"
+    print(header)
+    for name, stats in results["benchmarks"].items():
+        line = (f"{name:<28}{stats['ops_per_sec']:>12.1f}{stats['p50_ms']:>10.3f}"
+                f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+        old = (previous or {}).get("benchmarks", {}).get(name)
+        if old:
+            line += f"{_change(old['ops_per_sec'], stats['ops_per_sec']):>10}{_change(old['p95_ms'], stats['p95_ms']):>10}"
+        print(line)
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--clauses", type=int, default=30, help="real clauses per contract")
+    parser.add_argument("--sections", type=int, default=300, help="labor code sections in the index")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake LLM latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake LLM calls that fail")
+    parser.add_argument("--concurrency", type=int, default=Generation.MAX_CONCURRENT_CALLS)
+    parser.add_argument("--batch-size", type=int, default=Generation.BATCH_SIZE)
+    parser.add_argument("--real-embeddings", action="store_true", help="use the real model and index")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    results = run(args)
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(results, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,105 @@
+"""
+Segmenter benchmark on multi-megabyte documents.
+
+    python -m benchmarks.segmenter
+    python -m benchmarks.segmenter --size-mb 8 --repeat 3
+
+Times the offset-based segmenter against the previous splitters (kept below
+as the reference the equivalence tests compare with) on a synthetic contract,
+a contract annex made of one very long section, and labor-code-like text.
+"""
+
+import argparse
+import re
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.segmenter import segment_contract, segment_labor_code
+
+from .run import measure
+from .synthetic import CONTINUATIONS, generate_contract, generate_sections
+
+
+def legacy_split_contract_memory(txt: str) -> List[Dict[str, Any]]:
+    """split_contract_memory before the segmenter."""
+    lines = [line.strip() for line in txt.splitlines() if line.strip()]
+    sections = []
+    for line in lines:
+        if ":" in line or line.isupper():
+            title = line if len(line.split()) <= 10 else "Clause"
+            sections.append({"section_title": title, "section_text": line})
+        else:
+            if sections:
+                sections[-1]["section_text"] += " " + line
+            else:
+                sections.append({"section_title": "Introduction", "section_text": line})
+    return sections
+
+
+def legacy_clean_body(text: str) -> str:
+    text = re.sub(r"[^\w\s.,;:!?()\-']", " ", text, flags=re.UNICODE)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def legacy_split_by_sections(text: str) -> List[Dict[str, str]]:
+    """app.splitter.split_by_sections before the segmenter."""
+    pattern = r"(?m)^(\d+\.\s+[A-ZÉÈÀÙÂÊÎÔÛÄËÏÖÜÇ'\- ]+)"
+    matches = list(re.finditer(pattern, text))
+    sections = []
+    for i, match in enumerate(matches):
+        start = match.start()
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append({"title": match.group(1).strip(), "text": legacy_clean_body(text[start:end].strip())})
+    return sections
+
+
+def contract_of_size(size: int, seed: int = 0) -> str:
+    """Synthetic contract of about `size` characters."""
+    clauses = max(1, size // 110)
+    return generate_contract(clauses=clauses, personal_blocks=2, headers=max(1, clauses // 20), seed=seed)
+
+
+def annex_of_size(size: int) -> str:
+    """One header followed by continuation lines only: a single section of about `size` characters."""
+    lines = ["ANNEXE"]
+    while sum(map(len, lines)) < size:
+        lines.extend(CONTINUATIONS)
+    return "\n".join(lines)
+
+
+def labor_code_of_size(size: int, seed: int = 0) -> str:
+    """Labor-code-like text (numbered titles, bodies with symbols) of about `size` characters."""
+    count = max(1, size // 420)
+    return "\n".join(f"{s['title']}\n{s['text']} ⚠ (voir annexe)\n" for s in generate_sections(count, seed=seed))
+
+
+def run_segmenter_benchmarks(size: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    inputs = {"contract": contract_of_size(size), "annex": annex_of_size(size)}
+    labor = labor_code_of_size(size)
+    cases: Dict[str, Callable[[Any], Any]] = {}
+    for name, text in inputs.items():
+        cases[f"{name} legacy"] = lambda _, text=text: legacy_split_contract_memory(text)
+        cases[f"{name} segments"] = lambda _, text=text: segment_contract(text)
+        cases[f"{name} segments+text"] = lambda _, text=text: segment_contract(text).to_list()
+    cases["labor legacy"] = lambda _: legacy_split_by_sections(labor)
+    cases["labor segments"] = lambda _: segment_labor_code(labor)
+    cases["labor segments+text"] = lambda _: [s.to_dict() for s in segment_labor_code(labor)]
+    return {name: measure(fn, range(repeat)) for name, fn in cases.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=4.0, help="approximate size of each input")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run_segmenter_benchmarks(int(args.size_mb * 1024 * 1024), args.repeat)
+    print(f"{'case':<24}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+"""
+Synthetic French CDI contracts for benchmarks.
+
+Contracts mix the three kinds of blocks the pipeline has to handle: personal
+information (filtered out by is_personal_info_only), upper-case headers
+(is_trivial_clause_text) and real clauses that go to the LLM.
+"""
+
+import random
+from typing import List, Optional
+
+HEADERS = [
+    "CONTRAT DE TRAVAIL A DUREE INDETERMINEE", "ENTRE LES SOUSSIGNES", "CONDITIONS GENERALES",
+    "REMUNERATION", "HORAIRES", "CONGES", "AVANTAGES", "CONDITIONS PARTICULIERES",
+]
+
+CLAUSE_TEMPLATES = [
+    "Article {n} : Le salarié est soumis à une période d'essai de {months} mois, renouvelable une fois par écrit.",
+    "Article {n} : La durée hebdomadaire de travail est fixée à {hours} heures réparties du lundi au samedi.",
+    "Article {n} : Le salarié percevra une rémunération mensuelle brute de {salary} dirhams payable en fin de mois.",
+    "Article {n} : Le salarié bénéficie d'un congé annuel payé de {days} jours ouvrables par année de service.",
+    "Article {n} : En cas de rupture, un préavis de {months} mois devra être respecté par la partie qui en prend l'initiative.",
+    "Article {n} : Le salarié s'interdit toute activité concurrente pendant {years} ans après la fin du contrat.",
+    "Article {n} : Les heures supplémentaires sont majorées de {percent} % conformément aux dispositions légales.",
+    "Article {n} : Le lieu de travail est fixé à {city}, toute mutation nécessitera l'accord écrit du salarié.",
+]
+
+CONTINUATIONS = [
+    "Cette disposition s'applique sans préjudice des dispositions plus favorables de la convention collective.",
+    "Toute modification fera l'objet d'un avenant signé par les deux parties.",
+]
+
+FIRST_NAMES = ["Youssef", "Fatima", "Omar", "Salma", "Karim", "Nadia"]
+LAST_NAMES = ["El Amrani", "Benali", "Tazi", "Alaoui", "Chraibi", "Idrissi"]
+CITIES = ["Casablanca", "Rabat", "Tanger", "Fès", "Marrakech", "Agadir"]
+
+
+def personal_block(rng: random.Random) -> List[str]:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    cin = f"{rng.choice('ABCDJK')}{rng.randint(100000, 999999)}"
+    phone = f"06 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}"
+    return [
+        f"Nom : {name} CIN : {cin} Tél : {phone} Email : {name.split()[0].lower()}@exemple.ma",
+        f"Nom : {name}",
+        f"CIN : {cin}",
+        f"Adresse : {rng.randint(1, 200)} rue {rng.choice(LAST_NAMES)}, {rng.choice(CITIES)}",
+        f"Téléphone : {phone}",
+        f"Email : {name.split()[0].lower()}@exemple.ma",
+    ]
+
+
+def generate_contract(clauses: int = 30, personal_blocks: int = 2, headers: int = 6,
+                      continuation_rate: float = 0.3, seed: Optional[int] = 0) -> str:
+    """A contract with the requested clause mix; the same seed gives the same text."""
+    rng = random.Random(seed)
+    lines: List[str] = [HEADERS[0]]
+    for _ in range(personal_blocks):
+        lines.append(rng.choice(HEADERS[1:3]))
+        lines.extend(personal_block(rng))
+
+    header_every = max(1, clauses // max(1, headers))
+    for n in range(1, clauses + 1):
+        if headers and (n - 1) % header_every == 0:
+            lines.append(rng.choice(HEADERS[3:]))
+        template = rng.choice(CLAUSE_TEMPLATES)
+        lines.append(template.format(
+            n=n, months=rng.randint(1, 12), hours=rng.choice([40, 44, 48, 52]),
+            salary=rng.randint(3000, 30000), days=rng.choice([12, 18, 24, 30]),
+            years=rng.randint(1, 5), percent=rng.choice([25, 50, 100]), city=rng.choice(CITIES),
+        ))
+        if rng.random() < continuation_rate:
+            lines.append(rng.choice(CONTINUATIONS))
+    return "\n".join(lines)
+
+
+def generate_corpus(count: int, clauses: int = 30, seed: int = 0, **kwargs) -> List[str]:
+    return [generate_contract(clauses=clauses, seed=seed + i, **kwargs) for i in range(count)]
+
+
+def generate_sections(count: int = 200, seed: int = 0) -> List[dict]:
+    """Labor-code-like sections for the retrieval index."""
+    rng = random.Random(seed)
+    topics = ["période d'essai", "durée du travail", "congé annuel", "préavis", "salaire minimum",
+              "heures supplémentaires", "licenciement", "non-concurrence", "maternité", "repos hebdomadaire"]
+    sections = []
+    for i in range(count):
+        topic = topics[i % len(topics)]
+        words = " ".join(rng.choice(["salarié", "employeur", "contrat", "durée", "jours", "mois", "article",
+                                     "indemnité", "délai", "travail"]) for _ in range(40))
+        sections.append({"title": f"{i + 1}. {topic.upper()}", "text": f"{topic} {words}"})
+    return sections
@@ -0,0 +1,101 @@
+# tests/test_analyze.py
+import sys
+import os
+import json
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.contract_review.analysis import Analyzer, AnalyzerBusy
+
+
+class SlowWorkflow:
+    """Stands in for process_contract_workflow; blocks until released so submissions overlap."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, text, on_event=None):
+        self.calls.append(text)
+        self.started.set()
+        on_event("split", {"sections_count": 1, "clauses_count": 1})
+        self.release.wait(5)
+        if "boom" in text:
+            raise ValueError("boom")
+        on_event("verdict", {"clause_index": 0, "compliant": True})
+        on_event("completed", {"status": "ok", "problematic_count": 0})
+        return {"status": "ok", "problematic_count": 0, "output": [], "text": text.strip()}
+
+
+@pytest.fixture
+def workflow(monkeypatch):
+    workflow = SlowWorkflow()
+    monkeypatch.setattr(main, "analyzer", Analyzer(workflow=workflow, workers=2, max_pending=3))
+    return workflow
+
+
+def documents(*texts):
+    return {"documents": [{"file_name": f"c{i}.pdf", "extracted_text": text} for i, text in enumerate(texts)]}
+
+
+def test_batch_results_in_order_with_identical_documents_coalesced(workflow):
+    workflow.release.set()
+    response = TestClient(main.app).post("/analyze", json=documents("Article 1 : A", "Article 2 : B",
+                                                                    "Article 1 :  A\n\n"))
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["result"]["text"] for r in results] == ["Article 1 : A", "Article 2 : B", "Article 1 : A"]
+    assert [r["coalesced"] for r in results] == [False, False, True]
+    assert sorted(workflow.calls) == ["Article 1 : A", "Article 2 : B"]
+
+
+def test_concurrent_submissions_share_one_review(workflow):
+    analyzer = main.analyzer
+    (first, coalesced_first), = analyzer.submit_batch(["Article 1 : A"])
+    assert workflow.started.wait(5)
+    events = []
+    (second, coalesced_second), = analyzer.submit_batch(["Article 1 : A"], [lambda t, d: events.append(t)])
+    assert (coalesced_first, coalesced_second) == (False, True)
+    assert second is first and events == ["split"]
+    workflow.release.set()
+    assert second.future.result(5)["status"] == "ok"
+    assert events == ["split", "verdict", "completed"]
+    assert workflow.calls == ["Article 1 : A"] and analyzer.in_flight() == 0
+
+
+def test_errors_and_limits(workflow):
+    client = TestClient(main.app)
+    workflow.release.set()
+    results = client.post("/analyze", json=documents("boom", "Article 1 : A")).json()["results"]
+    assert "ValueError" in results[0]["error"] and results[1]["result"]["status"] == "ok"
+
+    too_many = documents(*[f"Article {i} : A" for i in range(main.ANALYZE_MAX_DOCUMENTS + 1)])
+    assert client.post("/analyze", json=too_many).status_code == 413
+
+    workflow.release.clear()
+    with pytest.raises(AnalyzerBusy):
+        main.analyzer.submit_batch(["a", "b", "c", "d"])
+    assert main.analyzer.in_flight() == 0
+    main.analyzer.submit_batch(["a", "b", "c"])
+    response = client.post("/analyze", json=documents("d"))
+    assert response.status_code == 503 and response.headers["Retry-After"]
+    workflow.release.set()
+
+
+def test_streaming_emits_verdicts_then_results(workflow):
+    workflow.release.set()
+    response = TestClient(main.app).post("/analyze?stream=true", json=documents("Article 1 : A", "boom"))
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    first = [line["event"] for line in lines if line["document"] == 0]
+    assert first == ["split", "verdict", "completed", "result"]
+    assert lines[-1]["event"] == "result"
+    failed = [line for line in lines if line["document"] == 1 and line["event"] == "result"]
+    assert "ValueError" in failed[0]["error"]
@@ -0,0 +1,50 @@
+# tests/test_benchmarks.py
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation
+from app.services.contract_review.splitter_contract import split_contract_memory
+from benchmarks import run
+from benchmarks.fakes import ClauseVerdicts, FakeLLM
+from benchmarks.synthetic import generate_contract
+
+
+def test_synthetic_contract_mix():
+    text = generate_contract(clauses=12, personal_blocks=2, headers=3, seed=1)
+    assert text == generate_contract(clauses=12, personal_blocks=2, headers=3, seed=1)
+    sections = split_contract_memory(text)
+    assert len(Generation.select_clauses(sections)) == 12
+    assert any(Generation.is_personal_info_only(s["section_text"]) for s in sections
+               if s["section_title"] == "Clause")
+
+
+def test_fake_llm_is_deterministic_and_handles_batches():
+    prompt = Generation.build_prompt_batch_french([(3, "Clause A"), (4, "Clause B")])
+    answer = FakeLLM(ClauseVerdicts()).invoke([Generation.HumanMessage(content=prompt)]).content
+    assert [entry["index"] for entry in json.loads(answer)] == [3, 4]
+    single = Generation.build_prompt_minimal_french("Clause A", 3)
+    assert FakeLLM(ClauseVerdicts(), seed=1).invoke([Generation.HumanMessage(content=single)]).content == \
+        FakeLLM(ClauseVerdicts(), seed=2).invoke([Generation.HumanMessage(content=single)]).content
+
+
+def test_benchmark_run_writes_results(tmp_path):
+    llm_before = Generation.llm
+    output = tmp_path / "bench.json"
+    results = run.main(["--contracts", "2", "--clauses", "5", "--sections", "20", "--latency", "0",
+                        "--output", str(output)])
+
+    saved = json.loads(output.read_text())
+    assert saved["benchmarks"].keys() == results["benchmarks"].keys()
+    workflow = saved["benchmarks"]["process_contract_workflow"]
+    assert workflow["count"] == 2 and workflow["llm_calls"] == 10
+    assert {"ops_per_sec", "p50_ms", "p95_ms", "p99_ms"} <= set(workflow)
+    assert Generation.llm is llm_before
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert (run.percentile(values, 50), run.percentile(values, 95), run.percentile(values, 99)) == (50.0, 95.0, 99.0)
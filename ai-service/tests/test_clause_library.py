@@ -0,0 +1,87 @@
+# tests/test_clause_library.py
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation, generation_workflow
+from app.services.contract_review.clause_library import ClauseLibrary, create_library, mask_clause_text
+from benchmarks.fakes import FakeLLM
+
+TRIAL = ("Article 3 : M. Ahmed Benali, né le 12/03/1990, CIN AB12345, percevra un salaire mensuel "
+         "de 8 500 dirhams, avec une période d'essai de 3 mois.")
+TRIAL_OTHER_EMPLOYEE = ("Article 3 : Mme Sara El Idrissi, née le 1 janvier 1985, CIN CD998877, percevra un "
+                        "salaire mensuel de 12.000 dirhams, avec une période d'essai de 3 mois.")
+HOURS = "Article 4 : le salarié travaille 44 heures par semaine réparties sur six jours ouvrables."
+COMPLIANT = {"compliant": True}
+
+
+def test_masking_hides_what_varies_but_keeps_durations():
+    masked = mask_clause_text(TRIAL)
+    assert "benali" not in masked and "8 500" not in masked and "1990" not in masked
+    assert "<nom>" in masked and "<date>" in masked and "<id>" in masked
+    assert "3 mois" in masked
+
+
+def test_near_duplicate_inherits_verdict():
+    library = ClauseLibrary()
+    library.add(TRIAL, COMPLIANT)
+
+    verdict, similarity = library.lookup(TRIAL_OTHER_EMPLOYEE)
+    assert verdict == COMPLIANT
+    assert 0.8 <= similarity < 1.0
+    assert library.lookup(HOURS) is None
+    assert library.stats() == {"entries": 1, "lookups": 2, "hits": 1, "hit_rate": 0.5}
+
+
+def test_changed_duration_is_not_a_match():
+    library = ClauseLibrary()
+    library.add(TRIAL, COMPLIANT)
+    assert library.lookup(TRIAL_OTHER_EMPLOYEE.replace("3 mois", "12 mois")) is None
+
+
+def test_oldest_entries_are_evicted():
+    library = ClauseLibrary(max_entries=2)
+    library.add(TRIAL, COMPLIANT)
+    library.add(HOURS, COMPLIANT)
+    library.add("Article 5 : le préavis est de 8 jours.", {"issue": "Préavis trop court", "suggestion": ""})
+    assert len(library) == 2
+    assert library.lookup(TRIAL) is None
+    assert library.lookup(HOURS)[0] == COMPLIANT
+
+
+def test_seed_file(tmp_path):
+    seed = tmp_path / "clause_library.json"
+    seed.write_text(json.dumps([
+        {"text": TRIAL, "compliant": True},
+        {"text": HOURS, "issue": "Durée hebdomadaire supérieure à 44 heures", "suggestion": ""},
+        {"text": "entrée sans verdict"},
+    ]), encoding="utf-8")
+    library = create_library(enabled=True, seed_path=str(seed))
+    assert len(library) == 2
+    assert create_library(enabled=False, seed_path=str(seed)) is None
+
+
+def test_workflow_short_circuits_near_duplicates(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    library = ClauseLibrary()
+
+    first = FakeLLM(lambda prompt: '{"compliant": true}')
+    monkeypatch.setattr(Generation, "llm", first)
+    result = generation_workflow.process_contract_workflow("\n".join([TRIAL, HOURS]), library=library)
+    assert first.calls == 2
+    assert result["short_circuited"] == 0
+
+    second = FakeLLM(lambda prompt: '{"compliant": true}')
+    monkeypatch.setattr(Generation, "llm", second)
+    events = []
+    result = generation_workflow.process_contract_workflow(
+        "\n".join([TRIAL_OTHER_EMPLOYEE, HOURS.replace("44 heures", "48 heures")]),
+        library=library, on_event=lambda kind, data: events.append((kind, data)),
+    )
+    assert second.calls == 1
+    assert result["short_circuited"] == 1
+    assert [data["clause_index"] for kind, data in events if kind == "verdict"] == [0, 1]
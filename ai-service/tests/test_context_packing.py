@@ -0,0 +1,132 @@
+# tests/test_context_packing.py
+import sys
+import os
+import re
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation, generation_workflow
+from app.services.contract_review.context_packing import (
+    CHARS_PER_TOKEN, CONTEXT_MAX_TOKENS, estimate_tokens, pack_context, relevant_sentences, words,
+)
+from app.services.contract_review.verdict_cache import MemoryBackend, VerdictCache
+from benchmarks.fakes import FakeLLM
+
+PRESAVIS = {
+    "title": "Article 43",
+    "text": "Le contrat à durée indéterminée peut cesser par la volonté d'une des parties. "
+            "La rupture est subordonnée à un délai de préavis. "
+            "Le délai de préavis est fixé par voie réglementaire. "
+            "Les parties peuvent prévoir un délai plus favorable au salarié.",
+}
+ESSAI = {
+    "title": "Article 14",
+    "text": "La période d'essai est fixée à trois mois pour les cadres. "
+            "Elle est d'un mois et demi pour les employés. "
+            "La période d'essai ne peut être renouvelée qu'une fois.",
+}
+
+
+def long_section(n):
+    return {
+        "title": f"Article {n}",
+        "text": " ".join(f"Phrase {i} de l'article {n} sur le salaire, le préavis et les congés payés du salarié."
+                         for i in range(400)),
+    }
+
+
+def test_keeps_the_most_relevant_sentences_in_order():
+    excerpt = relevant_sentences(PRESAVIS["text"], words("Le délai de préavis est de huit jours."), 30)
+    assert excerpt == ("La rupture est subordonnée à un délai de préavis. "
+                       "Le délai de préavis est fixé par voie réglementaire.")
+    assert estimate_tokens(excerpt) <= 30
+    assert len(relevant_sentences("Une seule phrase " * 100, set(), 20)) <= 20 * CHARS_PER_TOKEN
+
+
+def test_shared_sections_are_written_once_and_referenced():
+    items = [(1, "Le délai de préavis est de huit jours."), (2, "La période d'essai est de six mois."),
+             (3, "Aucun préavis n'est dû.")]
+    matches = {1: [PRESAVIS], 2: [ESSAI, PRESAVIS], 3: [PRESAVIS]}
+    packed = pack_context(items, matches)
+    assert [label for label, _, _ in packed.excerpts] == ["L1", "L2"]
+    assert packed.refs == {1: ["L1"], 2: ["L1", "L2"], 3: ["L1"]}
+
+    prompt = Generation.build_prompt_batch_french(items, packed)
+    assert prompt.count("Article 43") == 1 and prompt.count("Article 14") == 1
+    assert "\"\"\"Le délai de préavis est de huit jours.\"\"\"\nRéférences : L1" in prompt
+    assert re.findall(r"CLAUSE \(index (\d+)\):", prompt) == ["1", "2", "3"]
+    assert Generation.build_prompt_batch_french(items, pack_context(items, {})) == \
+        Generation.build_prompt_batch_french(items)
+
+
+def test_prompts_stay_under_budget_for_large_inputs():
+    items = [(i, f"Clause {i} : le salarié renonce à son préavis et à ses congés payés.") for i in range(40)]
+    matches = {i: [long_section(i), long_section(i + 1), long_section(i % 3)] for i, _ in items}
+    base = len(Generation.build_prompt_batch_french(items))
+    header = len(Generation.context_block(pack_context(items[:1], matches))) - \
+        len(pack_context(items[:1], matches).block())
+
+    for max_tokens in (50, 300, CONTEXT_MAX_TOKENS):
+        packed = pack_context(items, matches, tokens_per_clause=200, max_tokens=max_tokens)
+        assert 0 < packed.tokens() <= max_tokens
+        assert len({text for _, _, text in packed.excerpts}) == len(packed.excerpts)
+        prompt = Generation.build_prompt_batch_french(items, packed)
+        refs = sum(len(Generation.references_line(packed, i)) for i, _ in items)
+        assert len(prompt) <= base + header + refs + max_tokens * CHARS_PER_TOKEN
+
+    single = pack_context(items[:1], matches, tokens_per_clause=200)
+    assert 0 < single.tokens() <= 200
+    assert all(estimate_tokens(f"[{label}] {title} : {text}") <= 200 // 3
+               for label, title, text in single.excerpts)
+
+
+def test_workflow_sends_the_retrieved_sections(monkeypatch):
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        return '{"compliant": true}'
+
+    def retrieve(clauses, k):
+        assert k == generation_workflow.CONTEXT_TOP_K
+        return [{"index": clause["index"], "sections": [PRESAVIS]} for clause in clauses]
+
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(Generation, "llm", FakeLLM(answer))
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", retrieve)
+    contract = "Article 1 : le délai de préavis est de huit jours ouvrables pour le salarié."
+    result = generation_workflow.process_contract_workflow(contract, library=None, triage=None)
+    assert result["status"] == "ok"
+    assert prompts and "[L1] Article 43 : " in prompts[0] and "Références : L1" in prompts[0]
+
+
+def test_generate_issues_memory_takes_either_retrieval_shape(monkeypatch):
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        return '{"compliant": true}'
+
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    clauses = [
+        {"section_title": "Clause", "section_text": "Le délai de préavis est de huit jours ouvrables pour le salarié."},
+        {"section_title": "Clause", "section_text": "La période d'essai du salarié est fixée à six mois renouvelables."},
+    ]
+    bulk = [{"index": 0, "sections": [PRESAVIS]}, {"index": 1, "sections": [ESSAI]}]
+    Generation.generate_issues_memory(clauses, bulk, client=FakeLLM(answer), cache=None, batch_size=1)
+    from_bulk = sorted(prompts)
+    prompts.clear()
+    # retrieve_sections_memory: the contract's sections, without the clause they matched
+    Generation.generate_issues_memory(clauses, [ESSAI, PRESAVIS], client=FakeLLM(answer), cache=None,
+                                      batch_size=1)
+    assert sorted(prompts) == from_bulk
+    assert any("Article 43" in p and "préavis est de huit" in p for p in prompts)
+
+
+def test_verdicts_without_context_keep_the_default_cache_key(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    cache = VerdictCache(MemoryBackend(), "model", "v1")
+    clauses = [{"section_title": "Clause", "section_text": "Le délai de préavis est de huit jours ouvrables pour le salarié."}]
+    Generation.generate_issues_memory(clauses, [], client=FakeLLM(), cache=cache)
+    assert cache.get(clauses[0]["section_text"]) == {"compliant": True}
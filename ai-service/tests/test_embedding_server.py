@@ -0,0 +1,115 @@
+# tests/test_embedding_server.py
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+import pytest
+
+from app.services import retrieval_engine
+from app.services.embedding_server import EmbeddingClient, MicroBatcher, create_server
+from benchmarks import embeddings as embeddings_benchmark
+from benchmarks.fakes import FakeEmbeddings
+
+
+class CountingEncoder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.fake = FakeEmbeddings()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if "fail" in texts:
+            raise ValueError("encoder failed")
+        return self.fake.embed_documents(texts)
+
+
+def test_concurrent_requests_are_merged_into_batches():
+    encoder = CountingEncoder(delay=0.02)
+    batcher = MicroBatcher(encoder, max_batch=8, max_wait=0.05)
+    texts = [[f"clause {i}", "clause commune"] for i in range(12)]
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        vectors = list(pool.map(batcher.encode, texts))
+    batcher.stop()
+
+    expected = FakeEmbeddings()
+    for request, rows in zip(texts, vectors):
+        assert np.allclose(rows, expected.embed_documents(request))
+    assert len(encoder.batches) < len(texts)
+    assert all(len(batch) <= 8 for batch in encoder.batches)
+    assert all(len(set(batch)) == len(batch) for batch in encoder.batches)  # shared text encoded once
+    assert batcher.stats()["requests"] == 12
+
+
+def test_encoder_errors_reach_every_request_of_the_batch():
+    batcher = MicroBatcher(CountingEncoder(), max_batch=8, max_wait=0.05)
+    futures = [batcher.submit(["fail"]), batcher.submit(["ok"])]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(5)
+    assert batcher.encode(["ok"]).shape == (1, FakeEmbeddings.dim)
+    batcher.stop()
+
+
+@pytest.mark.parametrize("transport", ["unix", "http"])
+def test_client_round_trip(tmp_path, transport):
+    batcher = MicroBatcher(CountingEncoder(), max_batch=16, max_wait=0.001)
+    socket_path = str(tmp_path / "embed.sock") if transport == "unix" else None
+    server = create_server(batcher, "all-MiniLM-L6-v2", socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"unix://{socket_path}" if socket_path else f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        client = EmbeddingClient(url, model_name="all-MiniLM-L6-v2")
+        expected = FakeEmbeddings().embed_documents(["a b", "c"])
+        assert np.allclose(client.embed_documents(["a b", "c"]), expected)
+        assert np.allclose(client.embed_query("c"), expected[1])
+        assert client.embed_documents([]) == []
+        with pytest.raises(RuntimeError):
+            EmbeddingClient(url, model_name="another-model").embed_query("c")
+        with pytest.raises(RuntimeError):
+            client.embed_documents(["fail"])
+        assert np.allclose(client.embed_query("c"), expected[1])  # connection still usable
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.stop()
+
+
+def test_client_does_not_resend_requests_that_timed_out(tmp_path):
+    encoder = CountingEncoder(delay=0.3)
+    batcher = MicroBatcher(encoder, max_batch=16, max_wait=0.001)
+    socket_path = str(tmp_path / "embed.sock")
+    server = create_server(batcher, "all-MiniLM-L6-v2", socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = EmbeddingClient(f"unix://{socket_path}", model_name="all-MiniLM-L6-v2", timeout=0.1)
+        with pytest.raises(TimeoutError):
+            client.embed_query("une clause longue à encoder")
+        time.sleep(0.4)
+        assert encoder.batches == [["une clause longue à encoder"]]
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.stop()
+
+def test_engine_uses_the_server_instead_of_loading_the_model(monkeypatch):
+    def no_model(**kwargs):
+        raise AssertionError("model must not be loaded")
+
+    monkeypatch.setattr(retrieval_engine, "SentenceTransformerEmbeddings", no_model)
+    engine = retrieval_engine.RetrievalEngine(embedding_server="unix:///tmp/none.sock")
+    assert isinstance(engine.embeddings, EmbeddingClient)
+    with pytest.raises(ValueError):
+        retrieval_engine.RetrievalEngine(embedding_server="tcp://localhost:1").embeddings
+
+
+def test_embedding_benchmark_runs():
+    results = embeddings_benchmark.main(["--clients", "3", "--requests", "3", "--texts", "2"])
+    assert set(results) == {"direct", "server x1", "server"}
+    assert results["server"]["texts_per_batch"] >= 2
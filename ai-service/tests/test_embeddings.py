@@ -0,0 +1,44 @@
+# tests/test_embeddings.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.embeddings import build_index_incremental, load_manifest, save_manifest
+from benchmarks.fakes import FakeVectorStore
+
+
+def _sections(n):
+    return [{"title": f"{i}. SECTION", "text": f"texte de la section {i}"} for i in range(1, n + 1)]
+
+
+def test_incremental_build_only_embeds_changes(tmp_path):
+    store = FakeVectorStore()
+    manifest = {}
+    sections = _sections(5)
+
+    first = build_index_incremental(sections, store, manifest, batch_size=2)
+    assert first == {"added": 5, "updated": 0, "removed": 0, "unchanged": 0}
+    assert store.add_calls == 3
+    assert len(store.docs) == 5
+
+    save_manifest(manifest, str(tmp_path / "manifest.json"))
+    manifest = load_manifest(str(tmp_path / "manifest.json"))
+    store.add_calls = 0
+    assert build_index_incremental(sections, store, manifest) == {
+        "added": 0, "updated": 0, "removed": 0, "unchanged": 5}
+    assert store.add_calls == 0
+
+    edited = sections[:4] + [{"title": "6. SECTION", "text": "nouvelle section"}]
+    edited[1] = {"title": "2. SECTION", "text": "texte modifié"}
+    assert build_index_incremental(edited, store, manifest) == {
+        "added": 1, "updated": 1, "removed": 1, "unchanged": 3}
+    assert sorted(text for text, _ in store.docs.values()) == sorted(s["text"] for s in edited)
+    assert sorted(manifest.values()) == sorted(store.docs)
+
+
+def test_repeated_titles_are_kept_apart():
+    store = FakeVectorStore()
+    sections = [{"title": "1. DISPOSITIONS", "text": "a"}, {"title": "1. DISPOSITIONS", "text": "a"}]
+    assert build_index_incremental(sections, store, {})["added"] == 2
+    assert len(store.docs) == 2
@@ -0,0 +1,79 @@
+# tests/test_events.py
+import sys
+import os
+import json
+import re
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation, generation_workflow
+from app.services.contract_review.events import ContractEventPublisher, read_events
+from benchmarks.fakes import FakeLLM, FakeRedis
+
+CONTRACT = "\n".join(
+    ["CONTRAT DE TRAVAIL A DUREE INDETERMINEE"]
+    + [f"Article {i} : le salarié accepte une clause numéro {i} qui dépasse les limites prévues par la loi."
+       for i in range(8)]
+)
+
+
+def _flag_first(prompt):
+    idx = int(re.search(r"CLAUSE \(index (\d+)\)", prompt).group(1))
+    if idx == 1:
+        return '{"issue": "Clause abusive", "suggestion": "Supprimer"}'
+    return '{"compliant": true}'
+
+
+def test_workflow_streams_events_before_completion(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(Generation, "llm", FakeLLM(_flag_first, latency=0.05))
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+
+    store = FakeRedis()
+    publisher = ContractEventPublisher(store, "c1")
+    seen = []
+
+    def on_event(event_type, data):
+        seen.append((time.perf_counter(), event_type, data))
+        publisher(event_type, data)
+
+    start = time.perf_counter()
+    publisher("accepted", {"fileName": "c1.pdf"})
+    result = generation_workflow.process_contract_workflow(CONTRACT, on_event=on_event)
+    total = time.perf_counter() - start
+
+    first_issue = next(t for t, kind, data in seen if kind == "verdict" and data["compliant"] is False)
+    assert first_issue - start < total / 3
+
+    events = read_events(store, "c1")
+    assert [e["seq"] for e in events] == list(range(1, 12))
+    assert [e["type"] for e in events] == ["accepted", "split"] + ["verdict"] * 8 + ["completed"]
+    assert events[-1]["problematic_count"] == result["problematic_count"] == 1
+    assert [e["seq"] for e in read_events(store, "c1", after_seq=9)] == [10, 11]
+
+    channels = {channel for channel, _ in store.published}
+    assert channels == {"contract_events"}
+    assert json.loads(store.published[2][1])["clause_index"] == 1
+    assert set(result) == {"status", "problematic_count", "output"}
+
+
+def test_each_event_is_one_script_call():
+    store = FakeRedis()
+    calls = []
+    register = store.register_script
+
+    def counting(script):
+        run = register(script)
+        return lambda keys=(), args=(): calls.append(keys) or run(keys, args)
+
+    store.register_script = counting
+    publisher = ContractEventPublisher(store, "c2")
+    first = publisher.emit("split", {"sections_count": 3, "note": "clause « abusive »"})
+    second = publisher.emit("completed", {"status": "ok"})
+
+    assert calls == [["contract_events:c2", "contract_events:c2:seq"]] * 2
+    assert [json.loads(payload) for _, payload in store.published] == [first, second]
+    assert [first["seq"], second["seq"]] == [1, 2] and first["note"] == "clause « abusive »"
+    assert read_events(store, "c2", after_seq=1) == [second]
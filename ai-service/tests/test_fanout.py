@@ -0,0 +1,208 @@
+# tests/test_fanout.py
+import sys
+import os
+import random
+import json
+import re
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import worker
+from app.services.contract_review import Generation, fanout, generation_workflow
+from app.services.contract_review.clause_library import ClauseLibrary
+from app.services.contract_review.result_store import ResultStore
+from app.services.contract_review.revisions import RevisionStore
+from benchmarks.fakes import FakeLLM, FakeRedis
+
+
+def _sections(n):
+    return [{"section_title": "Clause",
+             "section_text": f"Article {i} : le salarié accepte une mutation sans préavis vers le site numéro {i}."}
+            for i in range(n)]
+
+
+def _flag_multiples_of_three(prompt):
+    idx = int(re.search(r"CLAUSE \(index (\d+)\)", prompt).group(1))
+    if idx % 3 == 0:
+        return '{"issue": "Mutation sans préavis", "suggestion": "Prévoir un délai"}'
+    return '{"compliant": true}'
+
+
+def _no_retrieval(monkeypatch):
+    monkeypatch.setattr(fanout, "retrieve_sections_bulk", lambda clauses, k: [])
+
+
+def _start(store, contract_id, sections, **kwargs):
+    published = []
+    parts = fanout.start_fanout(contract_id, Generation.select_clauses(sections), store, published.append,
+                                **kwargs)
+    return parts, published
+
+
+def test_subjobs_in_any_order_assemble_the_same_result(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    _no_retrieval(monkeypatch)
+    sections = _sections(23)
+    expected = Generation.generate_issues_memory(sections, [], client=FakeLLM(_flag_multiples_of_three))
+
+    store, completed = FakeRedis(), []
+    parts, published = _start(store, "c1", sections, batch_size=5)
+    assert parts == len(published) == 5
+
+    random.Random(3).shuffle(published)
+    client = FakeLLM(_flag_multiples_of_three)
+    results = [fanout.run_subjob(m, store, lambda cid, res, review: completed.append((cid, res)), client=client)
+               for m in published]
+
+    assert results[:-1] == [None] * 4
+    assert completed == [("c1", {"status": "ok", "problematic_count": len(expected), "output": expected})]
+    assert fanout.expire_overdue(store, lambda *args: completed.append(args), now=float("inf")) == []
+    assert store.hgetall("fanout:c1:parts") == {}
+
+
+def test_failed_part_gives_partial_result(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    _no_retrieval(monkeypatch)
+    store, completed = FakeRedis(), []
+    _, published = _start(store, "c2", _sections(6), batch_size=3)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    fanout.run_subjob(published[0], store, lambda cid, res, review: completed.append(res),
+                      client=FakeLLM(_flag_multiples_of_three))
+    monkeypatch.setattr(fanout, "evaluate_clauses", broken)
+    fanout.run_subjob(published[1], store, lambda cid, res, review: completed.append(res))
+
+    result, = completed
+    assert result["status"] == "partial"
+    assert (result["failed_parts"], result["total_parts"]) == (1, 2)
+    assert [item["clause_index"] for item in result["output"]] == [0]
+
+
+def test_overdue_contract_is_assembled_and_late_parts_dropped(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    _no_retrieval(monkeypatch)
+    store, completed = FakeRedis(), []
+    _, published = _start(store, "c3", _sections(6), batch_size=2, timeout=60)
+    on_complete = lambda cid, res, review: completed.append(res)
+
+    fanout.run_subjob(published[0], store, on_complete, client=FakeLLM(_flag_multiples_of_three))
+    assert fanout.expire_overdue(store, on_complete) == []
+    assert fanout.expire_overdue(store, on_complete, now=float("inf")) == ["c3"]
+
+    late = FakeLLM(_flag_multiples_of_three)
+    assert fanout.run_subjob(published[1], store, on_complete, client=late) is None
+    assert late.calls == 0
+    result, = completed
+    assert result["status"] == "partial"
+    assert result["failed_parts"] == 2
+
+
+def test_small_contracts_are_not_fanned_out():
+    assert not fanout.should_fan_out(_sections(3), min_clauses=0)
+    assert not fanout.should_fan_out(_sections(3), min_clauses=4)
+    assert fanout.should_fan_out(_sections(4), min_clauses=4)
+
+
+def test_clauses_without_verdict_make_the_result_partial(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    _no_retrieval(monkeypatch)
+    store, completed = FakeRedis(), []
+    _, published = _start(store, "c4", _sections(6), batch_size=3)
+    unusable = FakeLLM(lambda prompt: "Je ne sais pas.")
+    for message in published:
+        fanout.run_subjob(message, store, lambda cid, res, review: completed.append(res), client=unusable)
+
+    (result,) = completed
+    assert result["status"] == "partial" and result["unevaluated"] == 6
+    assert "failed_parts" not in result
+
+
+def test_subjobs_ground_their_clauses_in_the_labor_code(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    section = {"title": "Article 43", "text": "La mutation du salarié est subordonnée à un délai de préavis."}
+    monkeypatch.setattr(fanout, "retrieve_sections_bulk",
+                        lambda clauses, k: [{"index": c["index"], "sections": [section]} for c in clauses])
+    store, completed = FakeRedis(), []
+    _, published = _start(store, "c5", _sections(4), batch_size=2)
+    prompts = []
+    client = FakeLLM(lambda prompt: prompts.append(prompt) or _flag_multiples_of_three(prompt))
+    for message in published:
+        fanout.run_subjob(message, store, lambda cid, res, review: completed.append(res), client=client)
+
+    assert completed and completed[0]["status"] == "ok"
+    assert prompts and all("[L1] Article 43 : " in prompt for prompt in prompts)
+
+
+ARTICLES = [
+    "Article 1 : la période d'essai est fixée à douze mois renouvelable deux fois sans motif.",
+    "Article 2 : le salarié travaille quarante-quatre heures par semaine réparties sur six jours.",
+    "Article 3 : aucun congé annuel payé ne sera accordé pendant la première année du contrat.",
+    "Article 4 : le préavis de démission est fixé à huit jours quelle que soit l'ancienneté.",
+    "Article 5 : le salarié s'interdit toute activité concurrente pendant dix ans sur le territoire.",
+    "Article 6 : les frais de déplacement professionnels restent entièrement à la charge du salarié.",
+    "Article 7 : toute absence pour maladie entraîne la rupture immédiate du contrat sans indemnité.",
+    "Article 8 : la rémunération mensuelle brute est versée par virement avant le cinq du mois.",
+]
+NEW_ARTICLES = [
+    "Article 9 : le salarié peut être muté sans préavis dans n'importe quelle filiale étrangère.",
+    "Article 10 : les heures supplémentaires ne donnent lieu à aucune majoration de salaire.",
+    "Article 11 : l'employeur peut consulter la messagerie personnelle du salarié à tout moment.",
+    "Article 12 : une prime d'ancienneté est versée chaque année au mois de janvier.",
+]
+
+OTHER_ARTICLES = [
+    "Article 13 : le salarié bénéficie d'une mutuelle prise en charge à moitié par l'employeur.",
+    "Article 14 : le lieu de travail est fixé au siège social de la société à Casablanca.",
+    "Article 15 : le salarié suit une formation de sécurité obligatoire lors de son embauche.",
+    "Article 16 : les congés sont posés en accord avec le responsable hiérarchique du service.",
+]
+
+
+def test_fanned_out_contracts_reuse_revisions_and_the_clause_library(monkeypatch):
+    client, subjobs, results = FakeRedis(), [], []
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    _no_retrieval(monkeypatch)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    monkeypatch.setattr(generation_workflow, "clause_library", ClauseLibrary())
+    monkeypatch.setattr(generation_workflow, "triage_model", None)
+    monkeypatch.setattr(fanout, "FANOUT_MIN_CLAUSES", 4)
+    monkeypatch.setattr(worker, "r", client)
+    monkeypatch.setattr(worker, "result_store", ResultStore(client, dedup=False))
+    monkeypatch.setattr(worker, "revision_store", RevisionStore(client))
+    monkeypatch.setattr(worker, "publish_subjob", subjobs.append)
+    monkeypatch.setattr(worker, "publish_result", lambda cid, result, **kwargs: results.append((cid, result)))
+
+    def review(contract_id, articles, lineage=None):
+        llm = FakeLLM(lambda prompt: '{"issue": "Clause abusive", "suggestion": "Supprimer"}'
+                      if "dix ans" in prompt or "messagerie" in prompt else '{"compliant": true}')
+        monkeypatch.setattr(Generation, "llm", llm)
+        subjobs.clear()
+        worker.handle_contract(json.dumps({"id": contract_id, "fileName": "cdi.pdf", "lineageId": lineage,
+                                           "extractedText": "\n".join(["CONTRAT DE TRAVAIL"] + articles)}))
+        fanned_out = len(subjobs)
+        for subjob in list(subjobs):
+            worker.handle_subjob(json.dumps(subjob))
+        (done_id, result), = results[-1:]
+        assert done_id == contract_id
+        return result, llm.calls, fanned_out
+
+    first, calls, parts = review("c1", ARTICLES, lineage="emp-42")
+    assert parts and calls == 8
+    assert first["revision"] == {"reused": 0, "reevaluated": 8} and first["short_circuited"] == 0
+    assert [item["clause_index"] for item in first["output"]] == [5]
+
+    # same lineage, half the articles replaced: only the new ones reach the sub-jobs
+    edited = ARTICLES[:4] + NEW_ARTICLES
+    second, calls, parts = review("c2", edited, lineage="emp-42")
+    assert parts and calls == 4
+    assert second["revision"] == {"reused": 4, "reevaluated": 4}
+    assert [item["clause_index"] for item in second["output"]] == [7]
+
+    # another contract sharing the first one's clauses: the library settles them
+    third, calls, parts = review("c3", ARTICLES + OTHER_ARTICLES)
+    assert parts and calls == 4
+    assert third["short_circuited"] == 8 and "revision" not in third
+    assert [item["clause_index"] for item in third["output"]] == [5]
@@ -0,0 +1,94 @@
+# tests/test_generation.py
+import sys
+import os
+import json
+import re
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation
+from benchmarks.fakes import FakeLLM
+
+
+def _clauses(n):
+    return [
+        {"section_title": "Clause",
+         "section_text": f"Article {i} : le salarié effectue une période d'essai de {i} mois renouvelable sans limite."}
+        for i in range(n)
+    ]
+
+
+def _flag_even(prompt):
+    idx = int(re.search(r"CLAUSE \(index (\d+)\)", prompt).group(1))
+    if idx % 2 == 0:
+        return '{"issue": "Période d\'essai trop longue", "suggestion": "Réduire la durée"}'
+    return '{"compliant": true}'
+
+
+def test_concurrent_generation_keeps_order_and_is_faster(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    clauses = _clauses(12)
+
+    start = time.perf_counter()
+    sequential = Generation.generate_issues_memory(clauses, [], max_concurrency=1,
+                                                   client=FakeLLM(_flag_even, latency=0.05))
+    sequential_time = time.perf_counter() - start
+
+    fake = FakeLLM(_flag_even, latency=0.05)
+    start = time.perf_counter()
+    concurrent = Generation.generate_issues_memory(clauses, [], max_concurrency=6, client=fake)
+    concurrent_time = time.perf_counter() - start
+
+    assert concurrent == sequential
+    assert [p["clause_index"] for p in concurrent] == [0, 2, 4, 6, 8, 10]
+    assert fake.calls == 12
+    assert fake.max_in_flight <= 6
+    assert concurrent_time < sequential_time / 2
+
+
+def test_batched_prompts_fall_back_per_clause(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    clauses = _clauses(10)
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        indices = [int(i) for i in re.findall(r"CLAUSE \(index (\d+)\)", prompt)]
+        if len(indices) == 1:
+            return _flag_even(prompt)
+        # drop clause 3 and garble clause 4; the rest answered properly
+        entries = []
+        for i in indices:
+            if i == 3:
+                continue
+            if i == 4:
+                entries.append({"index": i, "verdict": "?"})
+            elif i % 2 == 0:
+                entries.append({"index": i, "issue": "Période d'essai trop longue", "suggestion": "Réduire la durée"})
+            else:
+                entries.append({"index": i, "compliant": True})
+        return "Voici le résultat:\n" + json.dumps(entries, ensure_ascii=False)
+
+    fake = FakeLLM(responder)
+    batched = Generation.generate_issues_memory(clauses, [], client=fake, batch_size=5)
+    expected = Generation.generate_issues_memory(clauses, [], client=FakeLLM(_flag_even), batch_size=1)
+
+    assert batched == expected
+    # two batches of five, then clauses 3 and 4 re-asked on their own
+    assert fake.calls == 4
+    singles = [p for p in prompts if len(re.findall(r"CLAUSE \(index", p)) == 1]
+    assert sorted(re.search(r"index (\d+)", p).group(1) for p in singles) == ["3", "4"]
+
+
+def test_make_batches_respects_size_and_char_budget():
+    items = [(i, "x" * 100) for i in range(7)]
+    assert [len(b) for b in Generation.make_batches(items, 3, char_budget=10_000)] == [3, 3, 1]
+    assert [len(b) for b in Generation.make_batches(items, 10, char_budget=250)] == [2, 2, 2, 1]
+
+
+def test_extract_json_array_from_text():
+    assert Generation.extract_json_array_from_text('```json\n[{"index": 1, "compliant": true}]\n```') == [
+        {"index": 1, "compliant": True}]
+    assert Generation.extract_json_array_from_text('{"compliant": true}') is None
@@ -0,0 +1,66 @@
+# tests/test_loadtest.py
+import sys
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import worker
+from benchmarks import loadtest
+from benchmarks.fakes import FakeChannel, FakeConnection, FakeMethod
+
+REPLAY = ["--workers", "2", "--prefetch", "2", "--latency", "0.005", "--sample-interval", "0.05",
+          "--timeout", "60"]
+
+
+def test_worker_records_messages_in_the_replay_format(tmp_path):
+    path = str(tmp_path / "recorded.jsonl")
+    messages = [{"id": f"c{i}", "fileName": f"c{i}.pdf", "extractedText": "Article 1 : texte", "header": ""}
+                for i in range(3)]
+    connection, channel = FakeConnection(), FakeChannel()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        consumer = worker.ContractConsumer(connection, channel, executor, handler=lambda body: None,
+                                           recorder=worker.MessageRecorder(path))
+        for i, message in enumerate(messages):
+            consumer.on_message(channel, FakeMethod(i), None, json.dumps(message).encode())
+
+    schedule = loadtest.load_messages(path)
+    assert [message for _, message in schedule] == messages
+    assert schedule[0][0] == 0.0 and all(offset >= 0 for offset, _ in schedule)
+
+
+def test_replay_reports_latency_throughput_and_queue_depth(tmp_path):
+    path = str(tmp_path / "load.jsonl")
+    loadtest.main(["record", "--synthetic", "8", "--rate", "50", "--clauses", "6", "--duplicates", "0.25",
+                   "--output", path])
+    report = loadtest.main(["replay", path, "--speed", "2", *REPLAY, "--output", str(tmp_path / "report.json")])
+
+    assert report["published"] == report["completed"] == 8
+    assert report["errors"] == 0 and report["statuses"] == {"ok": 8}
+    assert report["throughput_per_sec"] > 0
+    latency = report["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["max"]
+    assert len(report["timeline"]) >= 2 and report["timeline"][-1]["outstanding"] == 0
+    assert report["llm_calls"] > 0
+    with open(tmp_path / "report.json") as f:
+        assert json.load(f)["completed"] == 8
+
+
+def test_concurrency_mode_bounds_outstanding_contracts_and_counts_errors(tmp_path, monkeypatch):
+    path = str(tmp_path / "load.jsonl")
+    loadtest.record_synthetic(path, 7, rate=0, clauses=4)
+    handle_contract = worker.handle_contract
+
+    def failing_on_the_last(body):
+        if json.loads(body)["id"].endswith("synthetic-6"):
+            raise ValueError("bad contract")
+        return handle_contract(body)
+
+    monkeypatch.setattr(worker, "handle_contract", failing_on_the_last)
+
+    report = loadtest.main(["replay", path, "--concurrency", "2", *REPLAY])
+    assert report["completed"] == 6 and report["errors"] == 1 and report["timed_out"] == 0
+    assert all(sample["outstanding"] <= 2 for sample in report["timeline"])
+    assert "bad contract" in report["error_samples"][0]
@@ -0,0 +1,93 @@
+# tests/test_metrics.py
+import sys
+import os
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app import metrics
+from app.services.contract_review import Generation, generation_workflow
+from benchmarks.fakes import FakeLLM
+
+CONTRACT = "\n".join(
+    ["CONTRAT DE TRAVAIL"]
+    + [f"Article {i} : le salarié effectue des heures supplémentaires non rémunérées chaque semaine {i}."
+       for i in range(3)]
+)
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_workflow_records_stages_and_llm_calls(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(Generation.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    failures = iter([True])
+
+    def responder(prompt):
+        if next(failures, False):
+            raise RuntimeError("503")
+        return '{"compliant": true}'
+
+    monkeypatch.setattr(Generation, "llm", FakeLLM(responder))
+    before = {
+        "success": _sample("cdi_llm_calls_total", outcome="success"),
+        "retry": _sample("cdi_llm_calls_total", outcome="retry"),
+        "split": _sample("cdi_stage_duration_seconds_count", stage="split"),
+        "parse": _sample("cdi_stage_duration_seconds_count", stage="json_parse"),
+        "prompts": _sample("cdi_llm_prompt_chars_count"),
+    }
+
+    generation_workflow.process_contract_workflow(CONTRACT)
+
+    assert _sample("cdi_llm_calls_total", outcome="success") - before["success"] == 3
+    assert _sample("cdi_llm_calls_total", outcome="retry") - before["retry"] == 1
+    assert _sample("cdi_stage_duration_seconds_count", stage="split") - before["split"] == 1
+    assert _sample("cdi_stage_duration_seconds_count", stage="json_parse") - before["parse"] == 3
+    assert _sample("cdi_llm_prompt_chars_count") - before["prompts"] == 3
+
+    app = FastAPI()
+    app.include_router(metrics.router)
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert 'cdi_stage_duration_seconds_bucket{le="0.001",stage="prefilter"}' in response.text
+    assert "cdi_llm_response_chars_sum" in response.text
+
+
+CHILD_METRICS = """
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from prometheus_client import generate_latest
+sys.path.insert(0, ".")
+from app import metrics
+
+def record(n):
+    metrics.CONTRACTS.labels("ok").inc(n)
+    return n
+
+if __name__ == "__main__":
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        assert sum(pool.map(record, [1, 2, 3])) == 6
+    sys.stdout.write(generate_latest(metrics.export_registry()).decode())
+"""
+
+
+def test_process_executor_metrics_are_exported_in_multiprocess_mode(tmp_path):
+    script = tmp_path / "child_metrics.py"
+    script.write_text(CHILD_METRICS)
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path / "prom")}
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+    out = subprocess.run([sys.executable, str(script)], env=env, capture_output=True, text=True, timeout=120,
+                         cwd=os.path.dirname(os.path.dirname(__file__)), check=True).stdout
+    assert 'cdi_contracts_total{outcome="ok"} 6.0' in out
+
+    assert metrics.exporter_warning("process", port=9100, multiproc_dir="")
+    assert metrics.exporter_warning("process", port=9100, multiproc_dir=str(tmp_path)) is None
+    assert metrics.exporter_warning("thread", port=9100, multiproc_dir="") is None
@@ -0,0 +1,58 @@
+# tests/test_pdf_extraction.py
+import sys
+import os
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import fitz
+
+from app.services import pdf_extraction
+from app.services.contract_review import parse_contract
+from app.services.contract_review.splitter_contract import split_contract_memory
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   "legal-data", "articles_raw", "code_du_travail.pdf")
+
+
+def _words(text):
+    return text.replace("\ufe0f", "").split()
+
+
+def test_backends_agree_on_the_labor_code():
+    fast = pdf_extraction.extract_text(PDF, backend="pymupdf", workers=1)
+    slow = pdf_extraction.extract_text(PDF, backend="pdfplumber", workers=1)
+    assert "Article 6" in fast
+    assert _words(fast) == _words(slow)
+
+
+def test_iter_pages_is_lazy_and_pool_keeps_page_order():
+    pages = pdf_extraction.iter_pages(PDF, workers=1)
+    assert isinstance(pages, types.GeneratorType)
+    first = next(pages)
+    assert first.startswith("CODE DU TRAVAIL")
+
+    serial = list(pdf_extraction.iter_pages(PDF, workers=1, pages_per_task=2))
+    pooled = list(pdf_extraction.iter_pages(PDF, workers=2, pages_per_task=2))
+    assert pooled == serial
+    assert len(serial) == pdf_extraction.page_count(PDF)
+
+
+def test_failing_pages_fall_back_to_pdfplumber(monkeypatch):
+    get_text = fitz.Page.get_text
+
+    def flaky(page, *args, **kwargs):
+        if page.number == 1:
+            raise RuntimeError("broken content stream")
+        return get_text(page, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_text", flaky)
+    pages = pdf_extraction.extract_page_range(PDF, 0, 3, backend="pymupdf")
+    assert len(pages) == 3
+    assert pages[1] == pdf_extraction.extract_page_range(PDF, 1, 2, backend="pdfplumber")[0]
+
+
+def test_contract_pages_are_cleaned_and_split_while_streaming():
+    text = parse_contract.extract_text_from_pdf(PDF)
+    assert "⚠" not in text and "\n\n" not in text
+    assert parse_contract.split_contract_pdf(PDF) == split_contract_memory(text)
@@ -0,0 +1,64 @@
+# tests/test_profiling.py
+import sys
+import os
+import glob
+import json
+import pstats
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import worker
+from app.profiling import JobProfiler, requested
+from app.services.contract_review.result_store import ResultStore
+from benchmarks.fakes import FakeRedis
+
+
+def allocate_clauses():
+    return [f"Article {i} : le salarié perçoit une prime de {i} dirhams." * 5 for i in range(20000)]
+
+
+def test_messages_ask_for_profiling_at_the_top_or_in_the_header():
+    assert requested({"id": "c1", "profile": True})
+    assert requested({"id": "c1", "header": {"profile": "1"}})
+    assert not requested({"id": "c1", "header": "CONTRAT DE TRAVAIL profile"})
+    assert not requested({"id": "c1", "profile": False, "header": None})
+
+
+def test_one_job_in_every_n_is_sampled():
+    profiler = JobProfiler(every=4)
+    picks = [profiler.should_profile({"id": f"c{i}"}) for i in range(12)]
+    assert picks.count(True) == 3 and picks[3] and picks[7] and picks[11]
+    assert not any(JobProfiler(every=0).should_profile({"id": "c"}) for _ in range(10))
+
+
+def test_profile_writes_cpu_stats_and_allocation_diff(tmp_path):
+    profiler = JobProfiler(directory=str(tmp_path), top=10)
+    with profiler.profile("contract/42"):
+        kept = allocate_clauses()
+    assert not tracemalloc.is_tracing()
+    assert kept
+
+    prof, = glob.glob(str(tmp_path / "contract_42-*.prof"))
+    stats = pstats.Stats(prof)
+    assert any(name == "allocate_clauses" for _, _, name in stats.stats)
+    report = open(prof[:-len(".prof")] + ".txt", encoding="utf-8").read()
+    assert report.startswith("job contract/42\nwall_s: ")
+    assert "traced_growth_mb" in report and "top 10 allocation sites by growth" in report
+    assert "test_profiling.py" in report.split("allocation sites by growth")[1]
+
+
+def test_worker_profiles_flagged_contracts_only(tmp_path, monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(worker, "r", client)
+    monkeypatch.setattr(worker, "result_store", ResultStore(client, dedup=False))
+    monkeypatch.setattr(worker, "revision_store", None)
+    monkeypatch.setattr(worker, "job_profiler", JobProfiler(directory=str(tmp_path), every=0))
+    monkeypatch.setattr(worker, "process_contract_workflow",
+                        lambda text, **kwargs: {"status": "ok", "problematic_count": 0, "output": []})
+
+    for contract_id, header in (("c1", ""), ("c2", {"profile": True})):
+        worker.handle_contract(json.dumps({"id": contract_id, "fileName": "cdi.pdf",
+                                           "extractedText": "Article 1 : texte", "header": header}))
+    assert [os.path.basename(p).split("-")[0] for p in glob.glob(str(tmp_path / "*.prof"))] == ["c2"]
@@ -0,0 +1,220 @@
+# tests/test_rate_limit.py
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation, rate_limit
+from app.services.contract_review.rate_limit import (
+    CircuitBreaker, Hedger, RedisTokenBucket, TokenBucket, backoff_delay, is_rate_limited, retry_after,
+)
+from benchmarks.fakes import FakeLLM, FakeRateLimitError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _recorded_sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rate_limit.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_minute=60, burst=2, clock=clock)
+    assert [bucket.reserve(), bucket.reserve(), bucket.reserve()] == [0.0, 0.0, 1.0]
+    assert bucket.reserve(block=False) is None
+    clock.now += 3
+    assert bucket.reserve(block=False) == 0.0
+
+
+def test_pause_holds_every_caller():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_minute=0, clock=clock)
+    bucket.pause(5)
+    assert bucket.reserve() == 5
+    assert bucket.reserve(block=False) is None
+    clock.now += 5
+    assert bucket.reserve() == 0
+
+
+def test_error_classification_and_retry_after():
+    assert is_rate_limited(FakeRateLimitError())
+    assert is_rate_limited(RuntimeError("RESOURCE_EXHAUSTED: quota"))
+    assert not is_rate_limited(RuntimeError("503 Service Unavailable"))
+    assert retry_after(FakeRateLimitError(retry_after=7)) == 7
+    assert retry_after(RuntimeError("429 quota exceeded, please retry in 12.5s")) == 12.5
+    assert retry_after(RuntimeError("retry_delay { seconds: 3 }")) == 3
+    assert retry_after(RuntimeError("boom")) is None
+    assert all(0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2 ** attempt) for attempt in range(8))
+
+
+def test_circuit_breaker_opens_then_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=2, reset=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial while half-open
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_call_llm_waits_out_429_retry_after(monkeypatch):
+    sleeps = _recorded_sleeps(monkeypatch)
+    monkeypatch.setattr(Generation, "rate_limiter", TokenBucket(rate_per_minute=0))
+    monkeypatch.setattr(Generation, "circuit_breaker", CircuitBreaker(failures=2))
+    answers = iter([FakeRateLimitError(retry_after=3), FakeRateLimitError(retry_after=3)])
+
+    def responder(prompt):
+        error = next(answers, None)
+        if error is not None:
+            raise error
+        return '{"compliant": true}'
+
+    fake = FakeLLM(responder)
+    assert Generation.call_llm("clause", fake) == '{"compliant": true}'
+    assert fake.calls == 3
+    assert len(sleeps) == 2 and all(2.9 < s <= 3 for s in sleeps)
+    assert Generation.circuit_breaker.state == "closed"  # quota errors do not trip the breaker
+
+
+def test_429_neither_closes_nor_resets_the_breaker(monkeypatch):
+    _recorded_sleeps(monkeypatch)
+    monkeypatch.setattr(Generation, "RETRY_ATTEMPTS", 0)
+    monkeypatch.setattr(Generation, "rate_limiter", TokenBucket(rate_per_minute=0))
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=2, reset=30, clock=clock)
+    monkeypatch.setattr(Generation, "circuit_breaker", breaker)
+
+    def quota(prompt):
+        raise FakeRateLimitError(retry_after=1)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+    assert Generation.call_llm("clause", FakeLLM(quota)) is None  # the half-open trial got a 429
+    assert breaker.state == "half_open"
+    assert breaker.allow()  # a new trial may go out
+
+    counting = CircuitBreaker(failures=2, clock=clock)
+    monkeypatch.setattr(Generation, "circuit_breaker", counting)
+    counting.record_failure()
+    Generation.call_llm("clause", FakeLLM(quota))
+    counting.record_failure()
+    assert counting.state == "open"
+
+def test_call_llm_fails_fast_once_the_circuit_is_open(monkeypatch):
+    monkeypatch.setattr(Generation.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(Generation, "RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(Generation, "rate_limiter", TokenBucket(rate_per_minute=0))
+    monkeypatch.setattr(Generation, "circuit_breaker", CircuitBreaker(failures=2, reset=60))
+
+    def responder(prompt):
+        raise RuntimeError("503 Service Unavailable")
+
+    fake = FakeLLM(responder)
+    assert Generation.call_llm("clause", fake) is None
+    assert fake.calls == 2
+    assert Generation.call_llm("clause", fake) is None
+    assert fake.calls == 2
+
+
+def test_hedged_request_cuts_tail_latency():
+    hedger = Hedger(percentile=50, min_samples=3)
+    for _ in range(3):
+        hedger.record(0.01)
+    calls = []
+    lock = threading.Lock()
+
+    def invoke():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        if first:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    start = time.perf_counter()
+    assert hedger.call(invoke, lambda: True) == "fast"
+    assert time.perf_counter() - start < 0.4
+    assert len(calls) == 2
+
+
+def test_no_hedge_without_history_or_token():
+    hedger = Hedger(percentile=50, min_samples=3)
+    assert hedger.delay() is None
+    assert hedger.call(lambda: "answer", lambda: True) == "answer"
+    for _ in range(3):
+        hedger.record(0.001)
+    assert hedger.call(lambda: time.sleep(0.05) or "only", lambda: False) == "only"
+
+
+
+def test_busy_hedger_runs_calls_on_the_caller_thread_without_hedging():
+    hedger = Hedger(percentile=50, min_samples=3, max_workers=1)
+    for _ in range(3):
+        hedger.record(0.01)
+    threads, hedges = [], []
+    lock = threading.Lock()
+    all_running = threading.Barrier(4, timeout=5)  # breaks if a call waits for the pool
+
+    def invoke():
+        with lock:
+            threads.append(threading.current_thread().name)
+        all_running.wait()
+        time.sleep(0.05)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="caller") as callers:
+        answers = list(callers.map(lambda _: hedger.call(invoke, lambda: hedges.append(1) or True), range(4)))
+    assert answers == ["answer"] * 4
+    assert not hedges  # the pool was full: slow calls were not hedged
+    assert len(threads) == 4 and sum(name.startswith("llm-hedge") for name in threads) == 1
+
+class _ScriptClient:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def register_script(self, script):
+        def run(keys, args):
+            self.calls.append((keys, args))
+            if isinstance(self.reply, Exception):
+                raise self.reply
+            return self.reply
+        return run
+
+
+def test_redis_bucket_uses_the_shared_script_and_falls_back_locally():
+    client = _ScriptClient(b"0.25")
+    bucket = RedisTokenBucket(client, rate_per_minute=60, burst=2)
+    assert bucket.reserve() == 0.25
+    assert client.calls[0] == (["llm:bucket"], [1.0, 2.0, 0])
+    client.reply = b"-1"
+    assert bucket.reserve(block=False) is None
+
+    down = RedisTokenBucket(_ScriptClient(ConnectionError("refused")), rate_per_minute=60, burst=2)
+    assert down.reserve() == 0.0
+    down.pause(4)
+    assert down.reserve() >= 3.9
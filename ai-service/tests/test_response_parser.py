@@ -0,0 +1,91 @@
+# tests/test_response_parser.py
+import sys
+import os
+import json
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation
+from app.services.contract_review.response_parser import (
+    ISSUE_MAX_CHARS, SUGGESTION_MAX_CHARS, extract_json, iter_json_spans, parse_verdict,
+)
+from benchmarks.run import ADVERSARIAL_RESPONSES
+from benchmarks.fakes import FakeLLM
+
+VERDICTS = [
+    {"compliant": True},
+    {"issue": "Période d'essai {trop} longue", "suggestion": "Limiter à 3 mois [art. 14]"},
+    {"issue": "Guillemets \"internes\" et \\ barre", "suggestion": ""},
+]
+
+
+def test_extracts_the_first_object_or_array():
+    assert extract_json('```json\n{"compliant": true}\n```', dict) == {"compliant": True}
+    assert extract_json('Voir {article 5}. {"issue": "a}", "suggestion": "b"} fin', dict) == \
+        {"issue": "a}", "suggestion": "b"}
+    assert extract_json('{"compliant": true} [1]', list) == [1]
+    assert extract_json('[{"index": 1, "text": "]"}]', list) == [{"index": 1, "text": "]"}]
+    assert extract_json("{{{{ " + '{"compliant": true}', dict) == {"compliant": True}
+    assert extract_json('{"a": 1 ] {"compliant": true}', dict) == {"compliant": True}
+    assert extract_json('aucun JSON "ici"', dict) is None
+    assert extract_json("", dict) is None and extract_json(None) is None
+    assert list(iter_json_spans('x {"a": "}"} y [1, [2]] z')) == [(2, 12), (15, 23)]
+
+
+def test_fuzzed_responses_around_a_verdict():
+    rng = random.Random(0)
+    noise_chars = "abc ÉÀ\n\t:.,'-}]\"\\"
+    for _ in range(500):
+        verdict = rng.choice(VERDICTS)
+        prefix = "".join(rng.choice(noise_chars) for _ in range(rng.randint(0, 40)))
+        suffix = "".join(rng.choice(noise_chars + "{[") for _ in range(rng.randint(0, 40)))
+        body = json.dumps(verdict, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+        assert extract_json(prefix + body + suffix, dict) == verdict, prefix + body + suffix
+    for _ in range(500):
+        garbage = "".join(rng.choice('{}[]"\\: ab1,') for _ in range(rng.randint(0, 200)))
+        extract_json(garbage)  # never raises
+
+
+def test_adversarial_responses_are_parsed_in_linear_time():
+    scale = 10
+    for response in ADVERSARIAL_RESPONSES:
+        small = min(timed(response) for _ in range(3))
+        large_response = response * scale
+        large = min(timed(large_response) for _ in range(3))
+        assert large < max(small, 0.002) * scale * 4, (response[:40], small, large)
+    assert all(Generation.extract_json_from_text(r) is not None for r in ADVERSARIAL_RESPONSES)
+
+
+def timed(response):
+    start = time.perf_counter()
+    extract_json(response, dict)
+    return time.perf_counter() - start
+
+
+def test_verdict_schema_and_length_caps():
+    long_issue = "Le délai de préavis prévu " * 20
+    verdict = parse_verdict({"issue": long_issue, "suggestion": "x" * 400})
+    assert len(verdict["issue"]) <= ISSUE_MAX_CHARS and verdict["issue"].endswith("…")
+    assert not verdict["issue"][:-1].endswith(" ")
+    assert len(verdict["suggestion"]) <= SUGGESTION_MAX_CHARS
+    assert parse_verdict({"issue": "Court", "suggestion": None}) == {"issue": "Court", "suggestion": ""}
+    assert parse_verdict({"compliant": True, "issue": "ignoré"}) == {"compliant": True}
+    assert parse_verdict({"compliant": "true"}) is None
+    assert parse_verdict({"issue": 3}) is None
+    assert parse_verdict({"issue": "  "}) is None
+    assert parse_verdict(["compliant"]) is None
+
+
+def test_llm_calls_cap_output_and_stop_after_the_json(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    fake = FakeLLM(lambda prompt: '{"compliant": true}')
+    assert Generation.judge_clause("Le salarié est engagé.", 0, client=fake) == {"compliant": True}
+    assert fake.options["generation_config"] == {"max_output_tokens": Generation.LLM_MAX_OUTPUT_TOKENS}
+    assert fake.options["stop"] == Generation.STOP_SEQUENCES
+
+    fake = FakeLLM(lambda prompt: '[{"index": 1, "compliant": true}, {"index": 2, "compliant": true}]')
+    Generation.judge_batch([(1, "Clause A"), (2, "Clause B")], client=fake)
+    assert fake.options["generation_config"] == {"max_output_tokens": 2 * Generation.LLM_MAX_OUTPUT_TOKENS}
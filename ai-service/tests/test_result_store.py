@@ -0,0 +1,124 @@
+# tests/test_result_store.py
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import worker
+from app.services.contract_review import Generation, generation_workflow
+from app.services.contract_review.rate_limit import CircuitBreaker
+from app.services.contract_review.result_store import ResultStore, normalize_contract_text
+from benchmarks.fakes import FakeLLM, FakeRedis
+
+CONTRACT = "CONTRAT DE TRAVAIL\nArticle 1 : la période d'essai est de trois mois.\n"
+RESULT = {
+    "status": "ok",
+    "problematic_count": 1,
+    "output": [{"clause_index": 1, "clause_title": "Clause", "clause_text": "Article 2 : préavis de huit jours.",
+                "issue": "Préavis trop court", "suggestion": "Respecter le préavis légal"}] * 20,
+}
+
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.pipelines = 0
+
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
+        return super().pipeline(transaction)
+
+
+def test_result_stays_plain_json_with_ttl_and_one_round_trip():
+    client = CountingRedis()
+    store = ResultStore(client, ttl=600)
+    store.publish("c1", RESULT, text=CONTRACT)
+
+    assert json.loads(client.get("c1")) == RESULT  # what the backend reads
+    assert "c1" in client.expiry
+    assert client.pipelines == 1
+    channel, message = client.published[0]
+    assert channel == "contract_results"
+    assert json.loads(json.loads(message)["result"]) == RESULT
+
+
+def test_duplicate_content_is_served_from_compressed_copy():
+    store = ResultStore(FakeRedis())
+    assert store.lookup(CONTRACT) is None
+    store.publish("c1", RESULT, text=CONTRACT)
+
+    reformatted = "  CONTRAT   DE TRAVAIL\n\n\tArticle 1 : la période d'essai est de trois mois."
+    assert normalize_contract_text(reformatted) == normalize_contract_text(CONTRACT)
+    assert store.lookup(reformatted) == RESULT
+    assert store.lookup(CONTRACT.replace("trois", "six")) is None
+
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["bytes_saved"] > 0 and stats["bytes_stored"] < stats["bytes_raw"] / 4
+
+
+def test_other_model_or_prompt_version_does_not_share_results():
+    client = FakeRedis()
+    ResultStore(client, version="gemini-1.5-flash:abc").publish("c1", RESULT, text=CONTRACT)
+    assert ResultStore(client, version="gemini-2.0-flash:abc").lookup(CONTRACT) is None
+
+
+def test_fanned_out_result_is_cached_under_the_expected_content():
+    store = ResultStore(FakeRedis())
+    store.expect("c1", CONTRACT)
+    store.publish("c1", RESULT)
+    assert store.lookup(CONTRACT) == RESULT
+    store.publish("c2", {**RESULT, "status": "partial"}, cache=False)
+    assert store.lookup(CONTRACT) == RESULT
+
+
+def test_worker_answers_reuploaded_contract_without_reprocessing(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(worker, "r", client)
+    monkeypatch.setattr(worker, "result_store", ResultStore(client))
+    monkeypatch.setattr(worker, "revision_store", None)
+    runs = []
+
+    def workflow(text, **kwargs):
+        runs.append(text)
+        return RESULT
+
+    monkeypatch.setattr(worker, "process_contract_workflow", workflow)
+    for contract_id in ("c1", "c2"):
+        worker.handle_contract(json.dumps({"id": contract_id, "fileName": "cdi.pdf", "extractedText": CONTRACT}))
+
+    assert len(runs) == 1
+    assert json.loads(client.get("c2")) == RESULT
+    results = [json.loads(m)["id"] for channel, m in client.published if channel == "contract_results"]
+    assert results == ["c1", "c2"]
+
+
+def test_contract_with_failed_llm_calls_is_partial_and_not_served_to_reuploads(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(worker, "r", client)
+    monkeypatch.setattr(worker, "result_store", ResultStore(client))
+    monkeypatch.setattr(worker, "revision_store", None)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(Generation, "RETRY_ATTEMPTS", 0)
+    monkeypatch.setattr(Generation, "circuit_breaker", CircuitBreaker(failures=100))
+    monkeypatch.setattr(Generation, "verdict_cache", None)
+
+    def unavailable(prompt):
+        raise RuntimeError("503 Service Unavailable")
+
+    contract = "\n".join(["CONTRAT DE TRAVAIL A DUREE INDETERMINEE"] + [
+        f"Article {i} : le salarié accepte une clause numéro {i} qui dépasse les limites prévues par la loi."
+        for i in range(2)])
+    llm = FakeLLM(unavailable)
+    monkeypatch.setattr(Generation, "llm", llm)
+    for contract_id in ("c1", "c2"):
+        worker.handle_contract(json.dumps({"id": contract_id, "fileName": "cdi.pdf", "extractedText": contract}))
+
+    result = json.loads(client.get("c1"))
+    assert result["status"] == "partial" and result["unevaluated"] == 2
+    assert result["problematic_count"] == 0
+    assert llm.calls == 4  # the re-upload was reviewed again, not answered from the partial result
+    assert worker.result_store.lookup(contract) is None
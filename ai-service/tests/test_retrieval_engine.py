@@ -0,0 +1,148 @@
+# tests/test_retrieval_engine.py
+import sys
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+from app.services import retrieval_engine
+from app.services.contract_review.retriever_contract import retrieve_sections_bulk, retrieve_sections_memory
+from benchmarks.fakes import FakeChroma, FakeEmbeddings
+
+
+def test_model_loads_once_across_contracts(monkeypatch):
+    monkeypatch.setattr(retrieval_engine, "SentenceTransformerEmbeddings", FakeEmbeddings)
+    monkeypatch.setattr(retrieval_engine, "Chroma", FakeChroma)
+    monkeypatch.setattr(retrieval_engine, "_engine", None)
+    FakeEmbeddings.loads = FakeChroma.opens = 0
+
+    assert not retrieval_engine.get_engine().ready
+    contracts = [[{"index": i, "title": "Clause", "text": f"Clause {c}-{i} du contrat"} for i in range(5)]
+                 for c in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(retrieve_sections_memory, contracts))
+    retrieval_engine.warm_up()
+
+    assert all(results)
+    assert retrieval_engine.get_engine().ready
+    assert FakeEmbeddings.loads == 1
+    assert FakeChroma.opens == 1
+
+
+SECTIONS = [
+    {"title": "1. PERIODE D'ESSAI", "text": "période d'essai durée renouvelable une fois"},
+    {"title": "2. DUREE DU TRAVAIL", "text": "durée du travail heures par semaine"},
+    {"title": "3. CONGE", "text": "congé annuel payé jours ouvrables"},
+    {"title": "4. PREAVIS", "text": "préavis licenciement démission délai"},
+]
+
+
+def _numpy_engine(tmp_path):
+    sections_path = tmp_path / "sections.json"
+    sections_path.write_text(json.dumps(SECTIONS, ensure_ascii=False), encoding="utf-8")
+    engine = retrieval_engine.RetrievalEngine(backend="numpy", numpy_index_dir=str(tmp_path / "index"),
+                                              sections_path=str(sections_path))
+    engine._embeddings = FakeEmbeddings()
+    return engine
+
+
+def test_numpy_backend_scores_all_clauses_in_one_batch(tmp_path):
+    engine = _numpy_engine(tmp_path)
+    texts = ["la période d'essai est renouvelable", "congé annuel de 18 jours", "préavis de démission"]
+
+    results = engine.search_many(texts, k=2)
+
+    assert engine.embeddings.document_calls == 2  # one for the index build, one for the clauses
+    assert isinstance(engine.numpy_index.vectors, np.memmap)
+    assert [r[0]["title"] for r in results] == ["1. PERIODE D'ESSAI", "3. CONGE", "4. PREAVIS"]
+    for text, top in zip(texts, results):
+        query = np.asarray(engine.embeddings._vector(text))
+        brute = sorted(
+            SECTIONS,
+            key=lambda s: -float(query @ np.asarray(engine.embeddings._vector(s["text"])))
+            / (np.linalg.norm(query) * np.linalg.norm(engine.embeddings._vector(s["text"]))),
+        )
+        assert [s["title"] for s in top] == [s["title"] for s in brute[:2]]
+        assert top[0]["score"] >= top[1]["score"]
+
+    # a second engine reuses the saved index instead of re-embedding
+    again = _numpy_engine(tmp_path)
+    again.warm_up()
+    assert again.embeddings.document_calls == 0
+
+
+
+def test_stale_numpy_index_is_rebuilt_after_the_sections_change(tmp_path):
+    engine = _numpy_engine(tmp_path)
+    assert engine.search_many(["préavis de démission"], k=1)[0][0]["title"] == "4. PREAVIS"
+
+    edited = SECTIONS[:3] + [{"title": "4. PREAVIS", "text": "délai de préavis fixé par voie réglementaire"}]
+    (tmp_path / "sections.json").write_text(json.dumps(edited, ensure_ascii=False), encoding="utf-8")
+    assert engine.numpy_index.sections[3]["text"] == SECTIONS[3]["text"]  # still the loaded one
+
+    engine.invalidate_index()
+    assert engine.numpy_index.sections[3]["text"] == edited[3]["text"]
+    assert engine.embeddings.document_calls == 3  # index, query, rebuild
+
+    # an engine started on the original sections.json rebuilds rather than load the edited index
+    again = _numpy_engine(tmp_path)
+    again.warm_up()
+    assert again.embeddings.document_calls == 1
+    assert again.numpy_index.sections[3]["text"] == SECTIONS[3]["text"]
+
+def test_bulk_retrieval_and_dedup(tmp_path, monkeypatch):
+    engine = _numpy_engine(tmp_path)
+    monkeypatch.setattr(retrieval_engine, "_engine", engine)
+    clauses = [
+        {"index": 0, "title": "Clause", "text": "période d'essai renouvelable"},
+        {"index": 1, "title": "Clause", "text": ""},
+        {"index": 2, "title": "Clause", "text": "la période d'essai dure trois mois"},
+        {"index": 3, "title": "Clause", "text": "heures de travail par semaine"},
+    ]
+
+    bulk = retrieve_sections_bulk(clauses, k=3)
+    assert [m["index"] for m in bulk] == [0, 2, 3]
+    assert all(len(m["sections"]) == 3 for m in bulk)
+    assert engine.numpy_index.search([[1.0] * FakeEmbeddings.dim], -1) == [[]]
+    assert all(m["sections"] == [] for m in retrieve_sections_bulk(clauses, k=0))
+
+    assert retrieve_sections_memory(clauses) == [
+        {"title": "1. PERIODE D'ESSAI", "text": SECTIONS[0]["text"]},
+        {"title": "2. DUREE DU TRAVAIL", "text": SECTIONS[1]["text"]},
+    ]
+
+
+def test_embedding_memo_keeps_recently_used_texts(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval_engine, "EMBED_MEMO_SIZE", 2)
+    engine = _numpy_engine(tmp_path)
+    engine.embed_texts(["clause a", "clause b"])
+    engine.embed_texts(["clause a"])  # hit: a becomes the most recent
+    engine.embed_texts(["clause c"])
+    assert list(engine._memo) == ["clause a", "clause c"]
+    assert engine.embeddings.document_calls == 2
+
+
+def test_retrieval_endpoints_reject_k_below_one():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    assert client.post("/api/v1/contracts/retrieve?k=0", json=[{"index": 0, "text": "préavis"}]).status_code == 422
+    assert client.get("/api/v1/search", params={"query": "préavis", "k": -1}).status_code == 422
+
+
+def test_search_endpoint_uses_the_configured_backend(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    engine = _numpy_engine(tmp_path)
+    monkeypatch.setattr(retrieval_engine, "_engine", engine)
+    monkeypatch.setattr(retrieval_engine, "Chroma", None)  # never opened with RETRIEVAL_BACKEND=numpy
+
+    response = TestClient(app).get("/api/v1/search", params={"query": "préavis de démission", "k": 2})
+    results = response.json()["results"]
+    assert [r["title"] for r in results] == [s["title"] for s in engine.search_many(["préavis de démission"], 2)[0]]
+    assert results[0] == {"title": "4. PREAVIS", "text": SECTIONS[3]["text"]}
@@ -0,0 +1,78 @@
+# tests/test_revisions.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review import Generation, generation_workflow
+from app.services.contract_review.revisions import RevisionStore, lineage_id, match_sections
+from benchmarks.fakes import FakeLLM, FakeRedis
+
+ARTICLES = [
+    "Article 1 : la période d'essai est fixée à douze mois renouvelable deux fois sans motif.",
+    "Article 2 : le salarié travaille quarante-quatre heures par semaine réparties sur six jours.",
+    "Article 3 : aucun congé annuel payé ne sera accordé pendant la première année du contrat.",
+    "Article 4 : le préavis de démission est fixé à huit jours quelle que soit l'ancienneté du salarié.",
+    "Article 5 : le salarié s'interdit toute activité concurrente pendant dix ans sur tout le territoire.",
+]
+
+
+def _contract(articles):
+    return "\n".join(["CONTRAT DE TRAVAIL"] + articles)
+
+
+def _responder(prompt):
+    if "congé" in prompt or "dix ans" in prompt or "trois ans" in prompt:
+        return '{"issue": "Clause contraire au code du travail", "suggestion": "Mettre en conformité"}'
+    return '{"compliant": true}'
+
+
+def test_match_sections_maps_unchanged_sections():
+    assert match_sections(["a", "b", "c", "d"], ["a", "x", "c", "d", "e"]) == {0: 0, 2: 2, 3: 3}
+
+
+def test_new_revision_only_reevaluates_changed_clauses(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    store = RevisionStore(FakeRedis())
+
+    monkeypatch.setattr(Generation, "llm", FakeLLM(_responder))
+    first = generation_workflow.process_contract_workflow(_contract(ARTICLES), revisions=store, lineage="cdi.pdf")
+    assert first["revision"] == {"reused": 0, "reevaluated": 5}
+
+    # article 1 removed, article 5 edited, a new article inserted before article 3
+    edited = [ARTICLES[1], "Article 2 bis : une prime annuelle est versée en décembre.", ARTICLES[2],
+              ARTICLES[3], ARTICLES[4].replace("dix ans", "trois ans")]
+    fake = FakeLLM(_responder)
+    monkeypatch.setattr(Generation, "llm", fake)
+    second = generation_workflow.process_contract_workflow(_contract(edited), revisions=store, lineage="cdi.pdf")
+
+    assert fake.calls == 2
+    assert second["revision"] == {"reused": 3, "reevaluated": 2}
+    fresh = generation_workflow.process_contract_workflow(_contract(edited))
+    assert second["output"] == fresh["output"]
+    assert [item["clause_index"] for item in second["output"]] == [3, 5]
+
+
+def test_lineage_id_is_explicit_only():
+    assert lineage_id({"fileName": "cdi.pdf"}) is None
+    assert lineage_id({"fileName": "cdi.pdf", "lineageId": "emp-42"}) == "emp-42"
+    assert lineage_id({}) is None
+
+
+def test_revisions_judged_by_another_model_or_prompt_are_not_reused(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    client = FakeRedis()
+    monkeypatch.setattr(Generation, "llm", FakeLLM(_responder))
+    generation_workflow.process_contract_workflow(_contract(ARTICLES), revisions=RevisionStore(client),
+                                                  lineage="emp-42")
+
+    for store in (RevisionStore(client, version="other-prompt"), RevisionStore(client, model_name="other-model")):
+        fake = FakeLLM(_responder)
+        monkeypatch.setattr(Generation, "llm", fake)
+        result = generation_workflow.process_contract_workflow(_contract(ARTICLES), revisions=store,
+                                                               lineage="emp-42")
+        assert result["revision"] == {"reused": 0, "reevaluated": 5}
+        assert fake.calls == 5
@@ -0,0 +1,79 @@
+# tests/test_segmenter.py
+import sys
+import os
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from app.services.contract_review.splitter_contract import split_contract_lines, split_contract_memory
+from app.services.segmenter import segment_contract, segment_labor_code
+from app.splitter import split_by_sections
+from benchmarks import segmenter as segmenter_benchmark
+from benchmarks.segmenter import (
+    annex_of_size, labor_code_of_size, legacy_split_by_sections, legacy_split_contract_memory,
+)
+from benchmarks.synthetic import generate_contract
+
+EDGE_CONTRACTS = [
+    "",
+    "   \n\t\n",
+    "Préambule sans titre\nsuite du préambule\nARTICLE 1\nLe salarié est engagé.",
+    "Article 1 : essai\r\nsuite\r\n\r\nARTICLE 2\rtexte\rencore",
+    "  \u00a0Nom : Karim\u00a0 \n\tCIN : AB123456\t\n  adresse\x0cligne\x1cfin\u2028autre\u2029x\x85y\x0bz",
+    "Article 3 : une clause dont le titre dépasse largement les dix mots autorisés pour un titre\nsuite",
+    "ÉTÉ ÇA\n123\n---\n: \nDÉBUT 2024",
+]
+
+
+def test_contract_segments_match_the_previous_splitter_on_edge_cases():
+    for text in EDGE_CONTRACTS:
+        expected = legacy_split_contract_memory(text)
+        assert split_contract_memory(text) == expected
+        assert list(segment_contract(text)) == expected
+        assert split_contract_lines(text.splitlines()) == expected
+
+
+def test_contract_segments_match_the_previous_splitter_on_generated_text():
+    rng = random.Random(0)
+    alphabet = ["a", "B", "É", "é", ":", " ", "\t", "\n", "\r\n", "\r", "\x0c", "\u2028", "\u00a0", "1", "."]
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 120)))
+        assert split_contract_memory(text) == legacy_split_contract_memory(text), repr(text)
+    for seed in range(5):
+        text = generate_contract(clauses=40, personal_blocks=2, headers=5, seed=seed)
+        assert split_contract_memory(text) == legacy_split_contract_memory(text)
+    text = annex_of_size(20000)
+    assert split_contract_memory(text) == legacy_split_contract_memory(text)
+
+
+def test_contract_sections_are_offsets_into_the_source():
+    text = "Intro\n  ARTICLE 1  \nLe salarié\n   est engagé.\n"
+    segments = segment_contract(text)
+    assert len(segments) == 2
+    article = segments[-1]
+    assert text[article.start:article.end] == "ARTICLE 1  \nLe salarié\n   est engagé."
+    assert article.title == "ARTICLE 1"
+    assert article["section_text"] == "ARTICLE 1 Le salarié est engagé."
+    assert article.get("missing") is None
+    assert [s["section_title"] for s in segments[:1]] == ["Introduction"]
+
+
+def test_labor_sections_match_the_previous_splitter():
+    texts = [
+        "",
+        "Pas de section",
+        "Avant\n1. DISPOSITIONS GÉNÉRALES\nArticle 1 ⚠\ufe0f texte — avec  symboles\n\n2. CONTRAT DE TRAVAIL\nfin",
+        "1. L'ESSAI\n\t« guillemets » et € 12,5 %\n 2. PAS UN TITRE\n3. PRÉAVIS - DURÉE\n",
+        labor_code_of_size(50000),
+    ]
+    for text in texts:
+        assert split_by_sections(text) == legacy_split_by_sections(text)
+    sections = segment_labor_code(texts[2])
+    assert [(s.title, texts[2][s.start:s.end].startswith(s.title)) for s in sections] == \
+        [("1. DISPOSITIONS GÉNÉRALES", True), ("2. CONTRAT DE TRAVAIL", True)]
+
+
+def test_segmenter_benchmark_runs():
+    results = segmenter_benchmark.main(["--size-mb", "0.05", "--repeat", "1"])
+    assert {"contract legacy", "annex segments+text", "labor segments"} <= set(results)
@@ -0,0 +1,96 @@
+# tests/test_startup.py
+import sys
+import os
+import json
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import retrieval_engine
+from app.services.contract_review import Generation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "4.0"))
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main, worker
+elapsed = time.perf_counter() - start
+from app.services import retrieval_engine
+from app.services.contract_review import Generation
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy_modules": [m for m in ("torch", "sentence_transformers", "chromadb", "langchain_google_genai")
+                      if m in sys.modules],
+    "engine_created": retrieval_engine._engine is not None,
+    "llm_created": Generation.llm is not None,
+}))
+"""
+
+
+def test_import_is_cheap_and_side_effect_free(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("GEMINI_API_KEY", "GEMNAI_API_KEY")}
+    env["PYTHONPATH"] = ROOT
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    probe = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert probe["heavy_modules"] == []
+    assert probe["engine_created"] is False
+    assert probe["llm_created"] is False
+    assert list(tmp_path.iterdir()) == []  # no directories created on import
+    assert probe["seconds"] < IMPORT_BUDGET_SECONDS, f"import took {probe['seconds']:.2f}s"
+
+
+def test_get_llm_requires_api_key_on_first_use(monkeypatch):
+    monkeypatch.setattr(Generation, "llm", None)
+    monkeypatch.setattr(Generation, "API_KEY", None)
+    try:
+        Generation.get_llm()
+    except RuntimeError as e:
+        assert "GEMINI_API_KEY" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+class _Engine:
+    def __init__(self, ready):
+        self.ready = ready
+
+
+def test_ready_reports_warm_state(monkeypatch):
+    monkeypatch.setattr(main, "WARM_UP_ON_STARTUP", False)
+    monkeypatch.setattr(main, "warm_up_error", None)
+    monkeypatch.setattr(retrieval_engine, "_engine", _Engine(False))
+    monkeypatch.setattr(Generation, "llm", None)
+    client = TestClient(main.app)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting", "retrieval": False, "llm": False}
+    assert client.get("/health").status_code == 200
+
+    monkeypatch.setattr(retrieval_engine, "_engine", _Engine(True))
+    monkeypatch.setattr(Generation, "llm", object())
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_warm_up_failure_is_reported(monkeypatch):
+    monkeypatch.setattr(main, "warm_up_error", None)
+    monkeypatch.setattr(retrieval_engine, "_engine", _Engine(False))
+
+    def broken():
+        raise OSError("model download blocked")
+
+    monkeypatch.setattr(retrieval_engine, "warm_up", broken)
+    main.warm_up()
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 503
+    assert "model download blocked" in response.json()["error"]
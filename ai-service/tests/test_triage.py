@@ -0,0 +1,109 @@
+# tests/test_triage.py
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import numpy as np
+
+from app.services.contract_review import Generation, generation_workflow, triage
+from app.services.contract_review.revisions import RevisionStore
+from app.services.contract_review.triage import TriageModel, evaluate, labelled, records_from_revisions
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, FakeRedis
+
+COMPLIANT_CLAUSES = [
+    f"Article {i} : le salarié bénéficie d'une mutuelle et d'une prime de transport mensuelle {i}." for i in range(20)
+]
+PROBLEMATIC_CLAUSES = [
+    f"Article {i} : aucun congé payé ni préavis ne sera accordé au salarié licencié {i}." for i in range(20)
+]
+
+
+def _embed(texts):
+    fake = FakeEmbeddings()
+    return [fake._vector(text) for text in texts]
+
+
+def _model(**thresholds):
+    texts = COMPLIANT_CLAUSES + PROBLEMATIC_CLAUSES
+    labels = [0] * len(COMPLIANT_CLAUSES) + [1] * len(PROBLEMATIC_CLAUSES)
+    return TriageModel.train(_embed(texts), labels, **thresholds)
+
+
+def test_model_separates_clauses_and_round_trips(tmp_path):
+    model = _model()
+    probabilities = model.predict_proba(_embed(COMPLIANT_CLAUSES[:3] + PROBLEMATIC_CLAUSES[:3]))
+    assert (probabilities[:3] < 0.2).all() and (probabilities[3:] > 0.8).all()
+
+    path = str(tmp_path / "triage.npz")
+    model.save(path)
+    loaded = TriageModel.load(path)
+    assert np.allclose(loaded.predict_proba(_embed(PROBLEMATIC_CLAUSES)), model.predict_proba(_embed(PROBLEMATIC_CLAUSES)))
+    assert loaded.embedding_model == model.embedding_model
+
+
+def test_route_only_settles_confident_compliant_clauses():
+    model = _model(compliant_below=0.2, problematic_above=0.8)
+    selected = [(0, COMPLIANT_CLAUSES[0]), (1, PROBLEMATIC_CLAUSES[0]), (2, "Article 9 : clause inconnue.")]
+    probabilities = model.predict_proba(_embed([text for _, text in selected]))
+    assert [model.classify(p) for p in probabilities][:2] == [triage.COMPLIANT, triage.PROBLEMATIC]
+    assert model.route(selected, embed=_embed) == {0: {"compliant": True}}
+
+
+def test_evaluate_reports_avoided_calls_against_agreement():
+    rows = evaluate([0.01, 0.03, 0.04, 0.5, 0.9], [0, 0, 1, 1, 1], thresholds=[0.02, 0.05])
+    assert rows[0] == {"threshold": 0.02, "avoided": 1, "avoided_rate": 0.2, "agreement": 1.0, "missed_issues": 0}
+    assert rows[1]["avoided"] == 3
+    assert rows[1]["agreement"] == 2 / 3
+    assert rows[1]["missed_issues"] == 1
+
+
+def test_training_data_from_files_and_revisions(tmp_path):
+    store = RevisionStore(FakeRedis())
+    sections = [{"section_text": COMPLIANT_CLAUSES[0]}, {"section_text": PROBLEMATIC_CLAUSES[0]}]
+    store.save("cdi.pdf", sections, {0: {"compliant": True}, 1: {"issue": "Pas de congé", "suggestion": ""}})
+    records = records_from_revisions(store.client)
+
+    path = tmp_path / "verdicts.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in [{"text": "Article 7 : prime.", "compliant": True}]),
+                    encoding="utf-8")
+    texts, labels = labelled(records + triage.load_records(str(path)))
+    assert dict(zip(texts, labels.tolist())) == {
+        COMPLIANT_CLAUSES[0]: 0, PROBLEMATIC_CLAUSES[0]: 1, "Article 7 : prime.": 0,
+    }
+
+
+def test_workflow_skips_llm_for_triaged_clauses(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    model = _model(compliant_below=0.2)
+    monkeypatch.setattr(model, "route", lambda selected: TriageModel.route(model, selected, embed=_embed))
+    fake = FakeLLM(lambda prompt: '{"issue": "Congés non accordés", "suggestion": "Accorder les congés"}')
+    monkeypatch.setattr(Generation, "llm", fake)
+
+    contract = "\n".join(COMPLIANT_CLAUSES[:3] + PROBLEMATIC_CLAUSES[:2])
+    result = generation_workflow.process_contract_workflow(contract, triage=model)
+
+    assert fake.calls == 2
+    assert result["triaged"] == 3
+    assert [item["clause_index"] for item in result["output"]] == [3, 4]
+
+
+def test_triaged_verdicts_are_kept_out_of_the_training_data(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    monkeypatch.setattr(generation_workflow, "retrieve_sections_bulk", lambda clauses, k: [])
+    model = _model(compliant_below=0.2)
+    monkeypatch.setattr(model, "route", lambda selected: TriageModel.route(model, selected, embed=_embed))
+    monkeypatch.setattr(Generation, "llm", FakeLLM(lambda prompt: '{"issue": "Congés", "suggestion": ""}'))
+    store = RevisionStore(FakeRedis())
+
+    contract = "\n".join(COMPLIANT_CLAUSES[:3] + PROBLEMATIC_CLAUSES[:2])
+    generation_workflow.process_contract_workflow(contract, triage=model, revisions=store, lineage="emp-7")
+    assert sorted(r["text"] for r in records_from_revisions(store.client)) == sorted(PROBLEMATIC_CLAUSES[:2])
+
+    # a later revision reusing them keeps each verdict's first source
+    contract = "\n".join(COMPLIANT_CLAUSES[:3] + PROBLEMATIC_CLAUSES[:3])
+    generation_workflow.process_contract_workflow(contract, triage=model, revisions=store, lineage="emp-7")
+    assert sorted(r["text"] for r in records_from_revisions(store.client)) == sorted(PROBLEMATIC_CLAUSES[:3])
@@ -0,0 +1,102 @@
+# tests/test_verdict_cache.py
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import pytest
+
+from app.services.contract_review import Generation
+from app.services.contract_review.verdict_cache import (
+    MemoryBackend, RedisBackend, SQLiteBackend, VerdictCache, prompt_version,
+)
+from benchmarks.fakes import FakeLLM, FakeRedis
+
+ISSUE = '{"issue": "Clause de non-concurrence illimitée", "suggestion": "Limiter la durée"}'
+
+
+def _backends(tmp_path):
+    return {
+        "memory": MemoryBackend(max_entries=10, ttl=60),
+        "sqlite": SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl=60),
+        "redis": RedisBackend(FakeRedis(), ttl=60),
+    }
+
+
+@pytest.mark.parametrize("name", ["memory", "sqlite", "redis"])
+def test_cache_normalizes_text_and_counts(tmp_path, name):
+    cache = VerdictCache(_backends(tmp_path)[name], "model", "v1")
+    assert cache.get("Le salarié  est soumis\nà une clause") is None
+    cache.set("Le salarié  est soumis\nà une clause", {"compliant": True})
+    assert cache.get("le salarié est soumis à une clause") == {"compliant": True}
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+@pytest.mark.parametrize("name", ["memory", "sqlite"])
+def test_local_backends_expire_and_evict(tmp_path, name):
+    backend = _backends(tmp_path)[name]
+    backend.ttl = 0.05
+    backend.set("a", "1")
+    time.sleep(0.1)
+    assert backend.get("a") is None
+
+    backend.ttl = 60
+    for i in range(15):
+        backend.set(f"k{i}", str(i))
+    assert len(backend) == 10
+    assert backend.get("k0") is None
+    assert backend.get("k14") == "14"
+
+
+def test_sqlite_evicts_by_index_in_periodic_passes(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=500, ttl=60)
+    assert backend.evict_every == 5
+    for i in range(1003):
+        backend.set(f"k{i}", str(i))
+        assert len(backend) <= 500 + backend.evict_every
+    assert backend.get("k0") is None and backend.get("k1002") == "1002"
+
+    plans = [" ".join(row[-1] for row in backend._conn.execute("EXPLAIN QUERY PLAN " + sql, (0,)))
+             for sql in ("DELETE FROM verdicts WHERE expires_at < ?",
+                         "SELECT key FROM verdicts ORDER BY accessed_at LIMIT ?")]
+    assert "verdicts_expires_at" in plans[0] and "verdicts_accessed_at" in plans[1]
+
+def test_prompt_change_invalidates_entries():
+    backend = MemoryBackend()
+    old = VerdictCache(backend, "model", prompt_version(Generation.build_prompt_minimal_french))
+    old.set("clause", {"compliant": True})
+    new = VerdictCache(backend, "model", prompt_version(lambda text, idx: f"autre prompt {text} {idx}"))
+    assert new.get("clause") is None
+    assert VerdictCache(backend, "other-model", old.version).get("clause") is None
+
+
+def test_generate_issues_memory_uses_cache(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    clauses = [{"section_title": "Clause",
+                "section_text": "Le salarié s'interdit toute activité concurrente pour une durée illimitée."}] * 3
+    cache = VerdictCache(MemoryBackend(), Generation.MODEL_NAME, Generation.PROMPT_VERSION)
+    fake = FakeLLM(lambda prompt: ISSUE)
+
+    first = Generation.generate_issues_memory(clauses, [], client=fake, cache=cache)
+    second = Generation.generate_issues_memory(clauses, [], client=fake, cache=cache)
+
+    assert fake.calls == 1
+    assert first == second
+    assert [p["clause_index"] for p in second] == [0, 1, 2]
+    assert cache.stats()["hits"] == 3
+
+
+def test_grounded_and_ungrounded_verdicts_are_cached_apart(monkeypatch):
+    monkeypatch.setattr(Generation, "SLEEP_BETWEEN_CALLS", 0)
+    clause = "Le salarié s'interdit toute activité concurrente pour une durée illimitée."
+    cache = VerdictCache(MemoryBackend(), Generation.MODEL_NAME, Generation.PROMPT_VERSION)
+    fake = FakeLLM(lambda prompt: ISSUE)
+    context = {0: [{"title": "Article 24", "text": "La clause de non-concurrence est limitée dans le temps."}]}
+
+    Generation.evaluate_clauses([(0, clause)], client=fake, cache=cache, batch_size=1)
+    Generation.evaluate_clauses([(0, clause)], client=fake, cache=cache, batch_size=1, context=context)
+    assert fake.calls == 2
+    Generation.evaluate_clauses([(0, clause)], client=fake, cache=cache, batch_size=1, context=context)
+    assert fake.calls == 2 and cache.stats()["hits"] == 1
@@ -0,0 +1,75 @@
+# tests/test_worker.py
+import sys
+import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import worker
+from benchmarks.fakes import FakeChannel, FakeConnection, FakeMethod
+
+
+def _body(i):
+    return json.dumps({"id": f"c{i}", "fileName": f"c{i}.pdf", "extractedText": "texte", "header": ""}).encode()
+
+
+def _drain(connection, expected, timeout=5):
+    handled = 0
+    deadline = time.time() + timeout
+    while handled < expected and time.time() < deadline:
+        handled += connection.process_callbacks()
+        time.sleep(0.01)
+    return handled
+
+
+def test_consumer_runs_contracts_in_parallel_and_acks_on_connection_thread():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def handler(body):
+        with lock:
+            running.append(body)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.remove(body)
+        if json.loads(body)["id"] == "c2":
+            raise ValueError("bad contract")
+
+    connection, channel = FakeConnection(), FakeChannel()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        consumer = worker.ContractConsumer(connection, channel, executor, handler=handler,
+                                           dead_letter_queue="contract-queue.dead")
+        start = time.perf_counter()
+        for i in range(4):
+            consumer.on_message(channel, FakeMethod(i), None, _body(i))
+        assert _drain(connection, 4) == 4
+        elapsed = time.perf_counter() - start
+
+    assert max(peak) == 4
+    assert elapsed < 0.35
+    assert sorted(channel.acks) == [0, 1, 2, 3]
+    assert channel.threads == {threading.get_ident()}
+    (routing_key, body, properties), = channel.published
+    assert routing_key == "contract-queue.dead"
+    assert body == _body(2)
+    assert "bad contract" in properties.headers["x-error"]
+
+
+def test_failed_contract_is_nacked_without_dead_letter_queue():
+    def handler(body):
+        raise RuntimeError("boom")
+
+    connection, channel = FakeConnection(), FakeChannel()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        consumer = worker.ContractConsumer(connection, channel, executor, handler=handler, dead_letter_queue="")
+        consumer.on_message(channel, FakeMethod(7), None, _body(7))
+        assert _drain(connection, 1) == 1
+
+    assert channel.acks == []
+    assert channel.nacks == [(7, False)]
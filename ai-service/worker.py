@@ -1,35 +1,246 @@
-import pika, json, redis
-from app.services.contract_review.generation_workflow import process_contract_workflow
+import pika, json, redis, os, functools, threading, time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.services.contract_review.generation_workflow import process_contract_workflow, record_verdicts, verdict_event
+from app.services.contract_review.events import ContractEventPublisher
+from app.services.contract_review.revisions import REVISION_TRACKING, RevisionStore, lineage_id
+from app.services.contract_review.result_store import ResultStore
+from app.services.contract_review import generation_workflow
+from app.services.contract_review import fanout
+from app.services import retrieval_engine
+from app.metrics import CONTRACTS, QUEUE_WAIT_SECONDS, exporter_warning, stage, start_exporter
+from app.profiling import job_profiler
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
+QUEUE_NAME = "contract-queue"
+# Failed contracts are parked here with the error in the headers; empty = drop them.
+DEAD_LETTER_QUEUE = os.getenv("DEAD_LETTER_QUEUE", "contract-queue.dead")
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", str(WORKER_CONCURRENCY)))
+WORKER_EXECUTOR = os.getenv("WORKER_EXECUTOR", "thread")
+FANOUT_SWEEP_INTERVAL = float(os.getenv("FANOUT_SWEEP_INTERVAL", "30"))
+# Append every received contract message to this JSONL file (replayed by benchmarks.loadtest); empty = off.
+RECORD_MESSAGES = os.getenv("RECORD_MESSAGES", "")
 
 r = redis.Redis(host="localhost", port=6379, db=0)
+revision_store = RevisionStore(r) if REVISION_TRACKING else None
+result_store = ResultStore(r)
 
-def process_message(ch, method, properties, body):
+class SubjobPublisher:
+    """Publishes fan-out sub-jobs from executor threads/processes.
+
+    The consumer's channel belongs to the connection thread, so each thread
+    keeps its own small publishing connection.
+    """
+
+    def __init__(self, host=RABBITMQ_HOST, queue=fanout.SUBJOB_QUEUE):
+        self.host = host
+        self.queue = queue
+        self._local = threading.local()
+
+    def _channel(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is None or channel.is_closed:
+            connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+            channel = connection.channel()
+            channel.queue_declare(queue=self.queue, durable=True)
+            self._local.channel = channel
+        return channel
+
+    def __call__(self, subjob):
+        body = json.dumps(subjob)
+        properties = pika.BasicProperties(delivery_mode=2)
+        try:
+            self._channel().basic_publish(exchange="", routing_key=self.queue, body=body, properties=properties)
+        except pika.exceptions.AMQPError:
+            self._local.channel = None
+            self._channel().basic_publish(exchange="", routing_key=self.queue, body=body, properties=properties)
+
+publish_subjob = SubjobPublisher()
+
+class MessageRecorder:
+    """Appends received messages to a JSONL file as {"ts": receive time, "message": ...}."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, body):
+        try:
+            line = json.dumps({"ts": round(time.time(), 3), "message": json.loads(body)}, ensure_ascii=False)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except (OSError, ValueError) as e:
+            print(f"Failed to record message: {e!r}")
+
+def publish_result(contract_id, result, text=None, cache=True):
+    """Store the final result in Redis and notify the backend (one round trip)."""
+    with stage("redis_publish"):
+        result_store.publish(contract_id, result, text=text, cache=cache)
+
+def handle_contract(body):
+    """Run the review for one queue message and publish the result."""
     message = json.loads(body)
     contract_id = message.get("id")
     file_name = message.get("fileName")
     text = message.get("extractedText")
     header = message.get("header")
-    
+
     print(f"Processing contract {contract_id} - {file_name}")
-    
-    # Process contract in one call
-    result = process_contract_workflow(text)
-    
-    # Store result in Redis
-    result_json = json.dumps(result)
-    r.set(contract_id, result_json)
-    r.publish("contract_results", json.dumps({"id": contract_id, "result": result_json}))
-    
+    events = ContractEventPublisher(r, contract_id)
+    events("accepted", {"fileName": file_name})
+
+    # The same contract uploaded again under a new id gets the stored result
+    cached = result_store.lookup(text)
+    if cached is not None:
+        print(f"Contract {contract_id} has the same content as an already reviewed one")
+        publish_result(contract_id, cached, cache=False)
+        events("completed", {"status": cached.get("status"), "problematic_count": cached.get("problematic_count"),
+                             "deduplicated": True})
+        return contract_id
+
+    # Large contracts: the clauses left for the LLM once revision reuse, the clause
+    # library and triage have settled theirs become sub-jobs any worker can pick up
+    def dispatch(pending, review):
+        if fanout.FANOUT_MIN_CLAUSES <= 0 or len(pending) < fanout.FANOUT_MIN_CLAUSES:
+            return False
+        result_store.expect(contract_id, text, ttl=int(fanout.FANOUT_TIMEOUT * 2))
+        parts = fanout.start_fanout(contract_id, pending, r, publish_subjob, review=review)
+        print(f"Contract {contract_id} fanned out into {parts} sub-jobs")
+        return True
+
+    # Process contract (profiled when the message asks for it, or sampled)
+    with job_profiler.maybe(message, contract_id):
+        result = process_contract_workflow(text, on_event=events, revisions=revision_store,
+                                           lineage=lineage_id(message), dispatch=dispatch)
+    if result is None:
+        return contract_id
+
+    # Store result in Redis; only complete reviews are served to later re-uploads
+    publish_result(contract_id, result, text=text, cache=result["status"] == "ok")
+    return contract_id
+
+def finish_fanout(contract_id, result, review=None):
+    # the LLM verdicts of the sub-jobs teach the clause library and make the revision
+    if review is not None:
+        sections = [{"section_text": text} for text in review.get("sections") or []]
+        evaluated = [(idx, text) for idx, text in review["evaluated"]]
+        sources = {int(idx): source for idx, source in review.get("sources", {}).items()}
+        record_verdicts(sections, evaluated, review["verdicts"], revision_store, review.get("lineage"),
+                        generation_workflow.clause_library, sources)
+    # partial results (timed-out parts) are not worth serving to later duplicates
+    publish_result(contract_id, result, cache=result["status"] == "ok")
+    ContractEventPublisher(r, contract_id)("completed", {
+        "status": result["status"], "problematic_count": result["problematic_count"]})
+
+def handle_subjob(body):
+    """Evaluate one fan-out sub-job; the last part assembles and publishes the result."""
+    message = json.loads(body)
+    events = ContractEventPublisher(r, message["contractId"])
+    on_verdict = lambda idx, text, verdict: events("verdict", verdict_event(idx, text, verdict))
+    with job_profiler.maybe(message, f"{message['contractId']}-part{message['part']}"):
+        fanout.run_subjob(message, r, finish_fanout, on_verdict=on_verdict)
+
+def process_message(ch, method, properties, body):
+    handle_contract(body)
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
+def run_timed(handler, body, enqueued_at):
+    QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - enqueued_at))
+    return handler(body)
+
+class ContractConsumer:
+    """Runs contracts on an executor while the connection thread keeps heartbeats going.
+
+    pika channels are not thread-safe, so every ack/nack/publish is handed back
+    to the connection thread with add_callback_threadsafe.
+    """
+
+    def __init__(self, connection, channel, executor, handler=handle_contract,
+                 dead_letter_queue=DEAD_LETTER_QUEUE, recorder=None):
+        self.connection = connection
+        self.channel = channel
+        self.executor = executor
+        self.handler = handler
+        self.dead_letter_queue = dead_letter_queue
+        self.recorder = recorder
+
+    def on_message(self, ch, method, properties, body):
+        if self.recorder is not None:
+            self.recorder(body)
+        # queue wait counts from the publish timestamp when the producer sets one,
+        # else from delivery to this worker (time spent in prefetch/executor backlog)
+        enqueued_at = getattr(properties, "timestamp", None) or time.time()
+        future = self.executor.submit(run_timed, self.handler, body, enqueued_at)
+        future.add_done_callback(functools.partial(self._on_done, method.delivery_tag, body))
+
+    def _on_done(self, delivery_tag, body, future):
+        error = future.exception()
+        CONTRACTS.labels("failure" if error else "success").inc()
+        if error is None:
+            callback = functools.partial(self.channel.basic_ack, delivery_tag=delivery_tag)
+        else:
+            print(f"Contract processing failed: {error!r}")
+            callback = functools.partial(self._reject, delivery_tag, body, error)
+        self.connection.add_callback_threadsafe(callback)
+
+    def _reject(self, delivery_tag, body, error):
+        if not self.dead_letter_queue:
+            self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+            return
+        self.channel.basic_publish(
+            exchange="",
+            routing_key=self.dead_letter_queue,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=2, headers={"x-error": repr(error)[:1000]}),
+        )
+        self.channel.basic_ack(delivery_tag=delivery_tag)
+
+def create_executor(kind=WORKER_EXECUTOR, slots=WORKER_CONCURRENCY):
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=slots)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=slots, thread_name_prefix="contract")
+    raise ValueError(f"Unknown WORKER_EXECUTOR: {kind}")
+
 def start_worker():
-    connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
+    retrieval_engine.warm_up()
+    warning = exporter_warning(WORKER_EXECUTOR)
+    if warning:
+        print(f" [!] {warning}")
+    if start_exporter():
+        print(f" [*] Metrics exported on port {os.getenv('METRICS_PORT')}")
+    connection = pika.BlockingConnection(pika.ConnectionParameters(RABBITMQ_HOST))
     channel = connection.channel()
-    channel.queue_declare(queue="contract-queue", durable=True)
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue="contract-queue", on_message_callback=process_message)
-    print(" [*] Worker started. Waiting for messages...")
-    channel.start_consuming()
+    channel.queue_declare(queue=QUEUE_NAME, durable=True)
+    if DEAD_LETTER_QUEUE:
+        channel.queue_declare(queue=DEAD_LETTER_QUEUE, durable=True)
+    channel.basic_qos(prefetch_count=WORKER_PREFETCH)
+
+    executor = create_executor()
+    recorder = MessageRecorder(RECORD_MESSAGES) if RECORD_MESSAGES else None
+    consumer = ContractConsumer(connection, channel, executor, recorder=recorder)
+    channel.basic_consume(queue=QUEUE_NAME, on_message_callback=consumer.on_message)
+
+    if fanout.FANOUT_MIN_CLAUSES > 0:
+        channel.queue_declare(queue=fanout.SUBJOB_QUEUE, durable=True)
+        subjob_consumer = ContractConsumer(connection, channel, executor, handler=handle_subjob)
+        channel.basic_consume(queue=fanout.SUBJOB_QUEUE, on_message_callback=subjob_consumer.on_message)
+
+        def sweep_overdue():
+            for contract_id in fanout.expire_overdue(r, finish_fanout):
+                print(f"Contract {contract_id} timed out waiting for sub-jobs; published partial result")
+            connection.call_later(FANOUT_SWEEP_INTERVAL, sweep_overdue)
+
+        connection.call_later(FANOUT_SWEEP_INTERVAL, sweep_overdue)
+
+    if recorder is not None:
+        print(f" [*] Recording contract messages to {RECORD_MESSAGES}")
+    print(f" [*] Worker started with {WORKER_CONCURRENCY} {WORKER_EXECUTOR} slot(s), "
+          f"prefetch {WORKER_PREFETCH}. Waiting for messages...")
+    try:
+        channel.start_consuming()
+    finally:
+        executor.shutdown(wait=True)
 
 if __name__ == "__main__":
-    start_worker()
\ No newline at end of file
+    start_worker()
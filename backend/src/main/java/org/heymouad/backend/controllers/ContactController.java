@@ -34,7 +34,8 @@ public class ContactController {
     private final SseEmitterRegistry emitterRegistry;
 
     @PostMapping(value = "/contracts/review", consumes = "multipart/form-data")
-    public ResponseEntity<Map<String, String>> reviewContract(@RequestParam("file") MultipartFile file) throws Exception
+    public ResponseEntity<Map<String, String>> reviewContract(@RequestParam("file") MultipartFile file,
+                                                              @RequestParam(value = "lineageId", required = false) String lineageId) throws Exception
     {
         log.info("Upload receives at {}", Instant.now());
         Set<String> allowedTypes = Set.of(
@@ -54,7 +55,7 @@ public class ContactController {
 
         ContractResponse contractResponse = contractService.processContract(file);
 
-        String id = contractReviewProducer.sendToQueue(contractResponse);
+        String id = contractReviewProducer.sendToQueue(contractResponse, lineageId);
         log.info("Job queued at {} with id={}", Instant.now(), id);
 
         return ResponseEntity.accepted().body(Map.of("id", id));
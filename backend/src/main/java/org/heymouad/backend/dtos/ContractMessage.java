@@ -13,4 +13,7 @@ public class ContractMessage {
     private String fileName;
     private String extractedText;
     private String header;
+    // Names the document's revision history (optional): re-uploads with the same
+    // lineageId only re-review the clauses that changed
+    private String lineageId;
 }
@@ -15,12 +15,17 @@ public class ContractReviewProducer {
     private final RabbitTemplate rabbitTemplate;
 
     public String sendToQueue(ContractResponse contract){
+        return sendToQueue(contract, null);
+    }
+
+    public String sendToQueue(ContractResponse contract, String lineageId){
         String id = UUID.randomUUID().toString();
         ContractMessage message = new ContractMessage(
                 id,
                 contract.filename(),
                 contract.extractedText(),
-                contract.header()
+                contract.header(),
+                lineageId
         );
         rabbitTemplate.convertAndSend("contract-exchange", "contract-routing-key", message);
 
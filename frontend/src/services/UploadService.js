@@ -1,9 +1,13 @@
 import apiClient from "../api/axiosConfig";
 
-export const UploadService = async (file) => {
+// lineageId (optional) names the document a re-upload is a new revision of
+export const UploadService = async (file, lineageId) => {
   try {
     const formData = new FormData();
     formData.append("file", file);
+    if (lineageId) {
+      formData.append("lineageId", lineageId);
+    }
     const response = await apiClient.post(
       "/api/v1/contracts/review",
       formData,